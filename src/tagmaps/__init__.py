@@ -7,7 +7,7 @@ from tagmaps.version import __version__
 from tagmaps.tagmaps_ import TagMaps
 from tagmaps.config.config import BaseConfig
 from tagmaps.classes.load_data import LoadData
-from tagmaps.classes.prepare_data import PrepareData
+from tagmaps.classes.prepare_data import PrepareData, PrepareDataState
 from tagmaps.classes.interface import UserInterface
 from tagmaps.classes.shared_structure import (
     EMOJI, LOCATIONS, TAGS, TOPICS, PostStructure, ClusterTypes)
@@ -71,7 +71,14 @@ def main():
         local_saturation_check=cfg.local_saturation_check,
         max_items=cfg.max_items,
         logging_level=cfg.logging_level,
-        mapnik_export=cfg.mapnik_export,)
+        mapnik_export=cfg.mapnik_export,
+        columnar_store=cfg.columnar_store,
+        cluster_engine=cfg.cluster_engine,
+        cluster_workers=cfg.cluster_workers,
+        approximate_toplists=cfg.approximate_toplists,
+        memory_budget=cfg.memory_budget,
+        dedup_points=cfg.dedup_points,
+        tile_size=cfg.tile_size,)
 
     if cfg.load_from_intermediate or input_data.is_intermediate():
         # load data from intermediate (already filtered) results
@@ -82,14 +89,33 @@ def main():
         else:
             filename = cfg.load_from_intermediate
         tagmaps.load_intermediate(input_path=filename)
+    elif cfg.load_state:
+        # merge states of independently ingested shards
+        for state_path in cfg.load_state:
+            tagmaps.load_state(state_path)
     else:
         # read and process unfiltered input records from csv
-        with input_data as records:
-            for record in records:
-                tagmaps.add_record(record)
+        if cfg.ingest_workers > 1:
+            # parse input files in parallel processes
+            for partial_data in input_data.iter_partial_data(
+                    tagmaps.new_partial_data(), cfg.ingest_workers):
+                tagmaps.add_partial_data(partial_data)
+        elif input_data.chunked:
+            for post_batch in input_data.iter_batches():
+                tagmaps.add_batch(post_batch)
+        else:
+            with input_data as records:
+                for record in records:
+                    tagmaps.add_record(record)
         # get statistics for
         # unfiltered input data
         input_data.input_stats_report()
+        if cfg.write_state:
+            # write state of this shard, to be merged later
+            tagmaps.write_state()
+            log.info(
+                "State of ingested data written to Output_state.npz")
+            sys.exit(0)
 
     # prepare loaded data for clustering
     tagmaps.prepare_data()
@@ -109,7 +135,7 @@ def main():
 
     if cfg.write_cleaned_data and not cfg.load_from_intermediate:
         # write intermediate results
-        tagmaps.write_cleaned_data()
+        tagmaps.write_cleaned_data(cfg.intermediate_format)
         # write toplists (emoji, location, tags)
         tagmaps.write_toplists()
         if cfg.topic_modeling:
@@ -136,6 +162,9 @@ def main():
                 tagmaps.set_cluster_distance(
                     cfg.cluster_cut_distance
                 )
+        if continue_proc is True and cfg.scale_profile:
+            # cluster and noise counts across cluster distances
+            tagmaps.write_scale_profiles()
 
         if continue_proc is True:
             if cfg.cluster_tags or cfg.cluster_emoji:
@@ -7,9 +7,8 @@ Module for tag maps alpha shapes generation
 # delay evaluation of annotations at runtime (PEP 563)
 from __future__ import absolute_import, annotations
 
-import math
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import numpy as np
 import shapely.geometry as geometry
@@ -17,6 +16,7 @@ from scipy.spatial import Delaunay  # pylint: disable=E0611
 from shapely.ops import polygonize, unary_union
 
 from tagmaps.classes.compile_output import Compile
+from tagmaps.classes.post_store import CleanedPostStore
 from tagmaps.classes.shared_structure import ItemCounter
 
 
@@ -50,19 +50,128 @@ class AlphaShapesArea:
     item_area: float
 
 
+class AlphaTriangulation:
+    """Delaunay triangulation of a point cloud, computed once
+
+    Alpha shapes for different alpha values are thresholds
+    over the sorted circumradii of the triangles. Shapes are
+    cached by the number of triangles below the threshold,
+    since different alpha values often select the same triangles.
+    """
+
+    def __init__(self, points, centeraxis: bool = False):
+        coords = np.array([point.coords[0] for point in points])
+
+        # qhull_options = 'Qt'
+        # #To avoid this error,
+        # joggle the data by specifying the
+        # 'QJ' option to the DELAUNAY function.see:
+        # https://de.mathworks.com/matlabcentral/answers/94438-why-does-the-delaunay-function-in-matlab-7-0-r14-produce-an-error-when-passed-colinear-points?s_tid=gn_loc_drop
+
+        self.norm_co = None
+        if centeraxis:
+            # Center axis for avoiding floating point precision issues
+            self.norm_co = coords[0]
+            coords = coords - self.norm_co
+        tri = Delaunay(coords)
+        # print problematic points:
+        # print(tri.coplanar)
+        # tri = Delaunay(coords,qhull_topions='QJ')
+        # #Version 3.1 added triangulated output ('Qt').
+        # It should be used for Delaunay triangulations
+        # instead of using joggled input ('QJ').
+        self.coords = coords
+        circum_r = self._get_circumradii(coords, tri.simplices)
+        # degenerate triangles: no alpha shape possible
+        self.degenerate = circum_r is None
+        if self.degenerate:
+            return
+        order = np.argsort(circum_r, kind="stable")
+        self.simplices = tri.simplices[order]
+        self.radii = circum_r[order]
+        self._shapes = dict()
+
+    def alpha_shape(self, alpha: float):
+        """Get alpha shape (or False, if degenerate) for alpha value"""
+        if self.degenerate:
+            return False
+        # Here's the radius filter.
+        count = int(np.searchsorted(self.radii, 1.0 / alpha, side="left"))
+        poly_shape = self._shapes.get(count)
+        if poly_shape is None:
+            poly_shape = self._polygonize(self.simplices[:count])
+            self._shapes[count] = poly_shape
+        return poly_shape
+
+    def _polygonize(self, simplices: np.ndarray):
+        """Get union of polygons formed by boundary edges of triangles"""
+        edge_points = self._get_boundary_edges(self.coords, simplices)
+        if self.norm_co is not None:
+            # return to original axis center
+            edge_points = edge_points + self.norm_co
+        mmulti_line_str = geometry.MultiLineString(list(edge_points))
+        triangles = [geom for geom in polygonize(mmulti_line_str.geoms)]
+        return unary_union(triangles)  # , edge_points
+        # return geometry.polygon.asPolygon(edge_points,holes=None)
+
+    @staticmethod
+    def _get_circumradii(
+        coords: np.ndarray, simplices: np.ndarray
+    ) -> Optional[np.ndarray]:
+        """Get circumradius for all triangles (simplices) at once
+
+        Returns None if any triangle is degenerate (zero area,
+        or negative Heron product due to floating point precision)
+        """
+        pa_v = coords[simplices[:, 0]]
+        pb_v = coords[simplices[:, 1]]
+        pc_v = coords[simplices[:, 2]]
+        # Lengths of sides of triangle
+        a_val = np.sqrt((pa_v[:, 0] - pb_v[:, 0]) ** 2 + (pa_v[:, 1] - pb_v[:, 1]) ** 2)
+        b_val = np.sqrt((pb_v[:, 0] - pc_v[:, 0]) ** 2 + (pb_v[:, 1] - pc_v[:, 1]) ** 2)
+        c_val = np.sqrt((pc_v[:, 0] - pa_v[:, 0]) ** 2 + (pc_v[:, 1] - pa_v[:, 1]) ** 2)
+        # Semiperimeter of triangle
+        s_res = (a_val + b_val + c_val) / 2.0
+        # Area of triangle by Heron's formula
+        heron = s_res * (s_res - a_val) * (s_res - b_val) * (s_res - c_val)
+        if np.any(heron < 0):
+            return None
+        area = np.sqrt(heron)
+        if np.any(area == 0):
+            return None
+        return a_val * b_val * c_val / (4.0 * area)
+
+    @staticmethod
+    def _get_boundary_edges(coords: np.ndarray, simplices: np.ndarray) -> np.ndarray:
+        """Get coordinates of edges used by exactly one triangle
+
+        Interior edges (shared by two triangles) are dropped,
+        since they do not change the polygonized area.
+        """
+        edges = np.concatenate(
+            (simplices[:, [0, 1]], simplices[:, [1, 2]], simplices[:, [2, 0]])
+        )
+        edges, counts = np.unique(np.sort(edges, axis=1), axis=0, return_counts=True)
+        return coords[edges[counts == 1]]
+
+
 class AlphaShapes:
     """Converts (cluster) point clouds to shapes"""
 
     @staticmethod
     def get_single_cluster_shape(
-        item: ItemCounter, single_post, cluster_distance: float, proj_coords
+        item: ItemCounter,
+        post_store: CleanedPostStore,
+        row: int,
+        cluster_distance: float,
+        proj_xy: Tuple[np.ndarray, np.ndarray],
     ):
         """Get Shapes for items with no clusters
         Will return a buffer based on cluster distance
         """
         shapetype = "Single cluster"
-        # project lat/lng to UTM
-        point_x, point_y = proj_coords(single_post.lng, single_post.lat)
+        # projected (UTM) coordinates of post
+        point_x, point_y = proj_xy[0][row], proj_xy[1][row]
         pcoordinate = geometry.Point(point_x, point_y)
         # single dots are presented
         # as buffers with 0.5% of width-area
@@ -76,7 +185,7 @@ class AlphaShapes:
         single_cluster_result = AlphaShapesAndMeta(
             result_polygon,
             1,
-            max(single_post.post_views_count, single_post.post_like_count),
+            int(max(post_store.post_views_count[row], post_store.post_like_count[row])),
             1,
             item.name,
             item.ucount,
@@ -91,10 +200,10 @@ class AlphaShapes:
     def get_cluster_shape(
         item: ItemCounter,
         clustered_post_guids,
-        cleaned_post_dict,
+        post_store: CleanedPostStore,
         cluster_distance: float,
         local_saturation_check,
-        proj_coords,
+        proj_xy: Tuple[np.ndarray, np.ndarray],
     ):
         """Returns alpha shapes and tag_area (sqm) for a point cloud"""
         # we define a new list of Temp Alpha Shapes outside the loop,
@@ -103,24 +212,20 @@ class AlphaShapes:
         item_area = 0
         for post_guids in clustered_post_guids:
             # for each cluster for this toptag
-            posts = [cleaned_post_dict[x] for x in post_guids]
+            rows = post_store.rows(post_guids)
             post_count = len(post_guids)
-            unique_user_count = len({post.user_guid for post in posts})
-            sum_views = sum([post.post_views_count for post in posts])
+            unique_user_count = post_store.user_count(rows)
+            sum_views = int(post_store.post_views_count[rows].sum())
             # needs to be moved to CompileOutput:
             weightsv1 = Compile.get_weight(1, post_count, unique_user_count)
 
             weightsv2 = Compile.get_weight(2, post_count, unique_user_count)
             weightsv3 = Compile.get_weight(3, post_count, unique_user_count)
-            distinct_locations = {post.loc_id for post in posts}
-            # simple list comprehension with projection:
+            # one point per distinct location, projected to UTM
+            loc_rows = post_store.location_rows(rows)
             points = [
-                geometry.Point(
-                    proj_coords(
-                        float(location.split(":")[1]), float(location.split(":")[0])
-                    )
-                )
-                for location in distinct_locations
+                geometry.Point(x_point, y_point)
+                for x_point, y_point in zip(proj_xy[0][loc_rows], proj_xy[1][loc_rows])
             ]
 
             # get poly shape from points
@@ -201,15 +306,16 @@ class AlphaShapes:
             startalpha = 10000
         else:
             startalpha = 9000
+        # triangulate once, all alpha values below
+        # are thresholds over the same triangles
+        triangulation = AlphaTriangulation(points)
         # concave hull/alpha shape /50000:
-        poly_shape = AlphaShapes.alpha_shape(
-            points, alpha=cluster_distance / startalpha
-        )
+        poly_shape = triangulation.alpha_shape(alpha=cluster_distance / startalpha)
         shapetype = "Initial Alpha Shape + Buffer"
         if not isinstance(poly_shape, bool) and poly_shape.is_empty:
             # try again with centered axis reduced alpha
-            poly_shape = AlphaShapes.alpha_shape(
-                points, alpha=(cluster_distance / startalpha), centeraxis=True
+            poly_shape = AlphaTriangulation(points, centeraxis=True).alpha_shape(
+                alpha=(cluster_distance / startalpha)
             )
         # if not poly_shape.is_empty:
         # print("Success")
@@ -220,9 +326,7 @@ class AlphaShapes:
                 # ** means cube
                 alpha = startalpha + (startalpha * (i**i))
                 # /100000
-                poly_shape = AlphaShapes.alpha_shape(
-                    points, alpha=cluster_distance / alpha
-                )
+                poly_shape = triangulation.alpha_shape(alpha=cluster_distance / alpha)
                 if not (
                     isinstance(poly_shape, geometry.multipolygon.MultiPolygon)
                     and not isinstance(poly_shape, bool)
@@ -235,8 +339,8 @@ class AlphaShapes:
                     # try decreasing alpha
                     alpha = startalpha / (i * i)
                     # /100000
-                    poly_shape = AlphaShapes.alpha_shape(
-                        points, alpha=cluster_distance / alpha
+                    poly_shape = triangulation.alpha_shape(
+                        alpha=cluster_distance / alpha
                     )
                     if not (
                         isinstance(poly_shape, geometry.multipolygon.MultiPolygon)
@@ -374,77 +478,4 @@ class AlphaShapes:
             # there is no sense
             # in computing an alpha shape.
             return geometry.MultiPoint(list(points)).convex_hull
-
-        def add_edge(edges, edge_points, coords, i, j):
-            """
-            Add a line between the i-th and j-th points,
-            if not in the list already
-            """
-            if (i, j) in edges or (j, i) in edges:
-                # already added
-                return
-            edges.add((i, j))
-            edge_points.append(coords[[i, j]])
-
-        coords = np.array([point.coords[0] for point in points])
-
-        # qhull_options = 'Qt'
-        # #To avoid this error,
-        # joggle the data by specifying the
-        # 'QJ' option to the DELAUNAY function.see:
-        # https://de.mathworks.com/matlabcentral/answers/94438-why-does-the-delaunay-function-in-matlab-7-0-r14-produce-an-error-when-passed-colinear-points?s_tid=gn_loc_drop
-
-        if centeraxis:
-            # Center axis for avoiding floating point precision issues
-            norm_co = coords[0]
-            coords = coords - norm_co
-        tri = Delaunay(coords)
-        # print problematic points:
-        # print(tri.coplanar)
-        # tri = Delaunay(coords,qhull_topions='QJ')
-        # #Version 3.1 added triangulated output ('Qt').
-        # It should be used for Delaunay triangulations
-        # instead of using joggled input ('QJ').
-        edges = set()
-        edge_points = []
-        # loop over triangles:
-        # vert_ia, ib, ic = indices of corner points of the
-        # triangle
-        for vert_ia, vert_ib, vert_ic in tri.simplices:
-            pa_v = coords[vert_ia]
-            pb_v = coords[vert_ib]
-            pc_v = coords[vert_ic]
-            # Lengths of sides of triangle
-            a_val = math.sqrt((pa_v[0] - pb_v[0]) ** 2 + (pa_v[1] - pb_v[1]) ** 2)
-            b_val = math.sqrt((pb_v[0] - pc_v[0]) ** 2 + (pb_v[1] - pc_v[1]) ** 2)
-            c_val = math.sqrt((pc_v[0] - pa_v[0]) ** 2 + (pc_v[1] - pa_v[1]) ** 2)
-            # Semiperimeter of triangle
-            s_res = (a_val + b_val + c_val) / 2.0
-            # Area of triangle by Heron's formula
-            try:
-                area = math.sqrt(
-                    s_res * (s_res - a_val) * (s_res - b_val) * (s_res - c_val)
-                )
-            except ValueError:
-                return False
-            if area == 0:
-                return False
-            circum_r = a_val * b_val * c_val / (4.0 * area)
-            # Here's the radius filter.
-            # print circum_r
-            if circum_r < 1.0 / alpha:
-                add_edge(edges, edge_points, coords, vert_ia, vert_ib)
-                add_edge(edges, edge_points, coords, vert_ib, vert_ic)
-                add_edge(edges, edge_points, coords, vert_ic, vert_ia)
-
-        if centeraxis:
-            # return to original axis center
-            edge_points = [
-                np.array([edgepoint[0] + norm_co, edgepoint[1] + norm_co])
-                for edgepoint in edge_points
-            ]
-
-        mmulti_line_str = geometry.MultiLineString(edge_points)
-        triangles = [geom for geom in polygonize(mmulti_line_str.geoms)]
-        return unary_union(triangles)  # , edge_points
-        # return geometry.polygon.asPolygon(edge_points,holes=None)
+        return AlphaTriangulation(points, centeraxis=centeraxis).alpha_shape(alpha)
@@ -6,34 +6,51 @@ Module for tag maps clustering methods
 
 from __future__ import absolute_import
 
+import csv
+import hashlib
 import logging
 import queue
+import re
 import sys
 import threading
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import astuple, dataclass
 from functools import wraps
-from typing import Dict, List, Optional, Set, Tuple
+from pathlib import Path
+from typing import (Any, Dict, Iterable, List, Optional, OrderedDict, Set,
+                    Tuple)
 
 import hdbscan
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 import seaborn as sns
 import shapely.geometry as geometry
 from pyproj import Transformer  # pylint: disable=C0412
 from shapely.ops import transform  # pylint: disable=C0412
 from tagmaps.classes.alpha_shapes import (AlphaShapes, AlphaShapesAndMeta,
                                           AlphaShapesArea)
+from tagmaps.classes.cluster_labels import (get_dedup_labels,
+                                            get_engine_labels,
+                                            get_hdbscan_labels,
+                                            get_tiled_labels, new_hdbscan)
 from tagmaps.classes.plotting import TPLT
+from tagmaps.classes.post_store import CleanedPostStore, Vocabulary
 from tagmaps.classes.prepare_data import PreparedStats
-from tagmaps.classes.shared_structure import (EMOJI, LOCATIONS, POST_FIELDS,
-                                              TAGS, TOPICS, AnalysisBounds,
-                                              CleanedPost, ItemCounter)
+from tagmaps.classes.shared_structure import (EMOJI, GRID, HDBSCAN,
+                                              LOCATIONS, RADIUS, TAGS, TOPICS,
+                                              AnalysisBounds, CleanedPost,
+                                              ClusterEngines, ItemCounter)
 from tagmaps.classes.utils import Utils
 
 # init threaded cluster queue
 cluster_queue = queue.Queue()
+# shared data of cluster worker processes
+_worker_data: Dict[str, Any] = dict()
+# max number of fitted HDBSCAN clusterers (trees) cached per ClusterGen
+TREE_CACHE_SIZE = 16
+# chars not allowed in file names (e.g. of scale profiles)
+INVALID_FILENAME_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
 
 sns.set_context('poster')
 sns.set_style('white')
@@ -43,6 +60,7 @@ sns.set_style('white')
 class SelectedItems:
     guids: List[str]
     location_count: int
+    positions: np.ndarray
 
 
 @dataclass
@@ -79,6 +97,75 @@ def store_in_queue(f):
     return wrapper
 
 
+def _init_cluster_worker(
+        lng: np.ndarray, lat: np.ndarray, settings: Dict[str, Any]):
+    """Store coordinate arrays and settings in cluster worker process"""
+    _worker_data.update(settings)
+    _worker_data["lng"] = lng
+    _worker_data["lat"] = lat
+
+
+def _cluster_rows(rows: np.ndarray) -> np.ndarray:
+    """Get cluster labels for posts at rows (in cluster worker process)"""
+    radians_data = np.radians(np.column_stack(
+        (_worker_data["lng"][rows], _worker_data["lat"][rows])))
+    if (_worker_data["cluster_engine"] in (RADIUS, GRID)
+            and not _worker_data["autoselect_clusters"]):
+        if _worker_data["tile_size"]:
+            tiled_labels = get_tiled_labels(
+                _worker_data["cluster_engine"], radians_data,
+                Utils.get_radians_from_meters(
+                    _worker_data["cluster_distance"]),
+                Utils.get_radians_from_meters(_worker_data["tile_size"]))
+            if tiled_labels is not None:
+                return tiled_labels
+        return get_engine_labels(
+            _worker_data["cluster_engine"], radians_data,
+            Utils.get_radians_from_meters(_worker_data["cluster_distance"]))
+    if (_worker_data["dedup_points"]
+            and not _worker_data["autoselect_clusters"]):
+        return get_dedup_labels(
+            radians_data, Utils.get_radians_from_meters(
+                _worker_data["cluster_distance"]))
+    clusterer = new_hdbscan(len(rows))
+    clusterer.fit(radians_data)
+    return get_hdbscan_labels(
+        clusterer, _worker_data["autoselect_clusters"],
+        _worker_data["cluster_distance"])
+
+
+@dataclass
+class ScaleProfile:
+    """Cluster and noise counts of item for a range of
+    cluster distances (m), see ClusterGen.scale_profile()"""
+    item: str
+    distances: np.ndarray
+    cluster_counts: np.ndarray
+    noise_counts: np.ndarray
+    post_count: int
+
+    def __iter__(self):
+        return iter(astuple(self))
+
+    def get_filename(self, cls_type: str) -> str:
+        """Get CSV file name of profile (scaletest_type_item.csv),
+        chars of item not allowed in file names are replaced"""
+        item_name = INVALID_FILENAME_CHARS.sub("_", self.item).rstrip(". ")
+        return f'scaletest_{cls_type.lower()}_{item_name}.csv'
+
+    def write_csv(self, output_path: Path):
+        """Write profile to CSV, one row per cluster distance"""
+        with open(output_path, 'w', encoding='utf-8', newline='') as f_handle:
+            writer = csv.writer(f_handle)
+            writer.writerow(
+                ["distance", "cluster_count", "noise_count", "post_count"])
+            for distance, cluster_count, noise_count in zip(
+                    self.distances, self.cluster_counts, self.noise_counts):
+                writer.writerow([
+                    f"{distance:.2f}", cluster_count, noise_count,
+                    self.post_count])
+
+
 @dataclass
 class ClusterShapes:
     """Count of user per cluster centroid
@@ -110,6 +197,36 @@ class ClusterGen():
     3. Output: Projected coordinates based on auto-selected UTM Zone,
     for calculating Alpha Shapes and writing results to
     shapefile
+
+    Two cluster engines are available:
+
+    - HDBSCAN (default): fits the full HDBSCAN model
+    - RADIUS: if clusters are cut at a fixed cluster_distance
+      (autoselect_clusters is False), labels connected components
+      of the radius graph directly (exact single linkage cut),
+      which is much faster and uses less memory. Clusters may
+      differ slightly from HDBSCAN, which cuts a single linkage tree
+      built from an approximate minimum spanning tree. Preview mode
+      always uses HDBSCAN, since trees are plotted.
+    - GRID: as RADIUS, but points are first binned into grid cells
+      smaller than cluster_distance; only links between neighbouring
+      cells are computed, so memory use stays linear in the number of
+      points, even for dense areas (e.g. global location clustering
+      at city-to-country scale)
+
+    With tile_size (m) and RADIUS or GRID engine, point sets larger
+    than a tile are clustered at a fixed cluster_distance tile by tile
+    (see TileGrid), tiles are extended by a halo of cluster_distance
+    and clusters crossing tile borders are merged on shared halo
+    points. Results equal clustering without tiles. The HDBSCAN
+    engine is not tiled.
+
+    With dedup_points, identical coordinates are collapsed
+    before fitting HDBSCAN (exact minimum spanning tree) at a fixed
+    cluster_distance, labels are broadcast back to all posts (min
+    cluster size still refers to posts). This is an exact single
+    linkage cut, clusters may differ slightly from HDBSCAN without
+    dedup_points (approximate minimum spanning tree).
     """
     class CGDec():
         """Decorators for class CG methods"""
@@ -135,13 +252,24 @@ class ClusterGen():
                  top_list: List[ItemCounter],
                  total_distinct_locations: int,
                  cluster_type: str = TAGS,
-                 local_saturation_check: bool = False):
+                 local_saturation_check: bool = False,
+                 post_store: Optional[CleanedPostStore] = None,
+                 cluster_engine: str = HDBSCAN,
+                 cluster_workers: Optional[int] = None,
+                 dedup_points: bool = False,
+                 tile_size: Optional[float] = None):
         self.cls_type = cluster_type
         self.bounds = bounds
         self.cluster_distance: float = ClusterGen._init_cluster_dist(
             self.bounds, self.cls_type)
         self.cleaned_post_dict = cleaned_post_dict
         self.cleaned_post_list = cleaned_post_list
+        # columnar store of cleaned posts, used for all
+        # selection, clustering and shape generation
+        if post_store is None:
+            post_store = CleanedPostStore.from_posts(
+                cleaned_post_list or [])
+        self.post_store = post_store
         self.top_list = top_list
         self.top_item: Optional[ItemCounter]
         if self.top_list:
@@ -151,12 +279,27 @@ class ClusterGen():
         self.total_distinct_locations = total_distinct_locations
         self.autoselect_clusters = False  # no cluster distance needed
         self.clusterer = None
+        # LRU cache of fitted clusterers per item and point set
+        # (opt-in with cache_tree, e.g. user interface previews),
+        # changes of cluster_distance only re-cut the cached tree
+        self.tree_cache: OrderedDict[Tuple, hdbscan.HDBSCAN] = OrderedDict()
+        self.cluster_engine = ClusterGen.check_cluster_engine(
+            cluster_engine)
+        if cluster_workers is None:
+            cluster_workers = 1
+        self.cluster_workers = cluster_workers
+        self.dedup_points = dedup_points
+        self.tile_size = tile_size
         self.local_saturation_check = local_saturation_check
         # storing cluster results:
         self.single_items_dict = defaultdict(list)
         self.clustered_items_dict = defaultdict(list)
         self.clustered_guids_all: List[str] = list()
         self.none_clustered_guids: List[str] = list()
+        # inverted index: item -> rows in post_store
+        self.item_index: Dict[str, np.ndarray] = dict()
+        self._index_terms: Set[str] = set()
+        self.update_item_index()
         # get initial analysis bounds in Decimal Degrees
         # for calculating output UTM Zone Projection
         self._update_bounds()
@@ -179,6 +322,8 @@ class ClusterGen():
             self.crs_wgs, self.crs_proj, always_xy=True)
         self.proj_transformer_back = Transformer.from_crs(
             self.crs_proj, self.crs_wgs, always_xy=True)
+        # project all posts once
+        self._get_proj_xy()
 
     @classmethod
     def new_clusterer(cls,
@@ -187,7 +332,12 @@ class ClusterGen():
                       cleaned_post_dict: Optional[Dict[str, CleanedPost]],
                       cleaned_post_list: Optional[List[CleanedPost]],
                       cleaned_stats: Optional[Dict[str, PreparedStats]],
-                      local_saturation_check: bool):
+                      local_saturation_check: bool,
+                      post_store: Optional[CleanedPostStore] = None,
+                      cluster_engine: str = HDBSCAN,
+                      cluster_workers: Optional[int] = None,
+                      dedup_points: bool = False,
+                      tile_size: Optional[float] = None):
         """Create new clusterer from type and input data
 
         Args:
@@ -196,6 +346,17 @@ class ClusterGen():
             bounds (LoadData.AnalysisBounds): Analaysis spatial boundary
             cleaned_post_dict (Dict[str, CleanedPost]): Dict of cleaned posts
             prepared_data (LoadData.PreparedData): Statistics data
+            post_store (CleanedPostStore): Columnar store of cleaned posts,
+                shared between clusterers (created from
+                cleaned_post_list if not provided)
+            cluster_engine (str): Either HDBSCAN, RADIUS or GRID
+            cluster_workers (int): Number of processes for
+                itemized clustering (default: 1)
+            dedup_points (bool): Collapse identical coordinates
+                before clustering at fixed cluster distance
+                (exact single linkage cut)
+            tile_size (float): Cluster large extents tile by tile,
+                with tiles of tile_size (m), RADIUS and GRID only
 
         Returns:
             clusterer (ClusterGen): A new clusterer of ClusterType
@@ -211,9 +372,23 @@ class ClusterGen():
             total_distinct_locations=cleaned_stats[
                 LOCATIONS].total_unique_items,
             cluster_type=cls_type,
-            local_saturation_check=local_saturation_check)
+            local_saturation_check=local_saturation_check,
+            post_store=post_store,
+            cluster_engine=cluster_engine,
+            cluster_workers=cluster_workers,
+            dedup_points=dedup_points,
+            tile_size=tile_size)
         return clusterer
 
+    @staticmethod
+    def check_cluster_engine(cluster_engine: str) -> str:
+        """Validate cluster engine name"""
+        if cluster_engine not in ClusterEngines:
+            raise ValueError(
+                f"Cluster engine {cluster_engine} unknown. "
+                f"Use one of {ClusterEngines}.")
+        return cluster_engine
+
     @staticmethod
     def _init_cluster_dist(bounds: AnalysisBounds,
                            cls_type: str) -> float:
@@ -240,18 +415,102 @@ class ClusterGen():
     def _update_bounds(self):
         """Update analysis rectangle boundary based on
 
-        cleaned posts list."""
-
-        dataframe = pd.DataFrame(self.cleaned_post_list, columns=POST_FIELDS)
-        # get columns lng, lat
-        # convert to numpy ndarray
-        # (List of [lng, lat] lists)
-        points = dataframe.loc[:, ['lng', 'lat']].to_numpy()
+        cleaned posts store."""
+        # numpy ndarray of [lng, lat] coordinates
+        points = self.post_store.coordinates()
         (self.bounds.lim_lat_min,
          self.bounds.lim_lat_max,
          self.bounds.lim_lng_min,
          self.bounds.lim_lng_max) = Utils.get_rectangle_bounds(points)
 
+    def update_item_index(self):
+        """Build inverted index of items to post rows
+
+        - rows refer to self.post_store
+        - only terms of top_list items are indexed, other
+          items are looked up with a (vectorized) scan of the store
+        - must be called again if post_store
+          is modified (e.g. locations removed)
+        """
+        self._index_terms = self._get_index_terms()
+        self.item_index = self._get_term_rows(self._index_terms)
+
+    def clear_tree_cache(self):
+        """Remove cached clusterers (trees), e.g. after
+        posts were removed from post_store"""
+        self.tree_cache.clear()
+
+    def _get_index_terms(self) -> Set[str]:
+        """Get set of terms to index based on top_list"""
+        if self.cls_type == TOPICS:
+            index_terms = set()
+            for item in self.top_list:
+                index_terms.update(Utils.split_topic(item.name))
+            return index_terms
+        return {item.name for item in self.top_list}
+
+    def _get_item_codes(self) -> Tuple[np.ndarray, np.ndarray, Vocabulary]:
+        """Get (code, row) pairs and vocabulary based on cls_type
+
+        Note: Tags are matched against hashtags or post_body,
+        topics against hashtags, post_body or emoji
+        """
+        store = self.post_store
+        if self.cls_type == LOCATIONS:
+            return (store.loc_ids,
+                    np.arange(len(store), dtype=np.intp),
+                    store.locations)
+        if self.cls_type == TAGS:
+            columns = (store.hashtags, store.post_body)
+        elif self.cls_type == EMOJI:
+            columns = (store.emoji,)
+        elif self.cls_type == TOPICS:
+            columns = (store.hashtags, store.post_body, store.emoji)
+        else:
+            raise ValueError(f"Clusterer {self.cls_type} unknown.")
+        codes = np.concatenate([column.codes for column in columns])
+        rows = np.concatenate([column.code_rows() for column in columns])
+        return codes, rows, store.items
+
+    def _get_term_rows(self, terms: Set[str]) -> Dict[str, np.ndarray]:
+        """Get sorted post rows for each term found in post_store"""
+        codes, rows, vocab = self._get_item_codes()
+        term_codes = np.fromiter(
+            (vocab.get(term) for term in terms if term in vocab),
+            dtype=np.int64)
+        post_count = len(self.post_store)
+        if not term_codes.size or not post_count:
+            return dict()
+        mask = np.isin(codes, term_codes)
+        # unique (code, row) pairs, sorted by code, then row
+        pairs = np.unique(codes[mask].astype(np.int64) * post_count
+                          + rows[mask])
+        pair_codes, pair_rows = np.divmod(pairs, post_count)
+        uniq_codes, starts = np.unique(pair_codes, return_index=True)
+        return {
+            vocab.terms[code]: code_rows.astype(np.intp)
+            for code, code_rows in zip(
+                uniq_codes, np.split(pair_rows, starts[1:]))}
+
+    def _lookup_item_positions(self, item: Optional[str]) -> np.ndarray:
+        """Get sorted post rows for item
+
+        Terms not in index are looked up directly in post_store.
+        """
+        if self.cls_type == TOPICS:
+            terms = Utils.split_topic(item)
+        else:
+            terms = [item]
+        missing = {term for term in terms if term not in self._index_terms}
+        term_rows = self.item_index
+        if missing:
+            term_rows = {**term_rows, **self._get_term_rows(missing)}
+        empty = np.empty(0, dtype=np.intp)
+        if len(terms) == 1:
+            return term_rows.get(terms[0], empty)
+        return np.unique(np.concatenate(
+            [term_rows.get(term, empty) for term in terms]))
+
     def _select_postguids(self, item: Optional[str]) -> SelectedItems:
         """Select all posts that have a specific item
 
@@ -262,100 +521,13 @@ class ClusterGen():
             selected_items: list of post_guids and
                             number of distinct locations
         """
-        distinct_localloc_count = set()
-        selected_postguids_list = list()
-        for cleaned_post_location in self.cleaned_post_list:
-            if self.cls_type == TAGS:
-                self._filter_tags(
-                    item, cleaned_post_location,
-                    selected_postguids_list,
-                    distinct_localloc_count)
-            elif self.cls_type == EMOJI:
-                self._filter_emoji(
-                    item, cleaned_post_location,
-                    selected_postguids_list,
-                    distinct_localloc_count)
-            elif self.cls_type == LOCATIONS:
-                self._filter_locations(
-                    item, cleaned_post_location,
-                    selected_postguids_list,
-                    distinct_localloc_count)
-            elif self.cls_type == TOPICS:
-                self._filter_topics(
-                    item, cleaned_post_location,
-                    selected_postguids_list,
-                    distinct_localloc_count)
-            else:
-                raise ValueError(f"Clusterer {self.cls_type} unknown.")
-        selected_items = SelectedItems(
-            selected_postguids_list, len(distinct_localloc_count))
-        return selected_items
-
-    @staticmethod
-    def _filter_tags(
-            item: Optional[str],
-            cleaned_photo_location: CleanedPost,
-            selected_postguids_list: List[str],
-            distinct_localloc_count: Set[str]):
-        if (item in (cleaned_photo_location.hashtags) or
-                (item in cleaned_photo_location.post_body)):
-            selected_postguids_list.append(
-                cleaned_photo_location.guid)
-            distinct_localloc_count.add(
-                cleaned_photo_location.loc_id)
-
-    @staticmethod
-    def _filter_topics(
-            item: Optional[str],
-            cleaned_photo_location: CleanedPost,
-            selected_postguids_list: List[str],
-            distinct_localloc_count: Set[str]):
-        """Check topics against tags, body and emoji"""
-        item_list = Utils.split_topic(item)
-        if (ClusterGen._compare_anyinlist(
-                item_list, cleaned_photo_location.hashtags)
-                or ClusterGen._compare_anyinlist(
-                    item_list, cleaned_photo_location.post_body)
-                or ClusterGen._compare_anyinlist(
-                    item_list, cleaned_photo_location.emoji)):
-            selected_postguids_list.append(
-                cleaned_photo_location.guid)
-            distinct_localloc_count.add(
-                cleaned_photo_location.loc_id)
-
-    @staticmethod
-    def _compare_anyinlist(items, item_list):
-        """Check if any term of topic is in list"""
-        if any(x in items for x in item_list):
-            return True
-        return False
-
-    @staticmethod
-    def _filter_emoji(
-            item: Optional[str],
-            cleaned_photo_location: CleanedPost,
-            selected_postguids_list: List[str],
-            distinct_localloc_count: Set[str]):
-        if item in cleaned_photo_location.emoji:
-            selected_postguids_list.append(
-                cleaned_photo_location.guid)
-            distinct_localloc_count.add(
-                cleaned_photo_location.loc_id)
-
-    @staticmethod
-    def _filter_locations(
-            item: Optional[str],
-            cleaned_photo_location: CleanedPost,
-            selected_postguids_list: List[str],
-            distinct_localloc_count: Set[str]):
-        if item == cleaned_photo_location.loc_id:
-            selected_postguids_list.append(
-                cleaned_photo_location.guid)
-            distinct_localloc_count.add(
-                cleaned_photo_location.loc_id)
+        positions = self._lookup_item_positions(item)
+        location_count = len(np.unique(self.post_store.loc_ids[positions]))
+        return SelectedItems(
+            self.post_store.guids_at(positions), location_count, positions)
 
     def _getselect_postguids(self, item: Optional[str],
-                             silent: bool = True) -> List[str]:
+                             silent: bool = True) -> SelectedItems:
         """Get list of post guids with specific item
 
         Args:
@@ -363,8 +535,13 @@ class ClusterGen():
         """
         sel_items = self._select_postguids(item)
         if silent:
-            return sel_items.guids
-        # console reporting
+            return sel_items
+        self._report_selection(item, sel_items)
+        return sel_items
+
+    def _report_selection(self, item: Optional[str],
+                          sel_items: SelectedItems):
+        """Console reporting of selected posts for item"""
         if self.cls_type == EMOJI:
             item_text = Utils.get_emojiname(item)
         else:
@@ -383,7 +560,6 @@ class ClusterGen():
               f"Found {len(sel_items.guids)} posts (UPL) "
               f"for {type_text} '{item_text}' "
               f"{perc_text}", end=" ")
-        return sel_items.guids
 
     def _get_toplist_index(self, item_text: Optional[str]) -> int:
         """Get Position of Item in Toplist"""
@@ -394,13 +570,6 @@ class ClusterGen():
             index_pos = 0
         return index_pos
 
-    def _getselect_posts(self,
-                         selected_postguids_list: List[str]
-                         ) -> List[CleanedPost]:
-        selected_posts_list = [self.cleaned_post_dict[x]
-                               for x in selected_postguids_list]
-        return selected_posts_list
-
     def get_np_points_guids(self, item: Optional[str] = None,
                             silent: bool = None, sel_all: bool = None
                             ) -> SelItems:
@@ -421,27 +590,19 @@ class ClusterGen():
             sel_all = False
         if sel_all:
             # select all post guids
-            selected_postguids_list = list()
-            for cleaned_post in self.cleaned_post_list:
-                selected_postguids_list.append(
-                    cleaned_post.guid)
-            selected_posts_list = self.cleaned_post_list
+            positions = np.arange(len(self.post_store), dtype=np.intp)
+            selected_postguids_list = self.post_store.guids.tolist()
         else:
-            selected_postguids_list = self._getselect_postguids(
+            sel_items = self._getselect_postguids(
                 item, silent=silent)
+            selected_postguids_list = sel_items.guids
             # clustering
             if len(selected_postguids_list) < 2:
                 # return empty list of points
                 return SelItems([], selected_postguids_list)
-            selected_posts_list = self._getselect_posts(
-                selected_postguids_list)
-        # only used for tag clustering,
-        # otherwise (photo location clusters),
-        # global vars are used (dataframe, points)
-        dataframe = pd.DataFrame(selected_posts_list, columns=POST_FIELDS)
-        # converts pandas data to numpy array
-        # (limit by list of column-names)
-        points = dataframe.loc[:, ['lng', 'lat']].to_numpy()
+            positions = sel_items.positions
+        # numpy array of [lng, lat] coordinates
+        points = self.post_store.coordinates(positions)
         # only return preview fig without clustering
         return SelItems(points, selected_postguids_list)
 
@@ -459,8 +620,14 @@ class ClusterGen():
                         min_span_tree: bool = None,
                         preview_mode: bool = None,
                         min_cluster_size: int = None,
-                        allow_single_cluster: bool = True):
-        """Cluster points using HDBSCAN"""
+                        allow_single_cluster: bool = True,
+                        item: Optional[str] = None,
+                        cache_tree: bool = False):
+        """Cluster points using HDBSCAN
+
+        - if cache_tree is True, the fitted clusterer of item is cached
+          (see tree_cache) and reused for the same points
+        """
         if min_span_tree is None:
             min_span_tree = False
         if preview_mode is None:
@@ -469,32 +636,38 @@ class ClusterGen():
             allow_single_cluster = True
         # conversion to radians for HDBSCAN
         tag_radians_data = np.radians(points)  # pylint: disable=E1111
-        if min_cluster_size is None:
-            min_cluster_size = max(
-                2, int(((len(points))/100)*5))
-        # init hdbscan clusterer
-        clusterer = hdbscan.HDBSCAN(
+        if (self.cluster_engine in (RADIUS, GRID)
+                and not self.autoselect_clusters
+                and not preview_mode):
+            # fixed cut distance: skip full HDBSCAN
+            if self.tile_size:
+                # cluster tile by tile
+                cluster_labels = get_tiled_labels(
+                    self.cluster_engine, tag_radians_data,
+                    Utils.get_radians_from_meters(self.cluster_distance),
+                    Utils.get_radians_from_meters(self.tile_size),
+                    self.cluster_workers)
+                if cluster_labels is not None:
+                    return cluster_labels, None, None, None
+            cluster_labels = get_engine_labels(
+                self.cluster_engine, tag_radians_data,
+                Utils.get_radians_from_meters(self.cluster_distance))
+            return cluster_labels, None, None, None
+        if (self.dedup_points
+                and not self.autoselect_clusters
+                and not preview_mode):
+            # fixed cut distance: cluster distinct coordinates only
+            cluster_labels = get_dedup_labels(
+                tag_radians_data, Utils.get_radians_from_meters(
+                    self.cluster_distance))
+            return cluster_labels, None, None, None
+        self._get_fitted_clusterer(
+            points, tag_radians_data, item, cache_tree=cache_tree,
+            min_span_tree=min_span_tree,
             min_cluster_size=min_cluster_size,
-            gen_min_span_tree=min_span_tree,
-            allow_single_cluster=allow_single_cluster,
-            min_samples=1)
-        # Start clusterer on different thread
-        # to prevent GUI from freezing
-        t = threading.Thread(
-            target=ClusterGen._fit_cluster,
-            args=(clusterer, tag_radians_data),
-            group=None,
-            name="tm-clustering",
-        )
-        t.start()
-        self.clusterer = cluster_queue.get()
-
-        if self.autoselect_clusters:
-            cluster_labels = self.clusterer.labels_
-        else:
-            cluster_labels = self.clusterer.single_linkage_tree_.get_clusters(
-                Utils.get_radians_from_meters(
-                    self.cluster_distance), min_cluster_size=2)
+            allow_single_cluster=allow_single_cluster)
+        cluster_labels = get_hdbscan_labels(
+            self.clusterer, self.autoselect_clusters, self.cluster_distance)
         # exit function in case of
         # final processing loop (no figure generating)
         if not preview_mode:
@@ -512,9 +685,139 @@ class ClusterGen():
         # for plotting
         return cluster_labels, sel_colors, mask_noisy, number_of_clusters
 
+    def _get_fitted_clusterer(self, points, tag_radians_data,
+                              item: Optional[str] = None,
+                              cache_tree: bool = False,
+                              min_span_tree: bool = False,
+                              min_cluster_size: int = None,
+                              allow_single_cluster: bool = True
+                              ) -> hdbscan.HDBSCAN:
+        """Fit HDBSCAN clusterer (or get from tree_cache, if cache_tree
+        is True), stored as self.clusterer
+
+        - without cache_tree (e.g. batch clustering of all items),
+          points are neither hashed nor stored
+        """
+        cache_key = None
+        if cache_tree:
+            cache_key = (
+                item, hashlib.blake2b(
+                    points.tobytes(), digest_size=16).digest(),
+                min_span_tree, min_cluster_size, allow_single_cluster)
+        clusterer = None
+        if cache_key is not None:
+            clusterer = self.tree_cache.get(cache_key)
+        if clusterer is not None:
+            self.tree_cache.move_to_end(cache_key)
+            self.clusterer = clusterer
+            return clusterer
+        # init hdbscan clusterer
+        clusterer = new_hdbscan(
+            len(points), min_span_tree=min_span_tree,
+            min_cluster_size=min_cluster_size,
+            allow_single_cluster=allow_single_cluster)
+        # Start clusterer on different thread
+        # to prevent GUI from freezing
+        t = threading.Thread(
+            target=ClusterGen._fit_cluster,
+            args=(clusterer, tag_radians_data),
+            group=None,
+            name="tm-clustering",
+        )
+        t.start()
+        self.clusterer = cluster_queue.get()
+        if cache_key is not None:
+            self.tree_cache[cache_key] = self.clusterer
+            if len(self.tree_cache) > TREE_CACHE_SIZE:
+                self.tree_cache.popitem(last=False)
+        return self.clusterer
+
+    def scale_profile(
+            self, item: Optional[str] = None,
+            distances: Optional[Iterable[float]] = None
+    ) -> Optional[ScaleProfile]:
+        """Get cluster and noise counts of item for several
+        cluster distances
+
+        - HDBSCAN is fitted once (or taken from tree_cache),
+          counts for all distances are read from the
+          single linkage tree in one pass
+        - counts equal cluster_item() at each distance
+          (with autoselect_clusters disabled)
+
+        Args:
+            item (str): The item to select, defaults to top item
+            distances (Iterable[float]): Cluster distances (m), defaults
+                to 100 steps between cluster_distance/10 and *10
+
+        Returns:
+            ScaleProfile, or None if less than 2 posts found for item
+        """
+        if item is None:
+            item = self.top_item.name
+        if distances is None:
+            distances = np.linspace(
+                self.cluster_distance / 10, self.cluster_distance * 10, 100)
+        distances = np.asarray(list(distances), dtype=np.float64)
+        sel_items = self.get_np_points_guids(item=item, silent=True)
+        if len(sel_items.guids) < 2:
+            return None
+        clusterer = self._get_fitted_clusterer(
+            sel_items.points, np.radians(sel_items.points), item,
+            cache_tree=True)
+        cluster_counts, noise_counts = ClusterGen._get_cut_counts(
+            clusterer.single_linkage_tree_.to_numpy(),
+            np.array([Utils.get_radians_from_meters(distance)
+                      for distance in distances]))
+        return ScaleProfile(
+            item, distances, cluster_counts, noise_counts,
+            len(sel_items.guids))
+
+    @staticmethod
+    def _get_cut_counts(linkage: np.ndarray, cut_distances: np.ndarray,
+                        min_cluster_size: int = 2
+                        ) -> Tuple[np.ndarray, np.ndarray]:
+        """Get number of clusters and noise points for cut distances
+
+        Equals single_linkage_tree_.get_clusters(cut_distance,
+        min_cluster_size) for each cut distance: merges of the
+        linkage (sorted by distance) below the cut are applied,
+        the change of cluster and noise counts of each merge
+        is accumulated.
+        """
+        point_count = len(linkage) + 1
+        node_sizes = np.concatenate((
+            np.ones(point_count, dtype=np.int64),
+            linkage[:, 3].astype(np.int64)))
+        left_sizes = node_sizes[linkage[:, 0].astype(np.int64)]
+        right_sizes = node_sizes[linkage[:, 1].astype(np.int64)]
+        merged_sizes = linkage[:, 3].astype(np.int64)
+
+        def is_cluster(sizes: np.ndarray) -> np.ndarray:
+            return (sizes >= min_cluster_size).astype(np.int64)
+
+        def noise(sizes: np.ndarray) -> np.ndarray:
+            return np.where(sizes < min_cluster_size, sizes, 0)
+
+        cluster_deltas = (is_cluster(merged_sizes) - is_cluster(left_sizes)
+                          - is_cluster(right_sizes))
+        noise_deltas = (noise(merged_sizes) - noise(left_sizes)
+                        - noise(right_sizes))
+        # counts before first merge (all points single)
+        initial_clusters = point_count if min_cluster_size <= 1 else 0
+        cluster_counts = initial_clusters + np.concatenate(
+            ([0], np.cumsum(cluster_deltas)))
+        noise_counts = point_count - initial_clusters + np.concatenate(
+            ([0], np.cumsum(noise_deltas)))
+        # number of merges with distance below cut
+        merge_counts = np.searchsorted(
+            linkage[:, 2], cut_distances, side='left')
+        return cluster_counts[merge_counts], noise_counts[merge_counts]
+
     def cluster_item(
             self, item: Optional[str],
-            preview_mode=None) -> Optional[ClusterResults]:
+            preview_mode=None,
+            cache_tree: bool = False) -> Optional[ClusterResults]:
         """Cluster specific item
 
         Args:
@@ -522,6 +825,9 @@ class ClusterGen():
             preview_mode ([type], optional): Defaults to None. If True,
                 sel_colors, mask_noisy, number_of_clusters will be returned,
                 which can be used as additional information during plot
+            cache_tree (bool, optional): Defaults to False. If True,
+                the fitted HDBSCAN tree is cached for reuse
+                (e.g. repeated previews in the user interface)
 
         Returns:
             clusters: The cluster labels returned from HDBSCAN
@@ -541,7 +847,8 @@ class ClusterGen():
             return None
         (clusters, sel_colors,
          mask_noisy, number_of_clusters) = self._cluster_points(
-             points=sel_items.points, preview_mode=preview_mode)
+             points=sel_items.points, preview_mode=preview_mode,
+             item=item, cache_tree=cache_tree)
         return ClusterResults(
             clusters, sel_items.guids,
             sel_items.points, sel_colors, mask_noisy, number_of_clusters)
@@ -633,11 +940,29 @@ class ClusterGen():
         Updates results as two Dict of Lists:
             self.single_items_dict
             self.clustered_items_dict
+
+        If cluster_workers > 1, items are clustered in parallel
         """
+        items = self._get_itemized_names()
+        if self.cluster_workers > 1 and len(items) > 1:
+            self._get_itemized_clusters_parallel(items)
+        else:
+            for item in items:
+                self._get_update_clusters(
+                    item=item)
+        # logging.getLogger("tagmaps").info(
+        #    f'{len(self.clustered_items)} '
+        #    f'{self.cls_type.rstrip("s")} clusters.\n'
+        #    f'{len(self.single_items)} without neighbors.')
+        # flush console output once
+        sys.stdout.flush()
+
+    def _get_itemized_names(self) -> List[str]:
+        """Get names of items to cluster, in processing order"""
+        items = list()
         # get clusters for top item
         if self.local_saturation_check:
-            self._get_update_clusters(
-                item=self.top_item.name)  # TODO: test .name
+            items.append(self.top_item.name)  # TODO: test .name
         tnum = 0
         # get remaining clusters
         for item in self.top_list:
@@ -647,14 +972,44 @@ class ClusterGen():
                 # clustered due to local saturation
                 continue
             tnum += 1
-            self._get_update_clusters(
-                item=item.name)
-        # logging.getLogger("tagmaps").info(
-        #    f'{len(self.clustered_items)} '
-        #    f'{self.cls_type.rstrip("s")} clusters.\n'
-        #    f'{len(self.single_items)} without neighbors.')
-        # flush console output once
-        sys.stdout.flush()
+            items.append(item.name)
+        return items
+
+    def _get_itemized_clusters_parallel(self, items: List[str]):
+        """Cluster items in a pool of cluster_workers processes
+
+        - posts are selected here, workers only receive post rows
+        - coordinate arrays are handed to each worker once
+          (pool initializer), not per task
+        - results are reported and merged in order of items
+        """
+        selections = [self._getselect_postguids(item) for item in items]
+        tasks = [sel_items.positions for sel_items in selections
+                 if len(sel_items.guids) >= 2]
+        settings = {
+            "cluster_distance": self.cluster_distance,
+            "autoselect_clusters": self.autoselect_clusters,
+            "cluster_engine": self.cluster_engine,
+            "dedup_points": self.dedup_points,
+            "tile_size": self.tile_size}
+        chunksize = max(1, len(tasks) // (self.cluster_workers * 8))
+        with ProcessPoolExecutor(
+                max_workers=self.cluster_workers,
+                initializer=_init_cluster_worker,
+                initargs=(self.post_store.lng, self.post_store.lat,
+                          settings)) as executor:
+            cluster_labels = executor.map(
+                _cluster_rows, tasks, chunksize=chunksize)
+            for item, sel_items in zip(items, selections):
+                self._report_selection(item, sel_items)
+                if len(sel_items.guids) < 2:
+                    print("--> No cluster (all locations removed).")
+                    continue
+                guids = self._get_cluster_guids(
+                    next(cluster_labels), sel_items.guids)
+                self.single_items_dict[item] = guids.nonclustered
+                if guids.clustered:
+                    self.clustered_items_dict[item] = guids.clustered
 
     def get_all_cluster_centroids(self) -> ClusterShapes:
         """Get all centroids for clustered data
@@ -688,16 +1043,15 @@ class ClusterGen():
             cluster_guids, none_clustered_guids)
         return resultshapes_and_meta
 
-    def _proj_coords(self, lng: float, lat: float):
-        """Project coordinates based on available packages
+    def _get_proj_xy(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Get projected (UTM) x/y coordinates of all posts
 
-        pyproj.transformer needs pyproj > 2.0.0,
-        which provides a more convenient and faster way to
-        project many coordinates.
+        All posts are projected once in a single vectorized call
+        and cached in post_store, shape and centroid methods
+        only index into these arrays (by store rows).
         """
-        lng_proj, lat_proj = self.proj_transformer.transform(
-            lng, lat)
-        return lng_proj, lat_proj
+        return self.post_store.get_projected(
+            self.crs_proj, self.proj_transformer)
 
     def get_cluster_centroids(
             self, clustered_guids,
@@ -709,14 +1063,14 @@ class ClusterGen():
         dataclass
         """
         resultshapes_and_meta = list()
+        store = self.post_store
+        x_proj, y_proj = self._get_proj_xy()
         for post_cluster in clustered_guids:
-            posts = [self.cleaned_post_dict[x] for x in post_cluster]
-            unique_user_count = len(set([post.user_guid for post in posts]))
-            # get points and project coordinates to suitable UTM
-            points = [geometry.Point(
-                self._proj_coords(post.lng, post.lat)
-            ) for post in posts]
-            point_collection = geometry.MultiPoint(list(points))
+            rows = store.rows(post_cluster)
+            unique_user_count = store.user_count(rows)
+            # get points projected to suitable UTM
+            point_collection = geometry.MultiPoint(
+                np.column_stack((x_proj[rows], y_proj[rows])))
             # convex hull enough for calculating centroid
             result_polygon = point_collection.convex_hull
             result_centroid = result_polygon.centroid
@@ -726,11 +1080,8 @@ class ClusterGen():
                 )
         if not none_clustered_guids:
             return resultshapes_and_meta
-        # noclusterphotos = [cleanedPhotoDict[x] for x in singlePhotoGuidList]
-        for no_cluster_post in none_clustered_guids:
-            post = self.cleaned_post_dict[no_cluster_post]
-            x_point, y_point = self._proj_coords(
-                post.lng, post.lat)
+        rows = store.rows(none_clustered_guids)
+        for x_point, y_point in zip(x_proj[rows], y_proj[rows]):
             p_center = geometry.Point(x_point, y_point)
             if p_center is not None and not p_center.is_empty:
                 resultshapes_and_meta.append((p_center, 1))
@@ -752,10 +1103,10 @@ class ClusterGen():
         alphashapes_data = AlphaShapes.get_cluster_shape(
             item=item,
             clustered_post_guids=cluster_guids,
-            cleaned_post_dict=self.cleaned_post_dict,
+            post_store=self.post_store,
             cluster_distance=self.cluster_distance,
             local_saturation_check=self.local_saturation_check,
-            proj_coords=self._proj_coords)
+            proj_xy=self._get_proj_xy())
         return alphashapes_data
 
     def _get_item_clusterarea(
@@ -790,9 +1141,9 @@ class ClusterGen():
             tnum) -> Optional[List[List[AlphaShapesAndMeta]]]:
         """Get all item shapes for item clusters
 
-        Note: A function ref to self._proj_coords is handed
-        to AlphaShapes.get_single_cluster_shape(). Coordinates are then
-        projected inside AlphaShapes Class, depending on the pyproj version.
+        Note: Projected x/y coordinates of all posts
+        (see self._get_proj_xy()) are handed to
+        AlphaShapes.get_single_cluster_shape()
         """
         resultshapes_and_meta_tmp = list()
         result = self._get_item_clustershapes(item)
@@ -814,12 +1165,11 @@ class ClusterGen():
             item.name, None)
         if not none_clustered_guids:
             return resultshapes_and_meta_tmp
-        posts = [self.cleaned_post_dict[x]
-                 for x in none_clustered_guids]
-        for single_post in posts:
+        proj_xy = self._get_proj_xy()
+        for row in self.post_store.rows(none_clustered_guids):
             shapes_single_tmp = AlphaShapes.get_single_cluster_shape(
-                item, single_post, self.cluster_distance,
-                self._proj_coords)
+                item, self.post_store, row, self.cluster_distance,
+                proj_xy)
             if not shapes_single_tmp:
                 continue
             # Use append, since always single Tuple
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module for cluster labels of point sets, shared by ClusterGen
+and cluster worker processes
+
+Coordinates and cut distances are in radians.
+"""
+
+from __future__ import absolute_import
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Optional
+
+import hdbscan
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree  # pylint: disable=E0611
+from tagmaps.classes.shared_structure import GRID, RADIUS
+from tagmaps.classes.tiling import TileGrid
+from tagmaps.classes.utils import Utils
+
+
+def new_hdbscan(point_count: int,
+                min_span_tree: bool = False,
+                min_cluster_size: Optional[int] = None,
+                allow_single_cluster: bool = True,
+                approx_min_span_tree: bool = True) -> hdbscan.HDBSCAN:
+    """Create HDBSCAN clusterer with Tag Maps defaults"""
+    if min_cluster_size is None:
+        min_cluster_size = max(
+            2, int(((point_count)/100)*5))
+    return hdbscan.HDBSCAN(
+        min_cluster_size=min_cluster_size,
+        gen_min_span_tree=min_span_tree,
+        allow_single_cluster=allow_single_cluster,
+        approx_min_span_tree=approx_min_span_tree,
+        min_samples=1)
+
+
+def get_hdbscan_labels(clusterer: hdbscan.HDBSCAN,
+                       autoselect_clusters: bool,
+                       cluster_distance: float) -> np.ndarray:
+    """Get cluster labels from fitted HDBSCAN clusterer"""
+    if autoselect_clusters:
+        return clusterer.labels_
+    return clusterer.single_linkage_tree_.get_clusters(
+        Utils.get_radians_from_meters(
+            cluster_distance), min_cluster_size=2)
+
+
+def get_radius_labels(radians_data: np.ndarray,
+                      cut_distance: float,
+                      min_cluster_size: int = 2) -> np.ndarray:
+    """Label connected components of radius graph
+
+    Exact single linkage cut: points closer than cut_distance
+    are linked, components with less than min_cluster_size
+    points are noise (-1). Equals single_linkage_tree_.get_clusters()
+    of HDBSCAN (min_samples=1) fitted with an exact minimum
+    spanning tree (approx_min_span_tree=False); the default
+    HDBSCAN engine uses an approximate tree and may give
+    slightly different clusters.
+
+    Cluster labels are numbered in order of their first point.
+    """
+    # identical coordinates are always linked,
+    # only build radius graph for distinct points
+    unique_data, inverse = np.unique(
+        radians_data, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    tree = cKDTree(unique_data)
+    pairs = tree.sparse_distance_matrix(
+        tree, cut_distance, output_type='ndarray')
+    pairs = pairs[pairs['v'] < cut_distance]
+    graph = csr_matrix(
+        (np.ones(len(pairs), dtype=np.int8), (pairs['i'], pairs['j'])),
+        shape=(len(unique_data), len(unique_data)))
+    __, unique_labels = connected_components(graph, directed=False)
+    return label_components(
+        unique_labels[inverse], min_cluster_size)
+
+
+def get_engine_labels(cluster_engine: str, radians_data: np.ndarray,
+                      cut_distance: float,
+                      min_cluster_size: int = 2) -> np.ndarray:
+    """Get labels of RADIUS or GRID engine at fixed cut distance"""
+    if cluster_engine == GRID:
+        return get_grid_labels(
+            radians_data, cut_distance, min_cluster_size)
+    return get_radius_labels(
+        radians_data, cut_distance, min_cluster_size)
+
+
+def get_tiled_labels(cluster_engine: str, radians_data: np.ndarray,
+                     cut_distance: float, tile_size: float,
+                     workers: int = 1,
+                     min_cluster_size: int = 2) -> Optional[np.ndarray]:
+    """Label connected components at fixed cut distance,
+    computed tile by tile
+
+    - tiles have a halo of cut_distance, so every link
+      (pair of points closer than cut_distance) is found
+      in the tile of either point
+    - components of all tiles are merged (union-find via
+      connected_components) on points shared between tiles
+    - tiles are processed in workers processes, if workers > 1
+    - only for RADIUS and GRID engines (exact single linkage
+      cut), the HDBSCAN engine is not tiled
+
+    Returns None if all points fall into a single tile.
+    """
+    if cluster_engine not in (RADIUS, GRID):
+        raise ValueError(
+            f"Tiles are not supported for cluster engine "
+            f"{cluster_engine}, use {RADIUS} or {GRID}.")
+    tiles = TileGrid(radians_data, tile_size, halo=cut_distance)
+    if len(tiles) < 2:
+        return None
+    tile_ids, tile_rows = zip(*tiles.iter_tiles())
+    tile_points = (radians_data[rows] for rows in tile_rows)
+    if workers > 1 and len(tile_rows) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            tile_labels = list(executor.map(
+                _get_tile_components, tile_points,
+                repeat(cut_distance), repeat(cluster_engine)))
+    else:
+        tile_labels = [
+            _get_tile_components(points, cut_distance, cluster_engine)
+            for points in tile_points]
+    # components are labeled 0..n-1 per tile (no noise),
+    # global node id per tile component
+    assert all((labels >= 0).all() for labels in tile_labels)
+    node_offsets = np.cumsum(
+        [0] + [len(np.unique(labels)) for labels in tile_labels])
+    rows = np.concatenate(tile_rows)
+    nodes = np.concatenate([
+        labels + offset
+        for labels, offset in zip(tile_labels, node_offsets)])
+    occurrence_tiles = np.repeat(
+        tile_ids, [len(tile_row) for tile_row in tile_rows])
+    # node of each point in its core tile
+    is_core = occurrence_tiles == tiles.tile_ids[rows]
+    core_nodes = np.empty(len(radians_data), dtype=np.int64)
+    core_nodes[rows[is_core]] = nodes[is_core]
+    node_count = int(node_offsets[-1])
+    graph = csr_matrix(
+        (np.ones(len(rows), dtype=np.int8), (core_nodes[rows], nodes)),
+        shape=(node_count, node_count))
+    __, node_labels = connected_components(graph, directed=False)
+    return label_components(
+        node_labels[core_nodes], min_cluster_size)
+
+
+def get_grid_labels(radians_data: np.ndarray,
+                    cut_distance: float,
+                    min_cluster_size: int = 2) -> np.ndarray:
+    """Label connected components of radius graph, pre-aggregated
+    in grid cells
+
+    Equals get_radius_labels() (exact single linkage cut),
+    with memory linear in the number of points:
+
+    - points are binned into cells of size cut_distance/2,
+      all points of a cell are closer than cut_distance
+      and belong to the same component
+    - cells are linked if any pair of points of two neighbouring
+      cells is closer than cut_distance; this is checked with one
+      nearest neighbour query per point and neighbour offset,
+      in a KD-tree where points of different cells are
+      separated by a third (cell) dimension
+    - components of cells are weighted by their post count
+      for min_cluster_size
+    """
+    unique_data, inverse = np.unique(
+        radians_data, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    cell_size = cut_distance / 2
+    if len(unique_data) < 2 or cell_size <= 0:
+        return get_radius_labels(
+            radians_data, cut_distance, min_cluster_size)
+    cell_xy = np.floor(
+        (unique_data - unique_data.min(axis=0)) / cell_size
+    ).astype(np.int64)
+    # cells within two cells (offset) may contain points
+    # closer than cut_distance
+    max_offset = 2
+    cell_xy += max_offset
+    width = int(cell_xy[:, 1].max()) + max_offset + 1
+    cell_keys, point_cells = np.unique(
+        cell_xy[:, 0] * width + cell_xy[:, 1], return_inverse=True)
+    point_cells = point_cells.reshape(-1)
+    cell_count = len(cell_keys)
+    # third dimension separates points of different
+    # cells by more than cut_distance
+    cell_gap = 2 * cut_distance
+    tree = cKDTree(np.column_stack(
+        (unique_data, point_cells * cell_gap)))
+    links_from: List[np.ndarray] = list()
+    links_to: List[np.ndarray] = list()
+    # half of the neighbourhood, links are undirected
+    offsets = [
+        (off_x, off_y)
+        for off_x in range(0, max_offset + 1)
+        for off_y in range(-max_offset, max_offset + 1)
+        if off_x > 0 or off_y > 0]
+    for off_x, off_y in offsets:
+        neighbour_keys = cell_keys + off_x * width + off_y
+        neighbour_pos = np.minimum(
+            np.searchsorted(cell_keys, neighbour_keys), cell_count - 1)
+        has_neighbour = cell_keys[neighbour_pos] == neighbour_keys
+        point_mask = has_neighbour[point_cells]
+        if not point_mask.any():
+            continue
+        from_cells = point_cells[point_mask]
+        to_cells = neighbour_pos[from_cells]
+        distances, __ = tree.query(
+            np.column_stack((
+                unique_data[point_mask], to_cells * cell_gap)),
+            k=1, distance_upper_bound=cut_distance)
+        is_link = distances < cut_distance
+        links_from.append(from_cells[is_link])
+        links_to.append(to_cells[is_link])
+    links_from = np.concatenate(links_from + [np.empty(0, np.intp)])
+    links_to = np.concatenate(links_to + [np.empty(0, np.intp)])
+    graph = csr_matrix(
+        (np.ones(len(links_from), dtype=np.int8),
+         (links_from, links_to)),
+        shape=(cell_count, cell_count))
+    __, cell_labels = connected_components(graph, directed=False)
+    return label_components(
+        cell_labels[point_cells][inverse], min_cluster_size)
+
+
+def get_dedup_labels(radians_data: np.ndarray,
+                     cut_distance: float,
+                     min_cluster_size: int = 2) -> np.ndarray:
+    """Cut HDBSCAN single linkage tree of distinct points
+
+    Identical coordinates are merged at distance 0 in an exact
+    single linkage tree, so the exact tree of distinct points
+    (approx_min_span_tree=False) gives the same clusters as the
+    exact tree of all points. The default HDBSCAN engine fits an
+    approximate tree, so clusters may differ slightly from
+    clustering without dedup_points.
+
+    Components are cut without size limit, min_cluster_size
+    is then applied to the number of posts (multiplicity
+    of points) per component.
+    """
+    unique_data, inverse = np.unique(
+        radians_data, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    if len(unique_data) < 2:
+        unique_labels = np.zeros(len(unique_data), dtype=np.intp)
+    else:
+        clusterer = new_hdbscan(
+            len(radians_data), approx_min_span_tree=False)
+        clusterer.fit(unique_data)
+        unique_labels = clusterer.single_linkage_tree_.get_clusters(
+            cut_distance, min_cluster_size=1)
+    return label_components(
+        unique_labels[inverse], min_cluster_size)
+
+
+def label_components(components: np.ndarray,
+                     min_cluster_size: int) -> np.ndarray:
+    """Get cluster labels from component ids per point
+
+    Components with less than min_cluster_size points are
+    noise (-1), cluster labels are numbered in order
+    of their first point.
+    """
+    __, first_idx, labels, sizes = np.unique(
+        components, return_index=True,
+        return_inverse=True, return_counts=True)
+    # relabel components in order of first point,
+    # skipping noise
+    order = np.argsort(first_idx)
+    is_cluster = sizes[order] >= min_cluster_size
+    ordered_labels = np.where(
+        is_cluster, np.cumsum(is_cluster) - 1, -1)
+    component_labels = np.empty_like(ordered_labels)
+    component_labels[order] = ordered_labels
+    return component_labels[labels.reshape(-1)]
+
+
+def _get_tile_components(radians_data: np.ndarray, cut_distance: float,
+                         cluster_engine: str) -> np.ndarray:
+    """Get connected components (without noise) of points of a tile"""
+    return get_engine_labels(
+        cluster_engine, radians_data, cut_distance, min_cluster_size=1)
@@ -8,13 +8,13 @@ for (optional) user input
 
 from __future__ import absolute_import
 
-import threading
 import sys
 import traceback
 import tkinter as tk
 import tkinter.messagebox
 from tkinter import TclError
 from tkinter.messagebox import showerror
+from pathlib import Path
 from typing import Dict, List, Optional, Iterable
 
 import matplotlib.pyplot as plt
@@ -43,10 +43,14 @@ class UserInterface():
 
     def __init__(self,
                  clusterer_list: Iterable[ClusterGen] = None,
-                 location_names_dict: Dict[str, str] = None
+                 location_names_dict: Dict[str, str] = None,
+                 output_folder: Path = None
                  ):
         """Prepare user interface and start Tkinter mainloop()
         """
+        if output_folder is None:
+            output_folder = Path.cwd() / "02_Output"
+        self.output_folder = output_folder
         # threading.Thread.__init__(self)
         self._clst_list = list()
         # append clusters to list
@@ -238,7 +242,8 @@ class UserInterface():
         (_, _, points, sel_colors,
          mask_noisy, number_of_clusters) = self._clst.cluster_item(
              item=sel_item,
-             preview_mode=True)
+             preview_mode=True,
+             cache_tree=True)
         ## Cluster Map Plot ##
         if not plt.fignum_exists(1):
             self.fig1 = plt.figure(1)
@@ -443,59 +448,37 @@ class UserInterface():
             self._cluster_preview(self._clst.top_list[0].name)
 
     def _scaletest_current_display_item(self):
-        """Compute clustering across different scales and output results to txt"""
-        if self.create_min_spanning_tree is False:
-            tkinter.messagebox.showinfo(
-                "Skip: ",
-                f'Currently deactivated')
-            return
+        """Compute clustering across different scales and output results
+        to csv (scaletest_type_item.csv in output folder)"""
         if self.current_display_item:
             sel_item = self.current_display_item
         else:
             sel_item = self._clst.top_list[0].name
-        scalecalclist = []
-        dmax = int(self._clst.cluster_distance*10)
-        dmin = int(self._clst.cluster_distance/10)
-        dstep = int(((self._clst.cluster_distance*10) -
-                     (self._clst.cluster_distance/10))/100)
-        mask_noisy = None
-        number_of_clusters = 0
-        for i in range(dmin, dmax, dstep):
-            self._change_cluster_dist(i)
-            self.tk_scalebar.set(i)
-            self.app.update()
-            # self._clst.cluster_distance = i
-            clusters, __ = (
-                self._clst.cluster_item(sel_item, None, True)
-            )
-            mask_noisy = (clusters == -1)
-            # with noisy (=0)
-            number_of_clusters = len(np.unique(clusters[~mask_noisy]))
-            if number_of_clusters == 1:
-                break
-            form_string = (f'{i},{number_of_clusters},'
-                           f'{mask_noisy.sum()},{len(mask_noisy)},\n')
-            scalecalclist.append(form_string)
-        with open(f'02_Output/scaletest_{sel_item.name}.txt',
-                  "w", encoding='utf-8') as logfile_a:
-            for scalecalc in scalecalclist:
-                logfile_a.write(scalecalc)
-        plt.figure(1).clf()
-        # plt references the last figure accessed
-        self.fig1 = plt.figure()
-        TPLT.set_plt_suptitle(self.fig1, sel_item.name, self._clst.cls_type)
-        self.fig1.canvas.manager.set_window_title('Cluster Preview')
-        dist_text = ''
-        if self._clst.autoselect_clusters is False:
-            dist_text = f'@ {self._clst.cluster_distance}m'
-        plt.title(f'Cluster Preview {dist_text}', fontsize=12, loc='center')
-        if mask_noisy is None:
+        profile = self._clst.scale_profile(sel_item)
+        if profile is None:
+            tkinter.messagebox.showinfo(
+                "No locations found.",
+                "Less than two locations found for given item.")
             return
-        noisy_txt = f'{mask_noisy.sum()}/{len(mask_noisy)}'
-        plt.text(self._clst.bounds.lim_lng_max, self._clst.bounds.lim_lat_max,
-                 f'{number_of_clusters} Cluster (Noise: {noisy_txt})',
-                 fontsize=10, horizontalalignment='right',
-                 verticalalignment='top', fontweight='bold')
+        profile.write_csv(
+            self.output_folder / profile.get_filename(self._clst.cls_type))
+        if not plt.fignum_exists(1):
+            self.fig1 = plt.figure(1)
+        else:
+            self.fig1.clf()
+        axis = self.fig1.add_subplot(111)
+        axis.plot(profile.distances, profile.cluster_counts, label='Clusters')
+        axis.plot(profile.distances, profile.noise_counts, label='Noise')
+        axis.axvline(self._clst.cluster_distance, color='gray')
+        axis.set_xlabel('Cluster Cut Distance (in Meters)')
+        axis.legend(fontsize=10)
+        TPLT.set_plt_suptitle(self.fig1, sel_item, self._clst.cls_type)
+        self.fig1.canvas.manager.set_window_title('Scale Test')
+        axis.set_title(
+            f'Scale Test ({profile.post_count} posts)',
+            fontsize=12, loc='center')
+        TPLT.set_plt_tick_params(axis)
+        self.fig1.canvas.draw_idle()
 
     def _delete_fromtoplist(self, listbox):
         """Remove entry from top_list
@@ -527,24 +510,35 @@ class UserInterface():
             posts that are removed)
         """
         # tkinter.messagebox.showinfo("Len before: ", len(cleaned_post_dict))
-        # first get post guids to be removed
-        # this is quite expensive,
-        # perhaps there's a better way
-        # tkinter.messagebox.showinfo("post_locids: ", f'{post_locids}')
-        postguids_to_remove = [post_record.guid for post_record
-                               in self._clst.cleaned_post_dict.values()
-                               if post_record.loc_id in post_locids]
+        # first get posts to be removed
+        # (vectorized on int-coded location ids of the store)
+        post_store = self._clst.post_store
+        loc_codes = [post_store.locations.get(locid)
+                     for locid in post_locids
+                     if locid in post_store.locations]
+        remove_mask = np.isin(post_store.loc_ids, loc_codes)
+        postguids_to_remove = post_store.guids_at(
+            np.flatnonzero(remove_mask))
         if UserInterface._query_user(
                 f'This will also remove '
                 f'{len(postguids_to_remove)} posts from further processing.\n'
                 f'Continue?', f'Continue?') is True:
             # the following code will remove
-            # dict records and list entries from current clusterer
-            for post_guid in postguids_to_remove:
-                del self._clst.cleaned_post_dict[post_guid]
-            # To modify the list in-place, assign to its slice:
-            self._clst.cleaned_post_list[:] = list(
-                self._clst.cleaned_post_dict.values())
+            # store rows, dict records and list entries,
+            # which are shared across clusterers
+            post_store.remove_rows(remove_mask)
+            if self._clst.cleaned_post_dict is not None:
+                for post_guid in postguids_to_remove:
+                    del self._clst.cleaned_post_dict[post_guid]
+                # To modify the list in-place, assign to its slice:
+                self._clst.cleaned_post_list[:] = list(
+                    self._clst.cleaned_post_dict.values())
+            # store rows changed, rebuild item index
+            # and drop cached trees of all clusterer
+            # sharing the post store
+            for clusterer in self._clst_list:
+                clusterer.update_item_index()
+                clusterer.clear_tree_cache()
 
     @staticmethod
     def _query_user(question_text: str,
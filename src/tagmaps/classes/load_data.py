@@ -14,14 +14,152 @@ import csv
 import json
 import logging
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
 from decimal import Decimal
-from typing import IO, Any, Dict, Iterable, Iterator, Optional, OrderedDict, Set, Tuple
+from pathlib import Path
+from typing import (IO, Any, Dict, FrozenSet, Iterable, Iterator, List,
+                    Optional, OrderedDict, Set, Tuple)
 
+import numpy as np
+import pandas as pd
 from shapely.geometry import Point
 
-from tagmaps.classes.shared_structure import AnalysisBounds, PostStructure
+from tagmaps.classes.prepare_data import PrepareData
+from tagmaps.classes.shared_structure import (INGEST_CSV, INGEST_PYARROW,
+                                              AnalysisBounds, PostBatch,
+                                              PostStructure)
+from tagmaps.classes.text_cleaner import TextCleaner
 from tagmaps.classes.utils import Utils
 
+# max number of distinct strings (post body, emoji col)
+# with cached emoji per LoadData instance
+EMOJI_CACHE_SIZE = 100000
+# max length of cached texts, longer (unique) post bodies
+# are not cached, to limit memory of cache keys
+EMOJI_CACHE_MAX_TEXT_LEN = 280
+# whitespace between JSON posts, and chars ending a JSON token
+JSON_WHITESPACE = " \t\r\n"
+JSON_TOKEN_END = frozenset(JSON_WHITESPACE + ",:{}[]\"")
+
+# config and PrepareData template of ingest worker processes
+_worker_data: Dict[str, Any] = dict()
+
+
+def _init_ingest_worker(cfg, lbsn_data: PrepareData):
+    """Store config and PrepareData template in ingest worker process"""
+    _worker_data["cfg"] = cfg
+    _worker_data["lbsn_data"] = lbsn_data
+
+
+def _read_file_guids(file_name: Path) -> Set[str]:
+    """Get post guids of single input file (in ingest worker process)"""
+    return LoadData(_worker_data["cfg"], filelist=[file_name]).read_guids()
+
+
+def _ingest_file(file_name: Path, skip_guids: Set[str]) -> "IngestPartial":
+    """Parse single input file (in ingest worker process)
+
+    skip_guids are guids of previous files,
+    these posts are skipped as duplicates
+    """
+    input_data = LoadData(_worker_data["cfg"], filelist=[file_name])
+    input_data.guid_hash = skip_guids
+    lbsn_data = _worker_data["lbsn_data"].new_partial()
+    input_data.ingest_files(lbsn_data)
+    return IngestPartial(
+        lbsn_data=lbsn_data,
+        bounds=input_data.bounds,
+        distinct_locations_set=input_data.distinct_locations_set,
+        stats=input_data.stats,
+    )
+
+
+def iter_frame_batches(
+    frame: Any,
+    column_map: Optional[Dict[str, str]] = None,
+    batch_size: Optional[int] = None,
+) -> Iterator[PostBatch]:
+    """Get batches of posts from a pandas DataFrame or pyarrow Table
+
+    - rows refer to already filtered posts (as PostStructure)
+    - column_map maps PostBatch attributes to columns of frame,
+    attributes without mapping use the column of the same name, if present
+    - required are guid, user_guid and either loc_id
+    or latitude and longitude; if loc_id is missing,
+    it is created from latitude and longitude
+    - hashtags and emoji can be iterables or ";"-separated strings
+    """
+    if batch_size is None:
+        batch_size = 100000
+    if hasattr(frame, "iloc"):
+        columns = list(frame.columns)
+        row_count = len(frame)
+    else:
+        columns = list(frame.column_names)
+        row_count = frame.num_rows
+    col_names = {
+        attr: col for attr, col in (column_map or {}).items() if col}
+    for attr in fields(PostBatch):
+        if attr.name not in col_names and attr.name in columns:
+            col_names[attr.name] = attr.name
+    for attr in ("guid", "user_guid"):
+        if attr not in col_names:
+            raise ValueError(f"Column for {attr} missing.")
+    if "loc_id" not in col_names and not (
+        "latitude" in col_names and "longitude" in col_names
+    ):
+        raise ValueError("Column for loc_id or latitude/longitude missing.")
+
+    def column(attr: str, offset: int, default: Any = None) -> List[Any]:
+        col = col_names.get(attr)
+        size = min(batch_size, row_count - offset)
+        if col is None:
+            return [default] * size
+        if hasattr(frame, "iloc"):
+            values = frame[col].iloc[offset:offset + size]
+            return values.astype(object).where(values.notna(), None).tolist()
+        return frame.column(col).slice(offset, size).to_pylist()
+
+    def item_set(items: Any) -> Set[str]:
+        if items is None or len(items) == 0:
+            return set()
+        if isinstance(items, str):
+            return {item for item in items.split(";") if item}
+        return set(items)
+
+    for offset in range(0, row_count, batch_size):
+        lats = column("latitude", offset)
+        lngs = column("longitude", offset)
+        if "loc_id" in col_names:
+            loc_ids = column("loc_id", offset)
+        else:
+            loc_ids = [
+                None if lat is None or lng is None else f"{lat}:{lng}"
+                for lat, lng in zip(lats, lngs)
+            ]
+        yield PostBatch(
+            origin_id=[int(value or 0) for value in column("origin_id", offset)],
+            guid=column("guid", offset),
+            user_guid=column("user_guid", offset),
+            latitude=lats,
+            longitude=lngs,
+            loc_id=loc_ids,
+            loc_name=column("loc_name", offset),
+            post_create_date=column("post_create_date", offset),
+            post_publish_date=column("post_publish_date", offset),
+            post_body=column("post_body", offset),
+            post_title=column("post_title", offset),
+            hashtags=[item_set(items) for items in column("hashtags", offset)],
+            emoji=[item_set(items) for items in column("emoji", offset)],
+            post_views_count=[
+                int(value or 0) for value in column("post_views_count", offset)
+            ],
+            post_like_count=[
+                int(value or 0) for value in column("post_like_count", offset)
+            ],
+        )
+
 
 class LoadData:
     """Main Class for ingesting data
@@ -30,13 +168,21 @@ class LoadData:
     - Returns CleanedPost
     """
 
-    def __init__(self, cfg, user_variety_input=None, console_reporting=None):
+    def __init__(
+        self,
+        cfg,
+        user_variety_input=None,
+        console_reporting=None,
+        filelist: Optional[List[Path]] = None,
+    ):
         """Initializes Load Data structure"""
         if user_variety_input is None:
             user_variety_input = False
         if console_reporting is None:
             console_reporting = False
-        self.filelist = self._read_local_files(cfg)
+        if filelist is None:
+            filelist = self._read_local_files(cfg)
+        self.filelist = filelist
         self.guid_hash = set()  # global list of guids
         self.append_to_already_exist = False  # unused?
         self.shape_exclude_locid_hash = set()
@@ -51,6 +197,14 @@ class LoadData:
         self.current_file = None
         # basic statistics collection
         self.stats = DataStats()
+        # LRU cache of selected emoji per raw string,
+        # e.g. for duplicate post bodies of bots and reposts
+        # filter and clean words of post body and title,
+        # based on stoplist or positive filterlist (select_tags_set)
+        self.text_cleaner = TextCleaner(
+            cfg.sort_out_always_set, cfg.select_tags_set,
+            cfg.ignore_stoplists)
+        self.emoji_cache: OrderedDict[str, FrozenSet[str]] = OrderedDict()
         if user_variety_input:
             # get user input for max tags to process
             # this is combined here with output reporting
@@ -76,18 +230,138 @@ class LoadData:
         """Contextmanager exit: nothing to do here"""
         return False
 
-    def _parse_input_files(self, count: bool = None) -> Iterator[IO[str]]:
+    @property
+    def chunked(self) -> bool:
+        """True if CSV input is ingested in chunks (see iter_batches())"""
+        return (
+            self.cfg.ingest_engine != INGEST_CSV
+            and self.cfg.source_map.file_extension == "csv"
+        )
+
+    def iter_batches(self) -> Iterator[PostBatch]:
+        """Chunked pipeline for reading posts from CSV files
+
+        Alternative to the row-by-row pipeline (with-statement):
+        chunks of posts are read with pandas or pyarrow,
+        dedup, origin, user, place and empty-latlng filters
+        are applied as vectorized masks per chunk.
+
+        Returns generator for batches of posts
+        """
+        msg = None
+        for post_batch in self._parse_batches(self._parse_input_files(count=True)):
+            msg = self._report_progress()
+            if self.console_reporting:
+                print(msg, end="\r")
+            yield post_batch
+        self._report_finished(msg)
+
+    def iter_partial_data(
+        self, lbsn_data: PrepareData, workers: int
+    ) -> Iterator[PrepareData]:
+        """Parallel pipeline: parse input files in worker processes
+
+        - in a first pass, guids of all files are read, to get
+        guids of previous files for each file (global guid dedup)
+        - each file is then parsed to a partial PrepareData (based on
+        empty template lbsn_data), partials are returned in order
+        of filelist, to be merged with PrepareData.merge()
+        - bounds, stats and distinct locations
+        of partials are merged here
+
+        Returns generator for partial PrepareData, one per file
+        """
+        msg = None
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(self.filelist)),
+            initializer=_init_ingest_worker,
+            initargs=(self.cfg, lbsn_data.new_partial()),
+        ) as executor:
+            skip_guids = list()
+            for file_guids in executor.map(_read_file_guids, self.filelist):
+                skip_guids.append(file_guids & self.guid_hash)
+                self.guid_hash |= file_guids
+            for file_name, partial in zip(
+                self.filelist,
+                executor.map(_ingest_file, self.filelist, skip_guids),
+            ):
+                self.stats.partcount += 1
+                self.current_file = file_name.stem
+                self._merge_partial(partial)
+                msg = self._report_progress()
+                if self.console_reporting:
+                    print(msg, end="\r")
+                yield partial.lbsn_data
+        self._report_finished(msg)
+
+    def read_guids(self) -> Set[str]:
+        """Get post guids of all input files"""
+        guid_col = self.cfg.source_map.post_guid_col
+        file_handles = self._parse_input_files()
+        guids = set()
+        if self.chunked:
+            for file_handle in file_handles:
+                with file_handle:
+                    for chunk in self._read_chunks(file_handle, [guid_col]):
+                        guids.update(chunk[guid_col])
+            return guids
+        for post_reader in self._process_inputfile(file_handles):
+            guids.update(post.get(guid_col) for post in post_reader)
+        return guids
+
+    def ingest_files(
+        self, lbsn_data: PrepareData, filelist: Optional[List[Path]] = None
+    ):
+        """Parse input files and add posts to lbsn_data,
+        without progress reporting
+        """
+        file_handles = self._parse_input_files(filelist=filelist)
+        if self.chunked:
+            for post_batch in self._parse_batches(file_handles):
+                lbsn_data.add_batch(post_batch)
+            return
+        for lbsn_post in self._parse_posts(self._process_inputfile(file_handles)):
+            lbsn_data.add_record(lbsn_post)
+
+    def _merge_partial(self, partial: "IngestPartial"):
+        """Merge state of file parsed in worker process"""
+        self.bounds.merge(partial.bounds)
+        self.distinct_locations_set |= partial.distinct_locations_set
+        self.stats.merge(partial.stats)
+
+    def _parse_batches(self, file_handles: Iterator[IO[str]]) -> Iterator[PostBatch]:
+        """Parse chunks of CSV files to batches of posts"""
+        for file_handle in file_handles:
+            with file_handle:
+                for chunk in self._read_chunks(file_handle):
+                    post_batch = self._parse_chunk(chunk)
+                    if not post_batch:
+                        continue
+                    self.stats.count_glob += len(post_batch)
+                    yield post_batch
+
+    def _parse_input_files(
+        self, count: bool = None, filelist: Optional[List[Path]] = None
+    ) -> Iterator[IO[str]]:
         """Loops input input filelist and
         returns opened file handles
         """
-        for file_name in self.filelist:
+        if filelist is None:
+            filelist = self.filelist
+        for file_name in filelist:
             if count:
                 self.stats.partcount += 1
             self.current_file = file_name.stem
             yield open(file_name, "r", newline="", encoding="utf8")
 
     def is_intermediate(self):
-        """Auto test if intermediate data is present"""
+        """Auto test if intermediate data is present
+
+        Binary intermediate data (.npz) is detected by file extension
+        """
+        if any(file_name.suffix == ".npz" for file_name in self.filelist):
+            self.log.info("Intermediate data detected.. skipping filtering step.\n")
+            return True
         post_reader = next(
             self._process_inputfile(self._parse_input_files(count=False))
         )
@@ -103,9 +377,8 @@ class LoadData:
     def _process_inputfile(self, file_handles: Iterator[IO[str]]) -> Iterator[Any]:
         """File parse for CSV or JSON from open file handle
 
-        Output: produces a list of post that can be parsed
+        Output: produces a reader of posts (dicts) per file
         """
-        post_reader = []
         for file_handle in file_handles:
             if self.cfg.source_map.file_extension == "csv":
                 post_reader = csv.DictReader(
@@ -116,7 +389,12 @@ class LoadData:
                 )
                 # next(post_list, None)  # skip headerline
             elif self.cfg.source_map.file_extension == "json":
-                post_reader = post_reader + json.loads(file_handle.read())
+                post_reader = JsonPostReader(file_handle)
+            else:
+                raise ValueError(
+                    f"File extension "
+                    f"{self.cfg.source_map.file_extension} not supported."
+                )
             yield post_reader
 
     def _parse_postlist(self, post_readers: Iterable[OrderedDict[str, Optional[str]]]):
@@ -124,26 +402,31 @@ class LoadData:
 
         Returns generator for single record
         """
-        # row_num = 0
         msg = None
+        for lbsn_post in self._parse_posts(post_readers):
+            msg = self._report_progress()
+            if self.console_reporting:
+                print(msg, end="\r")
+            yield lbsn_post
+        self._report_finished(msg)
+
+    def _parse_posts(
+        self, post_readers: Iterable[OrderedDict[str, Optional[str]]]
+    ) -> Iterator[PostStructure]:
+        """Parse and filter posts of all post readers"""
         for post_reader in post_readers:
             Utils.check_fileheader(
                 post_reader.fieldnames, self.cfg.source_map, self.current_file
             )
             for post in post_reader:
-                # row_num += 1
                 lbsn_post = self._parse_post(post)
                 if lbsn_post is None:
                     continue
-                else:
-                    self.stats.count_glob += 1
-                    msg = self._report_progress()
-                    # if (row_num % 10 == 0):
-                    # modulo: print only once every 10 iterations
-                    if self.console_reporting:
-                        print(msg, end="\r")
+                self.stats.count_glob += 1
                 yield lbsn_post
-        # log last message to file, clean stdout
+
+    def _report_finished(self, msg: Optional[str]):
+        """Log last message to file, clean stdout"""
         if msg and self.console_reporting:
             print(" " * len(msg), end="\r")
         sys.stdout.flush()
@@ -241,28 +524,12 @@ class LoadData:
         ) and self._is_outside_shapebounds(lbsn_post) is True:
             return None
         if self.cfg.cluster_tags or self.cfg.cluster_emoji or self.cfg.topic_modeling:
-            post_body = post.get(self.cfg.source_map.post_body_col)
-            post_title = post.get(self.cfg.source_map.post_title_col)
-            if self.cfg.ignore_stoplists:
-                lbsn_post.post_body = post_body
-                lbsn_post.post_title = post_title
-            else:
-                if self.cfg.select_tags_set is not None:
-                    # if positive filterlist available
-                    lbsn_post.post_body = Utils.select_words(
-                        post_body, self.cfg.select_tags_set
-                    )
-                    lbsn_post.post_title = Utils.select_words(
-                        post_title, self.cfg.select_tags_set
-                    )
-                else:
-                    # check against stoplists
-                    lbsn_post.post_body = Utils.remove_stopwords(
-                        post_body, self.cfg.sort_out_always_set
-                    )
-                    lbsn_post.post_title = Utils.remove_stopwords(
-                        post_title, self.cfg.sort_out_always_set
-                    )
+            lbsn_post.post_body = self._filter_words(
+                post.get(self.cfg.source_map.post_body_col)
+            )
+            lbsn_post.post_title = self._filter_words(
+                post.get(self.cfg.source_map.post_title_col)
+            )
         else:
             lbsn_post.post_title = ""
             lbsn_post.post_body = ""
@@ -281,6 +548,291 @@ class LoadData:
         # return parsed post object
         return lbsn_post
 
+    def _read_chunks(
+        self, file_handle: IO[str], columns: Optional[List[str]] = None
+    ) -> Iterator[pd.DataFrame]:
+        """Read CSV file in chunks, limited to columns
+        (default: columns of source_map)
+
+        All values are read as (non-null) strings, as with csv.DictReader
+        """
+        source_map = self.cfg.source_map
+        fieldnames = next(
+            csv.reader(
+                file_handle,
+                delimiter=source_map.delimiter,
+                quotechar=source_map.quote_char,
+                quoting=source_map.quoting,
+            ),
+            [],
+        )
+        Utils.check_fileheader(fieldnames, source_map, self.current_file)
+        file_handle.seek(0)
+        if columns is None:
+            columns = self._get_source_columns()
+        columns = [col for col in columns if col in fieldnames]
+        if self.cfg.ingest_engine == INGEST_PYARROW:
+            yield from self._read_chunks_pyarrow(file_handle.name, columns)
+            return
+        with pd.read_csv(
+            file_handle,
+            sep=source_map.delimiter,
+            quotechar=source_map.quote_char,
+            quoting=source_map.quoting,
+            usecols=columns,
+            dtype=str,
+            keep_default_na=False,
+            na_filter=False,
+            chunksize=self.cfg.ingest_chunksize,
+        ) as chunk_reader:
+            yield from chunk_reader
+
+    def _read_chunks_pyarrow(
+        self, file_name: str, columns: List[str]
+    ) -> Iterator[pd.DataFrame]:
+        """Read CSV file in record batches with pyarrow streaming reader"""
+        try:
+            import pyarrow as pa
+            from pyarrow import csv as pa_csv
+        except ImportError as err:
+            raise ValueError(
+                "Ingest engine pyarrow requires the pyarrow package."
+            ) from err
+        source_map = self.cfg.source_map
+        quote_char = source_map.quote_char
+        if source_map.quoting == csv.QUOTE_NONE:
+            quote_char = False
+        batch_reader = pa_csv.open_csv(
+            file_name,
+            parse_options=pa_csv.ParseOptions(
+                delimiter=source_map.delimiter,
+                quote_char=quote_char,
+                newlines_in_values=True,
+            ),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=columns,
+                column_types={col: pa.string() for col in columns},
+                strings_can_be_null=False,
+                quoted_strings_can_be_null=False,
+            ),
+        )
+        for record_batch in batch_reader:
+            yield record_batch.to_pandas()
+
+    def _get_source_columns(self) -> List[str]:
+        """Get distinct columns of source_map used for ingestion"""
+        source_map = self.cfg.source_map
+        return list(
+            dict.fromkeys(
+                [
+                    source_map.originid_col,
+                    source_map.post_guid_col,
+                    source_map.latitude_col,
+                    source_map.longitude_col,
+                    source_map.user_guid_col,
+                    source_map.post_create_date_col,
+                    source_map.post_publish_date_col,
+                    source_map.post_views_count_col,
+                    source_map.post_like_count_col,
+                    source_map.tags_col,
+                    source_map.emoji_col,
+                    source_map.post_title_col,
+                    source_map.post_body_col,
+                    source_map.place_guid_col,
+                    source_map.place_name_col,
+                ]
+            )
+        )
+
+    @staticmethod
+    def _get_chunk_column(chunk: pd.DataFrame, col: str, default=None) -> np.ndarray:
+        """Get column values of chunk as object array,
+        filled with default if column is not available
+        """
+        if col in chunk:
+            return chunk[col].to_numpy(dtype=object)
+        return np.full(len(chunk), default, dtype=object)
+
+    @staticmethod
+    def _is_in_set(values: np.ndarray, value_set: Set[str]) -> np.ndarray:
+        """Vectorized membership test against (large) Python set"""
+        return np.fromiter(
+            (value in value_set for value in values), dtype=bool, count=len(values)
+        )
+
+    def _parse_chunk(self, chunk: pd.DataFrame) -> PostBatch:
+        """Process chunk of posts, same filters as _parse_post()
+
+        - filters are applied as masks, in the order of _parse_post(),
+        so that skip statistics are identical
+        - coordinates and counts are converted once per distinct value
+        """
+        source_map = self.cfg.source_map
+        post_guids = self._get_chunk_column(chunk, source_map.post_guid_col)
+        # skip duplicates (in chunk and from previous chunks)
+        keep = ~(
+            pd.Series(post_guids).duplicated().to_numpy()
+            | self._is_in_set(post_guids, self.guid_hash)
+        )
+        self.stats.skipped_count += int(np.count_nonzero(~keep))
+        self.guid_hash.update(post_guids[keep])
+        origin_ids = self._get_chunk_column(chunk, source_map.originid_col, 0)
+        if self.filter_origin:
+            # optional exclude origin
+            skip = keep & (origin_ids != self.filter_origin)
+            self.stats.skipped_count += int(np.count_nonzero(skip))
+            keep &= ~skip
+        user_guids = self._get_chunk_column(chunk, source_map.user_guid_col)
+        if (
+            not self.cfg.ignore_stoplists
+            and self.cfg.sort_out_user_set is not None
+        ):
+            keep &= ~self._is_in_set(user_guids, self.cfg.sort_out_user_set)
+        place_guids = self._get_chunk_column(chunk, source_map.place_guid_col)
+        if self.cfg.sort_out_places:
+            skip = (
+                keep
+                & place_guids.astype(bool)
+                & self._is_in_set(place_guids, self.cfg.sort_out_places_set)
+            )
+            self.stats.skipped_count += int(np.count_nonzero(skip))
+            keep &= ~skip
+        lats = self._get_chunk_column(chunk, source_map.latitude_col)
+        lngs = self._get_chunk_column(chunk, source_map.longitude_col)
+        empty_latlng = ~(lats.astype(bool) & lngs.astype(bool))
+        self.stats.count_non_geotagged += int(np.count_nonzero(keep & empty_latlng))
+        if not self.ignore_empty_latlng:
+            keep &= ~empty_latlng
+        rows = np.flatnonzero(keep)
+        post_latlng = self._get_chunk_latlng(
+            place_guids[rows], lats[rows], lngs[rows], empty_latlng[rows]
+        )
+        # exclude posts outside boundary
+        if self.cfg.shapefile_intersect or self.cfg.shapefile_exclude:
+            inside = [
+                not self._is_outside_shape(loc_id, lng, lat)
+                for lat, lng, loc_id in post_latlng
+            ]
+            rows = rows[inside]
+            post_latlng = [latlng for latlng, keep_post in zip(
+                post_latlng, inside) if keep_post]
+        return self._get_post_batch(chunk, rows, post_latlng, origin_ids)
+
+    def _get_chunk_latlng(
+        self,
+        place_guids: np.ndarray,
+        lats: np.ndarray,
+        lngs: np.ndarray,
+        empty_latlng: np.ndarray,
+    ) -> List[Tuple[Optional[Decimal], Optional[Decimal], Optional[str]]]:
+        """Get lat, lng and loc_id for each post,
+        update bounds and distinct locations
+        """
+        latlng_cache = dict()
+        post_latlng = list()
+        for place_guid, lat, lng, is_empty in zip(
+            place_guids, lats, lngs, empty_latlng
+        ):
+            if is_empty:
+                # Try to substitude place_guid
+                # if self.ignore_empty_latlng has been set to True
+                if not place_guid:
+                    self.log.warning("Neither coordinates nor place guid found.")
+                post_latlng.append((None, None, place_guid))
+                continue
+            latlng = latlng_cache.get((place_guid, lat, lng))
+            if latlng is None:
+                lat_dec, lng_dec = self._correct_placelatlng(place_guid, lat, lng)
+                self.bounds.upd_latlng_bounds(lat_dec, lng_dec)
+                latlng = (lat_dec, lng_dec, f"{lat_dec}:{lng_dec}")
+                latlng_cache[(place_guid, lat, lng)] = latlng
+            post_latlng.append(latlng)
+        # counting of distinct loc ids
+        self.distinct_locations_set.update(loc_id for __, __, loc_id in post_latlng)
+        return post_latlng
+
+    def _get_post_batch(
+        self,
+        chunk: pd.DataFrame,
+        rows: np.ndarray,
+        post_latlng: List[Tuple[Optional[Decimal], Optional[Decimal], Optional[str]]],
+        origin_ids: np.ndarray,
+    ) -> PostBatch:
+        """Get batch of posts for selected rows of chunk"""
+        source_map = self.cfg.source_map
+
+        def column(col: str) -> List[Any]:
+            return self._get_chunk_column(chunk, col)[rows].tolist()
+
+        post_bodies = column(source_map.post_body_col)
+        post_terms = None
+        if self.cfg.cluster_tags or self.cfg.cluster_emoji or self.cfg.topic_modeling:
+            # clean terms in one pass, instead of filtering text here
+            # and cleaning terms in PrepareData
+            post_terms = [
+                body_terms.union(title_terms)
+                for body_terms, title_terms in zip(
+                    self.text_cleaner.clean_batch(post_bodies),
+                    self.text_cleaner.clean_batch(
+                        column(source_map.post_title_col)),
+                )
+            ]
+        filtered_bodies = [""] * len(rows)
+        post_titles = [""] * len(rows)
+        hashtags = [set() for __ in rows]
+        if self.cfg.cluster_tags or self.cfg.topic_modeling:
+            hashtags = [
+                self._get_tags(tags_string)
+                for tags_string in column(source_map.tags_col)
+            ]
+        emoji = [set() for __ in rows]
+        if self.cfg.cluster_emoji:
+            emoji = [
+                self._get_emoji_from(post_body, emoji_string)
+                for post_body, emoji_string in zip(
+                    post_bodies, column(source_map.emoji_col))
+            ]
+        return PostBatch(
+            origin_id=self._map_distinct(int, origin_ids[rows]),
+            guid=column(source_map.post_guid_col),
+            user_guid=column(source_map.user_guid_col),
+            latitude=[lat for lat, __, __ in post_latlng],
+            longitude=[lng for __, lng, __ in post_latlng],
+            loc_id=[loc_id for __, __, loc_id in post_latlng],
+            loc_name=column(source_map.place_name_col),
+            post_create_date=column(source_map.post_create_date_col),
+            post_publish_date=column(source_map.post_publish_date_col),
+            post_body=filtered_bodies,
+            post_title=post_titles,
+            hashtags=hashtags,
+            emoji=emoji,
+            post_views_count=self._map_distinct(
+                self._get_count_frompost,
+                self._get_chunk_column(chunk, source_map.post_views_count_col)[rows],
+            ),
+            post_like_count=self._map_distinct(
+                self._get_count_frompost,
+                self._get_chunk_column(chunk, source_map.post_like_count_col)[rows],
+            ),
+            post_terms=post_terms,
+        )
+
+    @staticmethod
+    def _map_distinct(func, values: Iterable[Any]) -> List[Any]:
+        """Apply func once per distinct value"""
+        values = list(values)
+        mapping = {value: func(value) for value in set(values)}
+        return [mapping[value] for value in values]
+
+    def _filter_words(self, text: Optional[str]) -> Optional[str]:
+        """Filter words of post body or title based on filter lists
+
+        - returns cleaned terms (see TextCleaner), joined by space
+        """
+        if self.cfg.ignore_stoplists:
+            return text
+        return " ".join(self.text_cleaner.clean(text))
+
     @staticmethod
     def _read_local_files(config):
         """Read Local Files according to config parameters
@@ -289,6 +841,9 @@ class LoadData:
         """
         input_path = config.input_folder
         filelist = list(input_path.glob(f"*.{config.source_map.file_extension}"))
+        if not filelist:
+            # binary intermediate data
+            filelist = list(input_path.glob("*.npz"))
         input_count = len(filelist)
         if input_count == 0:
             raise ValueError(
@@ -323,19 +878,46 @@ class LoadData:
         """Extract emoji from post_body and emoji col,
         use selection list if available
         """
-        emoji_body = Utils.select_emoji(
-            Utils.extract_emoji(post.get(self.cfg.source_map.post_body_col)),
-            self.cfg.select_emoji_set,
-        )
-        emoji_col = Utils.select_emoji(
-            Utils.extract_emoji(post.get(self.cfg.source_map.emoji_col)),
-            self.cfg.select_emoji_set,
+        return self._get_emoji_from(
+            post.get(self.cfg.source_map.post_body_col),
+            post.get(self.cfg.source_map.emoji_col),
         )
-        emoji_filtered = set.union(emoji_body, emoji_col)
+
+    def _get_emoji_from(
+        self, post_body: Optional[str], emoji_string: Optional[str]
+    ) -> Set[str]:
+        """Extract emoji from post body and emoji string"""
+        emoji_filtered = set(
+            self._select_emoji(post_body)) | self._select_emoji(emoji_string)
         if emoji_filtered:
             self.stats.count_emojis_global += len(emoji_filtered)
         return emoji_filtered
 
+    def _select_emoji(self, text: Optional[str]) -> FrozenSet[str]:
+        """Extract emoji from text, use selection list if available
+
+        - results are cached per text (LRU, EMOJI_CACHE_SIZE),
+          for texts of up to EMOJI_CACHE_MAX_TEXT_LEN chars
+        - pure ASCII texts cannot contain emoji and are skipped
+        """
+        if not text or text.isascii():
+            return frozenset()
+        if len(text) > EMOJI_CACHE_MAX_TEXT_LEN:
+            return frozenset(Utils.select_emoji(
+                Utils.extract_emoji(text), self.cfg.select_emoji_set))
+        emoji_selected = self.emoji_cache.get(text)
+        if emoji_selected is not None:
+            self.stats.count_emoji_cache_hits += 1
+            self.emoji_cache.move_to_end(text)
+            return emoji_selected
+        self.stats.count_emoji_cache_misses += 1
+        emoji_selected = frozenset(Utils.select_emoji(
+            Utils.extract_emoji(text), self.cfg.select_emoji_set))
+        self.emoji_cache[text] = emoji_selected
+        if len(self.emoji_cache) > EMOJI_CACHE_SIZE:
+            self.emoji_cache.popitem(last=False)
+        return emoji_selected
+
     def _get_tags(self, tags_string: Optional[str]) -> Set[str]:
         """Extract tags, apply filter lists if available"""
         # base str conversion to set
@@ -348,7 +930,7 @@ class LoadData:
             tags, count_tags, count_skipped = Utils.filter_tags(
                 tags,
                 self.cfg.sort_out_always_set,
-                self.cfg.sort_out_always_instr_set,
+                self.cfg.sort_out_always_instr_matcher,
                 self.cfg.select_tags_set,
             )
         # update global stats
@@ -383,12 +965,16 @@ class LoadData:
 
     def _is_outside_shapebounds(self, post):
         """Skip all posts outside shapefile"""
+        return self._is_outside_shape(post.loc_id, post.longitude, post.latitude)
+
+    def _is_outside_shape(self, loc_id: Optional[str], lng, lat) -> bool:
+        """Skip all locations outside shapefile"""
         # do not expensive spatial check twice:
-        if post.loc_id in self.shape_exclude_locid_hash:
+        if loc_id in self.shape_exclude_locid_hash:
             self.stats.skipped_count += 1
             return True
-        if post.loc_id not in self.shape_included_locid_hash:
-            lng_lat_point = Point(post.longitude, post.latitude)
+        if loc_id not in self.shape_included_locid_hash:
+            lng_lat_point = Point(lng, lat)
             if (
                 Utils.check_intersect_polylist(
                     lng_lat_point,
@@ -398,9 +984,9 @@ class LoadData:
                 is False
             ):
                 self.stats.skipped_count += 1
-                self.shape_exclude_locid_hash.add(post.loc_id)
+                self.shape_exclude_locid_hash.add(loc_id)
                 return True
-            self.shape_included_locid_hash.add(post.loc_id)
+            self.shape_included_locid_hash.add(loc_id)
         return False
 
     def _is_empty_latlng(self, post):
@@ -440,6 +1026,135 @@ class LoadData:
         self.log.info(f"\nTotal post count (PC): " f"{self.stats.count_glob:02d}")
         self.log.info(f"Total tag count (PTC): " f"{self.stats.count_tags_global}")
         self.log.info(f"Total emoji count (PEC): " f"{self.stats.count_emojis_global}")
+        self.log.debug(
+            f"Emoji cache hits/misses: "
+            f"{self.stats.count_emoji_cache_hits}/"
+            f"{self.stats.count_emoji_cache_misses}")
+
+
+class JsonPostReader:
+    """Streaming reader for JSON input files
+
+    - supports a JSON array of posts, NDJSON (one post per line)
+    or any sequence of concatenated JSON objects
+    - posts are decoded incrementally from a buffer of fixed size,
+    so that memory use does not depend on file size
+    - numbers are read as strings, as in CSV input
+    - fieldnames are taken from the keys of the first post
+    """
+
+    def __init__(self, file_handle: IO[str], buffer_size: int = 2**20):
+        self.file_handle = file_handle
+        self.buffer_size = buffer_size
+        self._decoder = json.JSONDecoder(parse_float=str, parse_int=str)
+        self._posts = self._decode_posts()
+        self._first_post: Optional[Dict[str, Any]] = None
+        self._fieldnames: Optional[List[str]] = None
+
+    @property
+    def fieldnames(self) -> List[str]:
+        """Keys of first post (read ahead)"""
+        if self._fieldnames is None:
+            self._first_post = next(self._posts, None)
+            self._fieldnames = list(self._first_post or [])
+        return self._fieldnames
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Dict[str, Any]:
+        if self._first_post is not None:
+            post, self._first_post = self._first_post, None
+            return post
+        return next(self._posts)
+
+    def _decode_posts(self) -> Iterator[Dict[str, Any]]:
+        """Decode JSON objects from buffered file
+
+        - a JSON array must contain objects separated by commas,
+        otherwise objects must be separated by whitespace only
+        - malformed input raises JSONDecodeError at the position
+        of the error, without reading the rest of the file
+        """
+        buffer = ""
+        pos = 0
+        eof = False
+        # None: not known before first char, True: JSON array
+        in_array: Optional[bool] = None
+        array_closed = False
+        # array: separator (comma) or end (]) expected after post
+        expect_separator = False
+        after_comma = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in JSON_WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                if eof:
+                    if in_array and not array_closed:
+                        raise json.JSONDecodeError(
+                            "Unterminated JSON array", buffer, pos)
+                    return
+                buffer, pos = self.file_handle.read(self.buffer_size), 0
+                eof = not buffer
+                continue
+            char = buffer[pos]
+            if in_array is None:
+                in_array = char == "["
+                if in_array:
+                    pos += 1
+                    continue
+            if array_closed:
+                raise json.JSONDecodeError("Extra data", buffer, pos)
+            if in_array and char == "]" and not after_comma:
+                array_closed = True
+                pos += 1
+                continue
+            if expect_separator:
+                if char != ",":
+                    raise json.JSONDecodeError(
+                        "Expecting ',' delimiter", buffer, pos)
+                expect_separator = False
+                after_comma = True
+                pos += 1
+                continue
+            try:
+                post, end = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as error:
+                if eof or not JsonPostReader._is_truncated(error):
+                    raise
+                # incomplete post at end of buffer, read more
+                chunk = self.file_handle.read(self.buffer_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            if not isinstance(post, dict):
+                raise ValueError(f"JSON post is not an object: {post}")
+            pos = end
+            expect_separator = in_array
+            after_comma = False
+            yield post
+
+    @staticmethod
+    def _is_truncated(error: json.JSONDecodeError) -> bool:
+        """Check whether decode error may be caused by end of buffer
+
+        This is the case if the error is in the last token of the
+        buffer, e.g. a partial number, literal or string
+        """
+        if error.msg.startswith("Unterminated string"):
+            return True
+        return not any(
+            char in JSON_TOKEN_END for char in error.doc[error.pos:])
+
+
+@dataclass
+class IngestPartial:
+    """State of single input file parsed in worker process"""
+
+    lbsn_data: PrepareData
+    bounds: AnalysisBounds
+    distinct_locations_set: Set[str]
+    stats: "DataStats"
 
 
 class DataStats:
@@ -455,3 +1170,10 @@ class DataStats:
         self.count_tags_global = 0
         self.count_emojis_global = 0
         self.count_tags_skipped = 0
+        self.count_emoji_cache_hits = 0
+        self.count_emoji_cache_misses = 0
+
+    def merge(self, stats: "DataStats"):
+        """Add counts of other (partial) stats"""
+        for key, value in vars(stats).items():
+            setattr(self, key, getattr(self, key) + value)
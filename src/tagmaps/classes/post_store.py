@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module for columnar (struct-of-arrays) storage of cleaned posts
+"""
+
+from __future__ import absolute_import
+
+import struct
+import zipfile
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from tagmaps.classes.shared_structure import CleanedPost
+
+NUMERIC_COLUMNS = (
+    "origin_id", "lat", "lng", "user_ids", "loc_ids",
+    "post_views_count", "post_like_count")
+OPTIONAL_STR_COLUMNS = (
+    "post_create_date", "post_publish_date", "loc_name")
+ITEM_COLUMNS = ("hashtags", "emoji", "post_body")
+
+
+def save_columns(output_file: Path, columns: Dict[str, np.ndarray]):
+    """Store columns to uncompressed numpy archive (.npz)
+
+    Arrays are stored without compression, so that
+    each array can be memory-mapped with load_columns()
+    """
+    np.savez(output_file, **columns)
+
+
+def load_columns(input_file: Path) -> Dict[str, np.ndarray]:
+    """Memory-map all arrays of uncompressed numpy archive (.npz)
+
+    - for each archive member, the offset of array data
+    is read from the zip local file header and npy header
+    - arrays are mapped copy-on-write, i.e.
+    data is only read from disk on access
+    """
+    columns: Dict[str, np.ndarray] = dict()
+    with zipfile.ZipFile(input_file) as archive, \
+            open(input_file, "rb") as f_handle:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(
+                    f"Cannot memory-map compressed archive {input_file}")
+            # local file header: 30 bytes, file name, extra field
+            f_handle.seek(info.header_offset + 26)
+            name_len, extra_len = struct.unpack("<HH", f_handle.read(4))
+            f_handle.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f_handle)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f_handle)
+            else:
+                header = np.lib.format.read_array_header_2_0(f_handle)
+            shape, fortran_order, dtype = header
+            name = info.filename[:-len(".npy")]
+            if not int(np.prod(shape)):
+                # empty arrays cannot be mapped
+                columns[name] = np.empty(shape, dtype=dtype)
+                continue
+            columns[name] = np.memmap(
+                input_file, dtype=dtype, mode="c", offset=f_handle.tell(),
+                shape=shape, order="F" if fortran_order else "C")
+    return columns
+
+
+class Vocabulary():
+    """Maps strings to dense integer codes (and back)
+
+    Terms may be given as (distinct) str array, e.g. memory-mapped
+    with load_columns(). In this case, the index of codes is only
+    built on first lookup, and terms are copied to a list on
+    first add().
+    """
+
+    def __init__(
+            self, terms: Optional[Union[Iterable[str], np.ndarray]] = None):
+        self.terms: Union[List[str], np.ndarray] = list()
+        self._index: Optional[Dict[str, int]] = dict()
+        if isinstance(terms, np.ndarray):
+            self.terms = terms
+            self._index = None
+        elif terms is not None:
+            for term in terms:
+                self.add(term)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __contains__(self, term):
+        return term in self.index
+
+    @property
+    def index(self) -> Dict[str, int]:
+        """Code per term (built on first access)"""
+        if self._index is None:
+            self._index = {
+                term: code for code, term in enumerate(self.terms.tolist())}
+        return self._index
+
+    def add(self, term: str) -> int:
+        """Get code for term, add term if not existing"""
+        code = self.index.get(term)
+        if code is None:
+            if isinstance(self.terms, np.ndarray):
+                self.terms = self.terms.tolist()
+            code = len(self.terms)
+            self.index[term] = code
+            self.terms.append(term)
+        return code
+
+    def get(self, term: Optional[str]) -> Optional[int]:
+        """Get code for term or None, if term does not exist"""
+        return self.index.get(term)
+
+
+class ItemColumn():
+    """CSR-style column of item sets per post
+
+    Items of post at row i are stored in
+    codes[offsets[i]:offsets[i+1]]
+    """
+
+    def __init__(self, offsets: np.ndarray, codes: np.ndarray):
+        self.offsets = offsets
+        self.codes = codes
+
+    def row_codes(self, row: int) -> np.ndarray:
+        """Get item codes for a single row"""
+        return self.codes[self.offsets[row]:self.offsets[row+1]]
+
+    def code_rows(self) -> np.ndarray:
+        """Get row number for each entry of codes"""
+        return np.repeat(
+            np.arange(len(self.offsets) - 1, dtype=np.intp),
+            np.diff(self.offsets))
+
+    def take(self, rows: np.ndarray) -> "ItemColumn":
+        """Return new column with rows (in order of rows)"""
+        lengths = np.diff(self.offsets)[rows]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # position in codes for each entry of the new column:
+        # start of source row plus position within row
+        code_idx = np.repeat(
+            self.offsets[:-1][rows] - offsets[:-1], lengths) + np.arange(
+                offsets[-1], dtype=np.int64)
+        return ItemColumn(offsets, self.codes[code_idx])
+
+
+class CleanedPostStore():
+    """Columnar store of cleaned posts
+
+    - float64 lat/lng arrays
+    - post guids as fixed-width str array (np.str_),
+      int-coded user guids and location ids
+    - optional str columns (OPTIONAL_STR_COLUMNS) as str arrays,
+      with bool masks of missing values (isnull)
+    - CSR-style columns for hashtags, emoji and post_body terms,
+      sharing a single item vocabulary
+
+    Row i corresponds to the i-th post added. A CleanedPost can be
+    restored for any row with post(), e.g. for writing output.
+    """
+
+    def __init__(self):
+        self.origin_id = np.empty(0, dtype=np.int32)
+        self.lat = np.empty(0, dtype=np.float64)
+        self.lng = np.empty(0, dtype=np.float64)
+        self.guids = np.empty(0, dtype=str)
+        self.user_ids = np.empty(0, dtype=np.int32)
+        self.loc_ids = np.empty(0, dtype=np.int32)
+        self.post_views_count = np.empty(0, dtype=np.int64)
+        self.post_like_count = np.empty(0, dtype=np.int64)
+        self.post_create_date = np.empty(0, dtype=str)
+        self.post_publish_date = np.empty(0, dtype=str)
+        self.loc_name = np.empty(0, dtype=str)
+        self.isnull: Dict[str, np.ndarray] = {
+            col: np.empty(0, dtype=bool) for col in OPTIONAL_STR_COLUMNS}
+        empty_column = ItemColumn(
+            np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32))
+        self.hashtags = empty_column
+        self.emoji = empty_column
+        self.post_body = empty_column
+        self.users = Vocabulary()
+        self.locations = Vocabulary()
+        self.items = Vocabulary()
+        self._guid_index: Optional[Dict[str, int]] = None
+        # projected x/y coordinates per crs
+        self._projected: Dict[str, Tuple[np.ndarray, np.ndarray]] = dict()
+
+    def __len__(self):
+        return len(self.guids)
+
+    @classmethod
+    def from_posts(
+            cls, cleaned_posts: Iterable[CleanedPost],
+            users: Optional[Vocabulary] = None,
+            locations: Optional[Vocabulary] = None,
+            items: Optional[Vocabulary] = None) -> "CleanedPostStore":
+        """Create store from iterable of CleanedPost
+
+        Optionally, existing vocabularies can be provided (and extended),
+        to share int ids of users, locations and items (e.g. PrepareData)
+        """
+        store = cls()
+        if users is not None:
+            store.users = users
+        if locations is not None:
+            store.locations = locations
+        if items is not None:
+            store.items = items
+        numeric = {
+            "origin_id": array("i"), "lat": array("d"), "lng": array("d"),
+            "user_ids": array("i"), "loc_ids": array("i"),
+            "post_views_count": array("q"), "post_like_count": array("q")}
+        item_cols = {
+            col: (array("q", [0]), array("i"))
+            for col in ("hashtags", "emoji", "post_body")}
+        guids: List[str] = list()
+        str_cols: Dict[str, List[Optional[str]]] = {
+            col: list() for col in OPTIONAL_STR_COLUMNS}
+        for post in cleaned_posts:
+            numeric["origin_id"].append(int(post.origin_id))
+            numeric["lat"].append(post.lat)
+            numeric["lng"].append(post.lng)
+            numeric["user_ids"].append(store.users.add(post.user_guid))
+            numeric["loc_ids"].append(store.locations.add(post.loc_id))
+            numeric["post_views_count"].append(post.post_views_count or 0)
+            numeric["post_like_count"].append(post.post_like_count or 0)
+            guids.append(post.guid)
+            for col, values in str_cols.items():
+                values.append(getattr(post, col))
+            for col, (offsets, codes) in item_cols.items():
+                for item in getattr(post, col) or ():
+                    codes.append(store.items.add(item))
+                offsets.append(len(codes))
+        store.guids = np.array(guids, dtype=str)
+        for col, values in str_cols.items():
+            setattr(store, col, np.array(
+                ["" if value is None else value for value in values],
+                dtype=str))
+            store.isnull[col] = np.array(
+                [value is None for value in values], dtype=bool)
+        for col, values in numeric.items():
+            setattr(store, col, np.frombuffer(
+                values, dtype=getattr(store, col).dtype).copy())
+        for col, (offsets, codes) in item_cols.items():
+            setattr(store, col, ItemColumn(
+                np.frombuffer(offsets, dtype=np.int64).copy(),
+                np.frombuffer(codes, dtype=np.int32).copy()))
+        return store
+
+    def to_columns(self) -> Dict[str, np.ndarray]:
+        """Get all columns and vocabularies as arrays
+
+        Layout (e.g. for save_columns()):
+            - NUMERIC_COLUMNS: one value per row
+            - guids: str per row
+            - OPTIONAL_STR_COLUMNS: str per row,
+              with bool mask "{col}/isnull"
+            - ITEM_COLUMNS: CSR-style "{col}/offsets" (int64, rows + 1)
+              and "{col}/codes" (int32)
+            - "vocabulary/users", "vocabulary/locations" and
+              "vocabulary/items": str per code
+        """
+        columns = {col: getattr(self, col) for col in NUMERIC_COLUMNS}
+        columns["guids"] = self.guids
+        for col in OPTIONAL_STR_COLUMNS:
+            columns[col] = getattr(self, col)
+            columns[f"{col}/isnull"] = self.isnull[col]
+        for col in ITEM_COLUMNS:
+            columns[f"{col}/offsets"] = getattr(self, col).offsets
+            columns[f"{col}/codes"] = getattr(self, col).codes
+        for vocab in ("users", "locations", "items"):
+            columns[f"vocabulary/{vocab}"] = np.asarray(
+                getattr(self, vocab).terms, dtype=str)
+        return columns
+
+    @classmethod
+    def from_columns(
+            cls, columns: Dict[str, np.ndarray]) -> "CleanedPostStore":
+        """Create store from columns, see to_columns()
+
+        All columns and vocabularies are used as is (no copy),
+        e.g. memory-mapped with load_columns(); str values
+        are converted per row on access
+        """
+        store = cls()
+        for col in NUMERIC_COLUMNS:
+            setattr(store, col, columns[col])
+        store.guids = columns["guids"]
+        for col in OPTIONAL_STR_COLUMNS:
+            setattr(store, col, columns[col])
+            store.isnull[col] = columns[f"{col}/isnull"]
+        for col in ITEM_COLUMNS:
+            setattr(store, col, ItemColumn(
+                columns[f"{col}/offsets"], columns[f"{col}/codes"]))
+        for vocab in ("users", "locations", "items"):
+            setattr(store, vocab, Vocabulary(
+                columns[f"vocabulary/{vocab}"]))
+        return store
+
+    def post(self, row: int) -> CleanedPost:
+        """Restore CleanedPost for single row"""
+        return CleanedPost(
+            origin_id=int(self.origin_id[row]),
+            lat=float(self.lat[row]),
+            lng=float(self.lng[row]),
+            guid=str(self.guids[row]),
+            user_guid=str(self.users.terms[self.user_ids[row]]),
+            loc_id=str(self.locations.terms[self.loc_ids[row]]),
+            post_create_date=self.str_value("post_create_date", row),
+            post_publish_date=self.str_value("post_publish_date", row),
+            post_body=self.item_set(self.post_body, row),
+            hashtags=self.item_set(self.hashtags, row),
+            emoji=self.item_set(self.emoji, row),
+            post_views_count=int(self.post_views_count[row]),
+            post_like_count=int(self.post_like_count[row]),
+            loc_name=self.str_value("loc_name", row))
+
+    def str_value(self, column: str, row: int) -> Optional[str]:
+        """Get value of optional str column for row"""
+        if self.isnull[column][row]:
+            return None
+        return str(getattr(self, column)[row])
+
+    def to_dict(self) -> Dict[str, CleanedPost]:
+        """Restore dict of CleanedPost (key: post guid)"""
+        return {
+            guid: self.post(row)
+            for row, guid in enumerate(self.guids.tolist())}
+
+    def item_set(self, column: ItemColumn, row: int) -> Set[str]:
+        """Get set of item names for row of item column"""
+        terms = self.items.terms
+        return {str(terms[code]) for code in column.row_codes(row).tolist()}
+
+    def rows(self, guids: Iterable[str]) -> np.ndarray:
+        """Get rows for list of post guids"""
+        if self._guid_index is None:
+            self._guid_index = {
+                guid: row for row, guid in enumerate(self.guids.tolist())}
+        return np.fromiter(
+            (self._guid_index[guid] for guid in guids), dtype=np.intp)
+
+    def guids_at(self, rows: Iterable[int]) -> List[str]:
+        """Get post guids for rows"""
+        return self.guids[np.fromiter(rows, dtype=np.intp)].tolist()
+
+    def coordinates(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Get array of [lng, lat] coordinates for rows (or all)"""
+        if rows is None:
+            return np.column_stack((self.lng, self.lat))
+        return np.column_stack((self.lng[rows], self.lat[rows]))
+
+    def get_projected(
+            self, crs: str, transformer) -> Tuple[np.ndarray, np.ndarray]:
+        """Get x/y coordinates of all posts projected to crs
+
+        All posts are projected in one call with
+        transformer (pyproj.Transformer), results are cached per crs.
+        """
+        projected = self._projected.get(crs)
+        if projected is None:
+            x_points, y_points = transformer.transform(self.lng, self.lat)
+            projected = (np.asarray(x_points), np.asarray(y_points))
+            self._projected[crs] = projected
+        return projected
+
+    def user_count(self, rows: np.ndarray) -> int:
+        """Get number of distinct users for rows"""
+        return len(np.unique(self.user_ids[rows]))
+
+    def location_rows(self, rows: np.ndarray) -> np.ndarray:
+        """Get first row for each distinct location in rows"""
+        __, first_idx = np.unique(self.loc_ids[rows], return_index=True)
+        return rows[np.sort(first_idx)]
+
+    def remove_rows(self, remove_mask: np.ndarray):
+        """Remove rows from store (in place)
+
+        Note that all vocabularies are kept unchanged.
+        """
+        keep_rows = np.flatnonzero(~remove_mask)
+        for col in NUMERIC_COLUMNS:
+            setattr(self, col, getattr(self, col)[keep_rows])
+        self.guids = self.guids[keep_rows]
+        for col in OPTIONAL_STR_COLUMNS:
+            setattr(self, col, getattr(self, col)[keep_rows])
+            self.isnull[col] = self.isnull[col][keep_rows]
+        for col in ITEM_COLUMNS:
+            setattr(self, col, getattr(self, col).take(keep_rows))
+        self._projected = {
+            crs: (x_points[keep_rows], y_points[keep_rows])
+            for crs, (x_points, y_points) in self._projected.items()}
+        self._guid_index = None
@@ -12,26 +12,48 @@ from __future__ import absolute_import
 
 import collections
 import csv
+import itertools
 import logging
 import math
 from collections import defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
-from typing import Counter, DefaultDict, Dict, List, Optional, Set, Union
+from typing import (Callable, Counter, DefaultDict, Dict, Iterable, Iterator, List,
+                    Optional, Set, Union)
 
+import numpy as np
 from _csv import QUOTE_MINIMAL
+from scipy.sparse import csr_matrix
 
+from tagmaps.classes.post_store import (CleanedPostStore, Vocabulary,
+                                        load_columns, save_columns)
 from tagmaps.classes.shared_structure import (EMOJI, LOCATIONS, POST_FIELDS, TAGS, TOPICS,
                                AnalysisBounds, CleanedPost, ClusterTypes,
-                               ItemCounter, PostStructure)
+                               ItemCounter, PostBatch, PostStructure)
+from tagmaps.classes.spill_store import (UPL_BYTES, UPL_ITEM_BYTES,
+                                         UplSpillStore)
+from tagmaps.classes.text_cleaner import TextCleaner
+from tagmaps.classes.top_sketch import (SKETCH_CAPACITY_FACTOR,
+                                        TopItemSketch)
 from tagmaps.classes.utils import Utils
 
 
+# kind of spilled item sets for userlocation_terms_dict
+UPL_TERMS = 'Terms'
+
+
+def get_upl_key(loc_id: int, user_id: int) -> int:
+    """Get int key for user post location (UPL)"""
+    return loc_id << 32 | user_id
+
+
 @dataclass
 class ItemStats:
     top_items: List[ItemCounter]
     total_unique: int
     total_without_longtail: Optional[int] = None
+    total_count: int = 0
 
 
 @dataclass
@@ -42,6 +64,272 @@ class PreparedStats:
     max_items: int
 
 
+@dataclass
+class PrepareDataState:
+    """Partial state of PrepareData, after ingestion
+
+    - covers all structures filled by PrepareData.add_record(),
+    to ingest shards of input data independently
+    (e.g. sharded by user, on several machines)
+    - states are reduced with merge(), in order of input,
+    before get_item_stats()/get_cleaned_post_dict()
+    - save()/load() store the state as a compressed
+    numpy archive (.npz) of int columns and vocabularies
+    """
+    count_glob: int
+    bounds: AnalysisBounds
+    users: Vocabulary
+    locations: Vocabulary
+    items: Vocabulary
+    total_item_counter: Dict[str, Counter[int]]
+    items_per_userloc: Dict[str, DefaultDict[int, Set[int]]]
+    useritem_counts_global: Dict[str, DefaultDict[int, Set[int]]]
+    locations_per_user: DefaultDict[int, Set[int]]
+    userlocation_terms_dict: DefaultDict[int, Set[int]]
+    userlocations_firstpost_dict: Dict[
+        int, Union[PostStructure, CleanedPost]]
+    locid_locname_dict: Dict[str, str]
+    top_item_sketches: Dict[str, TopItemSketch] = field(default_factory=dict)
+
+    # attributes of first posts per user location (UPL)
+    # that are needed to compile cleaned posts
+    FIRSTPOST_FIELDS = (
+        "origin_id", "guid", "post_create_date", "post_publish_date",
+        "post_views_count", "post_like_count", "loc_id", "loc_name")
+
+    def merge(self, partial_state: "PrepareDataState"):
+        """Merge other (partial) state into this state
+
+        - partial states must be merged in order of input,
+        the first post of each user location is kept
+        - ids of partial state are mapped to ids of this state
+        """
+        self.count_glob += partial_state.count_glob
+        self.bounds.merge(partial_state.bounds)
+        user_ids = [self.users.add(user) for user in partial_state.users.terms]
+        loc_ids = [
+            self.locations.add(loc) for loc in partial_state.locations.terms]
+        item_ids = [
+            self.items.add(item) for item in partial_state.items.terms]
+
+        def map_upl(upl_key: int) -> int:
+            return get_upl_key(
+                loc_ids[upl_key >> 32], user_ids[upl_key & 0xFFFFFFFF])
+
+        def map_user(user_id: int) -> int:
+            return user_ids[user_id]
+
+        for cls_type, item_counter in \
+                partial_state.total_item_counter.items():
+            ids = loc_ids if cls_type == LOCATIONS else item_ids
+            ref_counter = self.total_item_counter.setdefault(
+                cls_type, collections.Counter())
+            for item_id, count in item_counter.items():
+                ref_counter[ids[item_id]] += count
+        for cls_type, item_sets in partial_state.items_per_userloc.items():
+            PrepareDataState._merge_sets(
+                self.items_per_userloc.setdefault(
+                    cls_type, defaultdict(set)),
+                item_sets, map_upl, item_ids)
+        for cls_type, item_sets in \
+                partial_state.useritem_counts_global.items():
+            PrepareDataState._merge_sets(
+                self.useritem_counts_global.setdefault(
+                    cls_type, defaultdict(set)),
+                item_sets, map_user,
+                loc_ids if cls_type == LOCATIONS else item_ids)
+        PrepareDataState._merge_sets(
+            self.locations_per_user, partial_state.locations_per_user,
+            map_user, loc_ids)
+        PrepareDataState._merge_sets(
+            self.userlocation_terms_dict,
+            partial_state.userlocation_terms_dict, map_upl, item_ids)
+        for loc_id, loc_name in partial_state.locid_locname_dict.items():
+            self.locid_locname_dict.setdefault(loc_id, loc_name)
+        for post_locid_userid, first_post in \
+                partial_state.userlocations_firstpost_dict.items():
+            self.userlocations_firstpost_dict.setdefault(
+                map_upl(post_locid_userid), first_post)
+        for cls_type, sketch in partial_state.top_item_sketches.items():
+            self.top_item_sketches.setdefault(
+                cls_type, TopItemSketch(sketch.capacity, sketch.precision)
+            ).merge(sketch, item_ids)
+
+    @staticmethod
+    def _merge_sets(
+            ref_dict: DefaultDict[int, Set[int]],
+            partial_dict: DefaultDict[int, Set[int]],
+            map_key: Callable[[int], int], value_ids: List[int]):
+        """Union sets of partial_dict into ref_dict (per key),
+        with keys and values mapped to ids of ref_dict
+        """
+        for key, values in partial_dict.items():
+            ref_dict[map_key(key)] |= {value_ids[value] for value in values}
+
+    def save(self, output_file: Path):
+        """Store state to compressed numpy archive (.npz)
+
+        - sets per key are stored CSR-style (keys, offsets, values)
+        - of first posts, only FIRSTPOST_FIELDS are kept
+        """
+        bounds = self.bounds
+        columns: Dict[str, np.ndarray] = {
+            "count_glob": np.array([self.count_glob], dtype=np.int64),
+            "bounds": np.array([
+                np.nan if bound is None else bound for bound in (
+                    bounds.lim_lat_min, bounds.lim_lat_max,
+                    bounds.lim_lng_min, bounds.lim_lng_max)],
+                dtype=np.float64),
+            "users": np.array(self.users.terms, dtype=str),
+            "locations": np.array(self.locations.terms, dtype=str),
+            "items": np.array(self.items.terms, dtype=str),
+            "locid_locname_keys": np.array(
+                list(self.locid_locname_dict.keys()), dtype=str),
+            "locid_locname_values": np.array(
+                list(self.locid_locname_dict.values()), dtype=str),
+        }
+        for cls_type, item_counter in self.total_item_counter.items():
+            columns[f"total_item_counter/{cls_type}/ids"] = np.fromiter(
+                item_counter.keys(), dtype=np.int64,
+                count=len(item_counter))
+            columns[f"total_item_counter/{cls_type}/counts"] = np.fromiter(
+                item_counter.values(), dtype=np.int64,
+                count=len(item_counter))
+        set_dicts = {
+            "locations_per_user": self.locations_per_user,
+            "userlocation_terms_dict": self.userlocation_terms_dict}
+        for cls_type, item_sets in self.items_per_userloc.items():
+            set_dicts[f"items_per_userloc/{cls_type}"] = item_sets
+        for cls_type, item_sets in self.useritem_counts_global.items():
+            set_dicts[f"useritem_counts_global/{cls_type}"] = item_sets
+        for name, set_dict in set_dicts.items():
+            PrepareDataState._pack_sets(columns, name, set_dict)
+        for cls_type, sketch in self.top_item_sketches.items():
+            columns[f"top_item_sketches/{cls_type}/size"] = np.array(
+                [sketch.capacity, sketch.precision], dtype=np.int64)
+            columns[f"top_item_sketches/{cls_type}/item_ids"] = \
+                sketch.item_ids[:len(sketch)]
+            columns[f"top_item_sketches/{cls_type}/registers"] = \
+                sketch.registers[:len(sketch)]
+            columns[f"top_item_sketches/{cls_type}/errors"] = \
+                sketch.errors[:len(sketch)]
+        first_posts = self.userlocations_firstpost_dict
+        columns["firstpost/upl"] = np.fromiter(
+            first_posts.keys(), dtype=np.int64, count=len(first_posts))
+        for attr in PrepareDataState.FIRSTPOST_FIELDS:
+            values = [getattr(post, attr) for post in first_posts.values()]
+            if attr in ("origin_id", "post_views_count", "post_like_count"):
+                columns[f"firstpost/{attr}"] = np.array(
+                    [int(value or 0) for value in values], dtype=np.int64)
+            else:
+                columns[f"firstpost/{attr}"] = np.array(
+                    ["" if value is None else value for value in values],
+                    dtype=str)
+            columns[f"firstpost/{attr}/isnull"] = np.array(
+                [value is None for value in values], dtype=bool)
+        np.savez_compressed(output_file, **columns)
+
+    @classmethod
+    def load(cls, input_file: Path) -> "PrepareDataState":
+        """Load state stored with save()"""
+        with np.load(input_file) as archive:
+            columns = {name: archive[name] for name in archive.files}
+        bounds = AnalysisBounds()
+        (bounds.lim_lat_min, bounds.lim_lat_max,
+         bounds.lim_lng_min, bounds.lim_lng_max) = (
+            None if np.isnan(bound) else float(bound)
+            for bound in columns["bounds"])
+        state = cls(
+            count_glob=int(columns["count_glob"][0]),
+            bounds=bounds,
+            users=Vocabulary(columns["users"].tolist()),
+            locations=Vocabulary(columns["locations"].tolist()),
+            items=Vocabulary(columns["items"].tolist()),
+            total_item_counter=dict(),
+            items_per_userloc=dict(),
+            useritem_counts_global=dict(),
+            locations_per_user=PrepareDataState._unpack_sets(
+                columns, "locations_per_user"),
+            userlocation_terms_dict=PrepareDataState._unpack_sets(
+                columns, "userlocation_terms_dict"),
+            userlocations_firstpost_dict=dict(),
+            locid_locname_dict=dict(zip(
+                columns["locid_locname_keys"].tolist(),
+                columns["locid_locname_values"].tolist())))
+        for name in columns:
+            parts = name.split("/")
+            if parts[0] == "total_item_counter" and parts[2] == "ids":
+                state.total_item_counter[parts[1]] = collections.Counter(
+                    dict(zip(
+                        columns[name].tolist(),
+                        columns[f"total_item_counter/{parts[1]}/counts"]
+                        .tolist())))
+            elif parts[0] == "items_per_userloc" and parts[2] == "keys":
+                state.items_per_userloc[parts[1]] = \
+                    PrepareDataState._unpack_sets(columns, "/".join(parts[:2]))
+            elif parts[0] == "useritem_counts_global" and parts[2] == "keys":
+                state.useritem_counts_global[parts[1]] = \
+                    PrepareDataState._unpack_sets(columns, "/".join(parts[:2]))
+            elif parts[0] == "top_item_sketches" and parts[2] == "size":
+                capacity, precision = columns[name].tolist()
+                state.top_item_sketches[parts[1]] = \
+                    TopItemSketch.from_arrays(
+                        capacity, precision,
+                        columns[f"top_item_sketches/{parts[1]}/item_ids"],
+                        columns[f"top_item_sketches/{parts[1]}/registers"],
+                        columns[f"top_item_sketches/{parts[1]}/errors"])
+        state._unpack_firstposts(columns)
+        return state
+
+    def _unpack_firstposts(self, columns: Dict[str, np.ndarray]):
+        """Restore first posts per user location as CleanedPost
+
+        - lat/lng are not stored, these are taken from
+        location ids when compiling cleaned posts
+        """
+        field_values = dict()
+        for attr in PrepareDataState.FIRSTPOST_FIELDS:
+            field_values[attr] = [
+                None if null else value for value, null in zip(
+                    columns[f"firstpost/{attr}"].tolist(),
+                    columns[f"firstpost/{attr}/isnull"].tolist())]
+        for idx, upl_key in enumerate(columns["firstpost/upl"].tolist()):
+            self.userlocations_firstpost_dict[upl_key] = CleanedPost(
+                lat=None, lng=None,
+                user_guid=self.users.terms[upl_key & 0xFFFFFFFF],
+                **{attr: values[idx]
+                   for attr, values in field_values.items()})
+
+    @staticmethod
+    def _pack_sets(
+            columns: Dict[str, np.ndarray], name: str,
+            set_dict: DefaultDict[int, Set[int]]):
+        """Add CSR-style columns (keys, offsets, values) for set_dict"""
+        lengths = np.fromiter(
+            (len(values) for values in set_dict.values()),
+            dtype=np.int64, count=len(set_dict))
+        offsets = np.zeros(len(set_dict) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        columns[f"{name}/keys"] = np.fromiter(
+            set_dict.keys(), dtype=np.int64, count=len(set_dict))
+        columns[f"{name}/offsets"] = offsets
+        columns[f"{name}/values"] = np.fromiter(
+            itertools.chain.from_iterable(set_dict.values()),
+            dtype=np.int64, count=int(offsets[-1]))
+
+    @staticmethod
+    def _unpack_sets(
+            columns: Dict[str, np.ndarray],
+            name: str) -> DefaultDict[int, Set[int]]:
+        """Restore set_dict from CSR-style columns, see _pack_sets()"""
+        set_dict: DefaultDict[int, Set[int]] = defaultdict(set)
+        offsets = columns[f"{name}/offsets"].tolist()
+        values = columns[f"{name}/values"].tolist()
+        for idx, key in enumerate(columns[f"{name}/keys"].tolist()):
+            set_dict[key] = set(values[offsets[idx]:offsets[idx + 1]])
+        return set_dict
+
+
 class PrepareData():
     """Main Class for building summary statistics.
 
@@ -53,8 +341,14 @@ class PrepareData():
     def __init__(
             self, cluster_types: List[str], max_items: int,
             output_folder: Path, remove_long_tail: bool,
-            limit_bottom_user_count: int, topic_modeling: bool):
-        """Initializes Prepare Data structure"""
+            limit_bottom_user_count: int, topic_modeling: bool,
+            approximate_toplists: bool = None,
+            memory_budget: Optional[int] = None):
+        """Initializes Prepare Data structure
+
+        memory_budget: optional cap (MB) for aggregates per user location,
+        above which these are spilled to disk (see _spill())
+        """
         # global settings
         self.cluster_types = cluster_types
         # make sure statistics for locations are always calculated
@@ -66,46 +360,74 @@ class PrepareData():
         self.remove_long_tail = remove_long_tail
         self.limit_bottom_user_count = limit_bottom_user_count
         self.topic_modeling = topic_modeling
+        if approximate_toplists is None:
+            approximate_toplists = False
+        self.approximate_toplists = approximate_toplists
+        self.memory_budget = memory_budget
+        # on-disk store for aggregates per user location,
+        # initialized on first spill
+        self.spill_store: Optional[UplSpillStore] = None
+        # estimated memory use (bytes) of aggregates per user location
+        self._upl_bytes = 0
+        # post body and title are filtered during ingestion
+        self.text_cleaner = TextCleaner(ignore_stoplists=True)
         # global vars
         self.count_glob = 0
         self.bounds = AnalysisBounds()
         self.log = logging.getLogger("tagmaps")
+        # users, locations and items (tags, emoji, terms)
+        # are interned to dense int ids, all dicts/sets below
+        # refer to these ids; user locations (UPL) are keyed
+        # by int (loc_id << 32 | user_id), see get_upl_key()
+        self.users = Vocabulary()
+        self.locations = Vocabulary()
+        self.items = Vocabulary()
         # The following dict stores, per cls_type,
         # the total number of times items appeared
         # these are used to measure total counts
-        self.total_item_counter: Dict[str, Counter[str]] = \
-            dict.fromkeys(self.cluster_types, collections.Counter())
-        # for cls_type in self.cluster_types:
-        #     self.total_item_counter[cls_type] =
+        self.total_item_counter: Dict[str, Counter[int]] = {
+            cls_type: collections.Counter()
+            for cls_type in self.cluster_types}
         # cleaned stats dict for each ClusterType
         self.cleaned_stats: Dict[str, PreparedStats] = {}
         # Hashsets:
         self.items_per_userloc: Dict[
-            str, DefaultDict[str, Set[str]]] = {}
+            str, DefaultDict[int, Set[int]]] = {}
         for cls_type in [EMOJI, TAGS]:
             # items per user_location [EMOJI, TAGS, TOPICS]
             self.items_per_userloc[cls_type] = defaultdict(set)
         # and LOCATIONS per user
-        self.locations_per_user = defaultdict(set)
-        # dict to store names for loc ids
+        self.locations_per_user: DefaultDict[int, Set[int]] = \
+            defaultdict(set)
+        # dict to store names for loc ids (str)
         self.locid_locname_dict: Dict[str, str] = dict()  # nopep8
         if self.topic_modeling:
             self.user_topiclist_dict = defaultdict(set)
             self.user_post_ids_dict = defaultdict(set)
             self.userpost_first_thumb_dict = defaultdict(str)
         # list of distinct terms per user-location
-        self.userlocation_terms_dict = defaultdict(set)
+        self.userlocation_terms_dict: DefaultDict[int, Set[int]] = \
+            defaultdict(set)
         # first item for each UPL, required
         # for some attributes to generate CleanedPost
         self.userlocations_firstpost_dict: \
-            Dict[str, Union[PostStructure, CleanedPost]] = dict()
+            Dict[int, Union[PostStructure, CleanedPost]] = dict()
         # The following dicts store, per cls_type,
         # distinct items on a per user basis, e.g.
         # self.useritem_counts_global[TAGS][USER] = {term1, term2, term3}
         self.useritem_counts_global: Dict[
-            str, DefaultDict[str, Set[str]]] = dict()
+            str, DefaultDict[int, Set[int]]] = dict()
         for cls_type in self.cluster_types:
             self.useritem_counts_global[cls_type] = defaultdict(set)
+        # with approximate_toplists, distinct users per item
+        # are counted in bounded memory sketches [EMOJI, TAGS],
+        # instead of useritem_counts_global
+        self.top_item_sketches: Dict[str, TopItemSketch] = dict()
+        if self.approximate_toplists:
+            for cls_type in [EMOJI, TAGS]:
+                if cls_type in self.cluster_types:
+                    self.top_item_sketches[cls_type] = TopItemSketch(
+                        self.max_items * SKETCH_CAPACITY_FACTOR)
 
     def add_record(
             self, lbsn_post: Union[PostStructure, CleanedPost]):
@@ -120,51 +442,232 @@ class PrepareData():
         reduced information that is necessary for tag maps
         - get cleaned output with get_prepared_data()
         """
+        if isinstance(lbsn_post, PostStructure):
+            # get cleaned wordlist
+            cleaned_terms = self._get_cleaned_wordlist(
+                lbsn_post.post_body).union(
+                    self._get_cleaned_wordlist(lbsn_post.post_title))
+        else:
+            # words already cleaned
+            cleaned_terms = lbsn_post.post_body
+        self._add_post(
+            lbsn_post.user_guid, lbsn_post.loc_id, lbsn_post.loc_name,
+            lbsn_post.hashtags, lbsn_post.emoji, cleaned_terms,
+            lambda: lbsn_post)
+
+    def _add_post(
+            self, user_guid: str, location: Optional[str],
+            loc_name: Optional[str], hashtags: Optional[Iterable[str]],
+            emoji: Optional[Iterable[str]],
+            cleaned_terms: Optional[Iterable[str]],
+            get_first_post: Callable[[], Union[PostStructure, CleanedPost]]):
+        """Merge attributes of single post into aggregates
+
+        - get_first_post is only called for the first post
+        of each user location, to store it
+        """
         self.count_glob += 1
-        self._update_toplists(lbsn_post)
+        user_id = self.users.add(user_guid)
+        loc_id = self.locations.add(location)
+        hashtag_ids = self._get_item_ids(hashtags)
+        emoji_ids = self._get_item_ids(emoji)
+        self._update_toplists(
+            user_id, loc_id, location, hashtag_ids, emoji_ids)
         # create userid_loc_id, this is used as the base
         # for clustering data (metric UPL)
-        post_locid_userid: str = f'{lbsn_post.loc_id}::{lbsn_post.user_guid}'
+        post_locid_userid = get_upl_key(loc_id, user_id)
 
-        if lbsn_post.loc_id and (
-                lbsn_post.loc_name and lbsn_post.loc_id
+        if location and (
+                loc_name and location
                 not in self.locid_locname_dict):
             # add locname to dict
-            self.locid_locname_dict[
-                lbsn_post.loc_id] = lbsn_post.loc_name
-        if (lbsn_post.user_guid not in
+            self.locid_locname_dict[location] = loc_name
+        if (user_id not in
                 self.locations_per_user or
-                lbsn_post.loc_id not in
-                self.locations_per_user[lbsn_post.user_guid]):
-            # Bit wise or and assignment in one step.
+                loc_id not in
+                self.locations_per_user[user_id]):
             # -> assign locID to UserDict list
             # if not already contained
-            self.locations_per_user[lbsn_post.user_guid] |= \
-                {lbsn_post.loc_id}
-            # self.stats.count_loc += 1
+            self.locations_per_user[user_id].add(loc_id)
             self.userlocations_firstpost_dict[
-                post_locid_userid] = lbsn_post
+                post_locid_userid] = get_first_post()
+            self._upl_bytes += UPL_BYTES
 
         # union tags/emoji per userid/unique location
         if TAGS in self.cluster_types:
             self.items_per_userloc[TAGS][post_locid_userid] \
-                |= lbsn_post.hashtags
+                |= hashtag_ids
         if EMOJI in self.cluster_types:
             self.items_per_userloc[EMOJI][post_locid_userid] \
-                |= lbsn_post.emoji
-        if isinstance(lbsn_post, PostStructure):
-            # get cleaned wordlist
-            cleaned_terms_body = set(self._get_cleaned_wordlist(
-                lbsn_post.post_body))
-            cleaned_terms_title = set(self._get_cleaned_wordlist(
-                lbsn_post.post_title))
-            cleaned_terms = cleaned_terms_body.union(cleaned_terms_title)
-        else:
-            # words already cleaned
-            cleaned_terms = lbsn_post.post_body
+                |= emoji_ids
         # union words per userid/unique location
+        term_ids = self._get_item_ids(cleaned_terms)
         self.userlocation_terms_dict[
-            post_locid_userid] |= cleaned_terms
+            post_locid_userid] |= term_ids
+        if self.memory_budget is not None:
+            self._upl_bytes += UPL_ITEM_BYTES * (
+                len(hashtag_ids) + len(emoji_ids) + len(term_ids))
+            self._check_memory_budget()
+
+    def _check_memory_budget(self):
+        """Spill aggregates per user location,
+        if estimated memory use exceeds memory_budget
+        """
+        if self._upl_bytes > self.memory_budget * 1024 * 1024:
+            self._spill()
+
+    def _spill(self):
+        """Move aggregates per user location (UPL) to disk
+
+        - items_per_userloc, userlocation_terms_dict and
+          userlocations_firstpost_dict are written to the spill store
+          and cleared in memory
+        - spilled and in-memory aggregates are merged back
+          when cleaned posts are compiled (_iter_cleaned_posts())
+        """
+        if self.spill_store is None:
+            self.spill_store = UplSpillStore(self.output_folder)
+        self.log.debug(
+            f'Spilling {len(self.userlocations_firstpost_dict)} '
+            f'user locations to {self.spill_store.path.name}')
+        upl_sets = {
+            UPL_TERMS: self.userlocation_terms_dict,
+            **self.items_per_userloc}
+        self.spill_store.spill(upl_sets, self.userlocations_firstpost_dict)
+        for set_dict in upl_sets.values():
+            set_dict.clear()
+        self.userlocations_firstpost_dict.clear()
+        self._upl_bytes = 0
+
+    def _get_item_ids(self, items: Optional[Iterable[str]]) -> Set[int]:
+        """Get set of (interned) item ids for items"""
+        if not items:
+            return set()
+        return {self.items.add(item) for item in items}
+
+    def _get_item_names(self, item_ids: Set[int]) -> Set[str]:
+        """Get set of item names for item ids"""
+        return {self.items.terms[item_id] for item_id in item_ids}
+
+    def _get_vocabulary(self, cls_type: str) -> Vocabulary:
+        """Get vocabulary of item ids for cls_type"""
+        if cls_type == LOCATIONS:
+            return self.locations
+        return self.items
+
+    def new_partial(self) -> "PrepareData":
+        """Get empty PrepareData with same settings,
+        e.g. for parsing input files in parallel
+        """
+        return PrepareData(
+            list(self.cluster_types), self.max_items, self.output_folder,
+            self.remove_long_tail, self.limit_bottom_user_count,
+            self.topic_modeling, self.approximate_toplists)
+
+    def get_state(self) -> "PrepareDataState":
+        """Get (mergeable) state of records added to this PrepareData
+
+        - the state refers to (and does not copy)
+        the structures of this PrepareData
+        - use PrepareDataState.save() to store the state of a shard
+        of input data, e.g. to reduce shards ingested on several machines
+        with merge()
+        """
+        if self.spill_store is not None:
+            raise ValueError(
+                "State is not available after aggregates "
+                "have been spilled to disk (memory_budget).")
+        return self._get_state()
+
+    def _get_state(self) -> "PrepareDataState":
+        """Get state, regardless of spilled aggregates"""
+        return PrepareDataState(
+            count_glob=self.count_glob,
+            bounds=self.bounds,
+            users=self.users,
+            locations=self.locations,
+            items=self.items,
+            total_item_counter=self.total_item_counter,
+            items_per_userloc=self.items_per_userloc,
+            useritem_counts_global=self.useritem_counts_global,
+            locations_per_user=self.locations_per_user,
+            userlocation_terms_dict=self.userlocation_terms_dict,
+            userlocations_firstpost_dict=self.userlocations_firstpost_dict,
+            locid_locname_dict=self.locid_locname_dict,
+            top_item_sketches=self.top_item_sketches)
+
+    def merge(self, partial_data: Union["PrepareData", "PrepareDataState"]):
+        """Merge records added to other (partial) PrepareData
+
+        - partial data must be merged in order of input,
+        the first post of each user location is kept
+        - ids of partial data are mapped to ids of this PrepareData
+        - partial_data can also be a PrepareDataState,
+        e.g. loaded from file with PrepareDataState.load()
+        """
+        if isinstance(partial_data, PrepareData):
+            partial_data = partial_data.get_state()
+        state = self._get_state()
+        state.merge(partial_data)
+        self.count_glob = state.count_glob
+        if self.memory_budget is not None:
+            self._upl_bytes = self._estimate_upl_bytes()
+            self._check_memory_budget()
+
+    def _estimate_upl_bytes(self) -> int:
+        """Estimate memory use of aggregates per user location"""
+        item_count = sum(
+            len(item_ids) for set_dict in (
+                self.userlocation_terms_dict, *self.items_per_userloc.values())
+            for item_ids in set_dict.values())
+        return (len(self.userlocations_firstpost_dict) * UPL_BYTES
+                + item_count * UPL_ITEM_BYTES)
+
+    def add_batch(self, post_batch: PostBatch):
+        """Add batch of posts (chunked ingestion)
+
+        - terms of post body and title are cleaned here (if not
+        already available as post_terms), each post is then merged
+        into aggregates with _add_post()
+        - a CleanedPost is only created for the first post
+        of each user location
+        """
+        post_terms = post_batch.post_terms
+        if post_terms is None:
+            post_terms = [
+                body_terms.union(title_terms) for body_terms, title_terms
+                in zip(self.text_cleaner.clean_batch(post_batch.post_body),
+                       self.text_cleaner.clean_batch(post_batch.post_title))]
+        for idx, cleaned_terms in enumerate(post_terms):
+            self._add_post(
+                post_batch.user_guid[idx], post_batch.loc_id[idx],
+                post_batch.loc_name[idx], post_batch.hashtags[idx],
+                post_batch.emoji[idx], cleaned_terms,
+                partial(PrepareData._get_batch_post,
+                        post_batch, idx, cleaned_terms))
+
+    @staticmethod
+    def _get_batch_post(
+            post_batch: PostBatch, idx: int,
+            cleaned_terms: Set[str]) -> CleanedPost:
+        """Get CleanedPost for single post of batch"""
+        lat = post_batch.latitude[idx]
+        lng = post_batch.longitude[idx]
+        return CleanedPost(
+            origin_id=post_batch.origin_id[idx],
+            lat=None if lat is None else float(lat),
+            lng=None if lng is None else float(lng),
+            guid=post_batch.guid[idx],
+            user_guid=post_batch.user_guid[idx],
+            loc_id=post_batch.loc_id[idx],
+            post_create_date=post_batch.post_create_date[idx],
+            post_publish_date=post_batch.post_publish_date[idx],
+            post_body=cleaned_terms,
+            hashtags=post_batch.hashtags[idx],
+            emoji=post_batch.emoji[idx],
+            post_views_count=post_batch.post_views_count[idx],
+            post_like_count=post_batch.post_like_count[idx],
+            loc_name=post_batch.loc_name[idx])
 
     def get_cleaned_post_dict(
             self, input_path=None) -> Optional[Dict[str, CleanedPost]]:
@@ -181,15 +684,70 @@ class PrepareData():
             cleaned_post_dict = self._load_cleaned_data(input_path)
         return cleaned_post_dict
 
+    def get_cleaned_post_store(
+            self, cleaned_posts: Optional[Iterable[CleanedPost]] = None
+    ) -> CleanedPostStore:
+        """Output wrapper for columnar store of cleaned posts
+
+        - if no cleaned_posts are provided, this
+          avoids materializing a dict of all cleaned posts,
+          posts are added to the store one at a time
+        - the store shares vocabularies (int ids) for
+          users, locations and items with this PrepareData
+        """
+        if cleaned_posts is None:
+            cleaned_posts = self._iter_cleaned_posts()
+        return CleanedPostStore.from_posts(
+            cleaned_posts, users=self.users, locations=self.locations,
+            items=self.items)
+
     def _load_cleaned_data(self, input_path):
         """Get cleaned Post Dict from intermediate
         data stored in file"""
         input_file = Path.cwd() / input_path
         if not input_file.exists():
             raise ValueError(f"File does not exist: {input_file}")
+        if input_file.suffix == '.npz':
+            return self.load_cleaned_store(input_file).to_dict()
         cleaned_post_dict = self._read_cleaned_data(input_file)
         return cleaned_post_dict
 
+    def load_cleaned_store(self, input_path: Path) -> CleanedPostStore:
+        """Get columnar store of cleaned posts from binary
+        intermediate data (see write_cleaned_store())
+
+        - numeric and item columns are memory-mapped
+        - item stats are restored from file, vocabularies
+          of users, locations and items are shared with the store
+        """
+        input_file = Path.cwd() / input_path
+        if not input_file.exists():
+            raise ValueError(f"File does not exist: {input_file}")
+        columns = load_columns(input_file)
+        post_store = CleanedPostStore.from_columns(columns)
+        self.users = post_store.users
+        self.locations = post_store.locations
+        self.items = post_store.items
+        self.count_glob += len(post_store)
+        for user_id, loc_id in zip(
+                post_store.user_ids.tolist(), post_store.loc_ids.tolist()):
+            self.locations_per_user[user_id].add(loc_id)
+        for row in np.flatnonzero(~post_store.isnull["loc_name"]).tolist():
+            loc_name = post_store.str_value("loc_name", row)
+            if loc_name:
+                self.locid_locname_dict.setdefault(
+                    str(self.locations.terms[post_store.loc_ids[row]]),
+                    loc_name)
+        lat_values = post_store.lat[post_store.lat != 0]
+        lng_values = post_store.lng[post_store.lng != 0]
+        if len(lat_values) and len(lng_values):
+            self.bounds.upd_latlng_bounds(
+                float(lat_values.min()), float(lng_values.min()))
+            self.bounds.upd_latlng_bounds(
+                float(lat_values.max()), float(lng_values.max()))
+        self.cleaned_stats = PrepareData._stats_from_columns(columns)
+        return post_store
+
     def write_cleaned_data(
             self, cleaned_post_dict: Optional[Dict[str, CleanedPost]] = None,
             panon: bool = None):
@@ -220,6 +778,74 @@ class PrepareData():
                     panon_set)
         self.log.info(' done.')
 
+    def write_cleaned_store(
+            self, post_store: CleanedPostStore, panon: bool = None):
+        """Write cleaned data to binary intermediate file (Output_cleaned.npz)
+
+        - uncompressed numpy archive with the columns of
+          CleanedPostStore.to_columns(), which can be memory-mapped
+        - item stats are stored alongside, see _stats_to_columns()
+        """
+        self.log.info(
+            f'Writing cleaned intermediate '
+            f'data to file (Output_cleaned.npz)..')
+        if panon is None:
+            panon = True
+        cleaned_stats = self.get_item_stats()
+        if panon:
+            panon_set = self._get_panon_sets()
+            post_store = CleanedPostStore.from_posts(
+                PrepareData._panonymize_cleaned_post(
+                    post_store.post(row), panon_set)
+                for row in range(len(post_store)))
+        columns = post_store.to_columns()
+        columns.update(PrepareData._stats_to_columns(cleaned_stats))
+        save_columns(self.output_folder / 'Output_cleaned.npz', columns)
+        self.log.info(' done.')
+
+    @staticmethod
+    def _stats_to_columns(
+            cleaned_stats: Dict[str, PreparedStats]) -> Dict[str, np.ndarray]:
+        """Get arrays for prepared stats of all cls_types
+
+        - "stats/{cls_type}/items": names of top items (str)
+        - "stats/{cls_type}/user_counts": user count of top items
+        - "stats/{cls_type}/totals": total_unique_items,
+          total_item_count and max_items
+        """
+        columns = dict()
+        for cls_type, stats in cleaned_stats.items():
+            columns[f"stats/{cls_type}/items"] = np.array(
+                [item.name for item in stats.top_items_list], dtype=str)
+            columns[f"stats/{cls_type}/user_counts"] = np.array(
+                [item.ucount for item in stats.top_items_list],
+                dtype=np.int64)
+            columns[f"stats/{cls_type}/totals"] = np.array(
+                [stats.total_unique_items, stats.total_item_count,
+                 stats.max_items], dtype=np.int64)
+        return columns
+
+    @staticmethod
+    def _stats_from_columns(
+            columns: Dict[str, np.ndarray]) -> Dict[str, PreparedStats]:
+        """Restore prepared stats, see _stats_to_columns()"""
+        cleaned_stats = dict()
+        for cls_type in ClusterTypes:
+            totals = columns.get(f"stats/{cls_type}/totals")
+            if totals is None:
+                cleaned_stats[cls_type] = PreparedStats([], 0, 0, 0)
+                continue
+            top_items_list = [
+                ItemCounter(name, ucount) for name, ucount in zip(
+                    columns[f"stats/{cls_type}/items"].tolist(),
+                    columns[f"stats/{cls_type}/user_counts"].tolist())]
+            total_unique_items, total_item_count, max_items = \
+                totals.tolist()
+            cleaned_stats[cls_type] = PreparedStats(
+                top_items_list, total_unique_items, total_item_count,
+                max_items)
+        return cleaned_stats
+
     def _get_panon_sets(self):
         """Prepare panon by generating dict of sets with popular terms
         """
@@ -281,8 +907,7 @@ class PrepareData():
         total_unique_items = item_stats.total_unique
         itemcount_without_longtail = item_stats.total_without_longtail
         # top counts
-        total_item_count = PrepareData._get_total_count(
-            top_items_list, self.total_item_counter[cls_type])
+        total_item_count = item_stats.total_count
         # assign stats to structure
         # update max_item from optionally long tail removal
         if itemcount_without_longtail and cls_type in [EMOJI, TAGS]:
@@ -294,33 +919,45 @@ class PrepareData():
             max_items)
         return item_stats
 
-    def _update_toplists(self, lbsn_post):
+    def _update_toplists(
+            self, user_id: int, loc_id: int, location: Optional[str],
+            hashtag_ids: Set[int], emoji_ids: Set[int]):
         """Calculate toplists for emoji, tags and locations
 
         - adds tag/emojicount of this post to overall
           tag/emojicount for this user,
         - initialize counter for user if not already done
+        - with approximate_toplists, users are added to
+          sketches of items instead (EMOJI, TAGS)
         """
+        user_hash = None
         for cls_type in [EMOJI, TAGS, TOPICS]:
             if cls_type not in self.cluster_types:
                 continue
             if cls_type in [TAGS, TOPICS]:
                 # to do: TOPIC implementation
-                item_list = lbsn_post.hashtags
+                item_list = hashtag_ids
             else:
-                item_list = lbsn_post.emoji
+                item_list = emoji_ids
             if not item_list:
                 continue
+            self.total_item_counter[cls_type].update(item_list)
+            sketch = self.top_item_sketches.get(cls_type)
+            if sketch is not None:
+                if user_hash is None:
+                    user_hash = TopItemSketch.hash_user(
+                        self.users.terms[user_id])
+                sketch.update(item_list, user_hash)
+                continue
             self.useritem_counts_global[cls_type][
-                lbsn_post.user_guid].update(
+                user_id].update(
                     item_list)
-            self.total_item_counter[cls_type].update(item_list)
         # locations
-        if lbsn_post.loc_id:
+        if location:
             # update single item
-            self.useritem_counts_global[LOCATIONS][lbsn_post.user_guid].add(
-                lbsn_post.loc_id)
-            self.total_item_counter[LOCATIONS][lbsn_post.loc_id] += 1
+            self.useritem_counts_global[LOCATIONS][user_id].add(
+                loc_id)
+            self.total_item_counter[LOCATIONS][loc_id] += 1
 
     @staticmethod
     def _write_toplist(
@@ -375,55 +1012,149 @@ class PrepareData():
                 top_list, cls_type, max_items,
                 self.output_folder, self.locid_locname_dict)
 
+    def get_user_item_matrix(self, cls_type: str = TAGS) -> csr_matrix:
+        """Get sparse (users x items) matrix of distinct items per user
+
+        - rows refer to user ids, columns to ids
+          of the cls_type vocabulary
+        - built once from useritem_counts_global after ingestion
+        """
+        item_sets = self.useritem_counts_global[cls_type]
+        user_ids = np.fromiter(
+            item_sets.keys(), dtype=np.int64, count=len(item_sets))
+        lengths = np.fromiter(
+            (len(item_set) for item_set in item_sets.values()),
+            dtype=np.int64, count=len(item_sets))
+        item_ids = np.fromiter(
+            itertools.chain.from_iterable(item_sets.values()),
+            dtype=np.int64, count=int(lengths.sum()))
+        shape = (len(self.users), len(self._get_vocabulary(cls_type)))
+        return csr_matrix(
+            (np.ones(len(item_ids), dtype=np.int8),
+             (np.repeat(user_ids, lengths), item_ids)), shape=shape)
+
     def _get_top_list(
             self, cls_type: str = TAGS) -> ItemStats:
         """Get Top Tags on a per user basis, i.e.
 
         - the global number of distinct users who used each distinct tag
         - this ignores duplicate use of
-        - calculation is based on dict userdict_itemcounters_global,
-            with counters of tags for each user
+        - calculation is based on the column nnz of the sparse
+            user item matrix (see get_user_item_matrix())
+        - ties are ordered by item name
         Returns:
             - list of top tags up to tmax [1000]
             - count of total unique tags
+            - total count of top tags (all posts)
         """
-        overall_usercount_per_item = collections.Counter()
-        for item_hash in self.useritem_counts_global[cls_type].values():
-            # taghash contains unique values (= strings) for each user,
-            # thus summing up these taghashes counts each user
-            # only once per tag (or emoji)
-            overall_usercount_per_item.update(item_hash)
-        total_unique = len(overall_usercount_per_item)
+        if cls_type in self.top_item_sketches:
+            return self._get_approximate_top_list(cls_type)
+        # distinct users per item
+        user_counts = self.get_user_item_matrix(cls_type).getnnz(axis=0)
+        total_unique = int(np.count_nonzero(user_counts))
         # get all items for "locations"
         # but clip list for tags and emoji
         if cls_type in (TAGS, EMOJI):
             max_items = self.max_items
         else:
             max_items = None
-        top_items_list = overall_usercount_per_item.most_common(max_items)
+        vocabulary = self._get_vocabulary(cls_type)
+        top_ids = PrepareData._get_top_ids(
+            user_counts, vocabulary, max_items)
         # convert list of item counts into list of namedtuple
         top_items_list = [
-            ItemCounter(*ic_tuple) for ic_tuple in top_items_list]
+            ItemCounter(vocabulary.terms[item_id], int(user_counts[item_id]))
+            for item_id in top_ids]
+        total_without_longtail = 0
+        if self.remove_long_tail is True:
+            total_without_longtail = self._remove_long_tail(
+                top_items_list, cls_type)
+        total_count = PrepareData._get_total_count(
+            top_ids[:len(top_items_list)],
+            self.total_item_counter[cls_type])
+        return ItemStats(
+            top_items_list, total_unique, total_without_longtail,
+            total_count)
+
+    def _get_approximate_top_list(self, cls_type: str) -> ItemStats:
+        """Get Top Items from sketch of distinct users per item
+
+        - user counts are estimates, see approximation_report()
+        - count of total unique items is exact
+        """
+        vocabulary = self._get_vocabulary(cls_type)
+        user_counts = self.top_item_sketches[cls_type].counts()
+        top_ids = [
+            item_id for _, _, item_id in sorted(
+                (-ucount, vocabulary.terms[item_id], item_id)
+                for item_id, ucount in user_counts.items()
+                if ucount > 0)][:self.max_items]
+        top_items_list = [
+            ItemCounter(vocabulary.terms[item_id], user_counts[item_id])
+            for item_id in top_ids]
         total_without_longtail = 0
         if self.remove_long_tail is True:
             total_without_longtail = self._remove_long_tail(
                 top_items_list, cls_type)
-        return ItemStats(top_items_list, total_unique, total_without_longtail)
+        total_count = PrepareData._get_total_count(
+            top_ids[:len(top_items_list)],
+            self.total_item_counter[cls_type])
+        return ItemStats(
+            top_items_list, len(self.total_item_counter[cls_type]),
+            total_without_longtail, total_count)
+
+    def approximation_report(self):
+        """Report error bounds of approximate top lists
+
+        - Space-Saving error: max overcount of users for items in top list
+        - HyperLogLog: relative standard error of user counts
+        """
+        for cls_type, sketch in self.top_item_sketches.items():
+            top_ids = [
+                self.items.get(item.name) for item in
+                self.get_item_stats()[cls_type].top_items_list]
+            max_error = max(sketch.errors_of(top_ids), default=0)
+            self.log.info(
+                f'Approximate top list ({cls_type}): '
+                f'{len(sketch)} of {sketch.capacity} items monitored, '
+                f'user counts overestimate by at most '
+                f'{max_error} users (Space-Saving), '
+                f'relative standard error '
+                f'{sketch.relative_error:.1%} (HyperLogLog).')
 
     @staticmethod
-    def _get_total_count(top_list, top_counter):
+    def _get_top_ids(
+            user_counts: np.ndarray, vocabulary: Vocabulary,
+            max_items: Optional[int] = None) -> List[int]:
+        """Get ids of items with most users, up to max_items
+
+        - candidates are selected with argpartition,
+          including all items tied with the last one
+        - sorted by user count (descending) and item name
+        """
+        item_ids = np.flatnonzero(user_counts)
+        if max_items is not None and max_items < len(item_ids):
+            if max_items <= 0:
+                return []
+            item_counts = user_counts[item_ids]
+            top_idx = np.argpartition(
+                -item_counts, max_items - 1)[:max_items]
+            item_ids = item_ids[item_counts >= item_counts[top_idx].min()]
+        top_ids = sorted(
+            zip((-user_counts[item_ids]).tolist(),
+                (vocabulary.terms[item_id] for item_id in item_ids),
+                item_ids.tolist()))
+        return [item_id for _, _, item_id in top_ids[:max_items]]
+
+    @staticmethod
+    def _get_total_count(top_ids: List[int], top_counter: Counter[int]):
         """Calculate Total Tags for selected
 
         Arguments:
-        top_list (Long Tail Stat)
+        top_ids (Long Tail Stat, as item ids)
         top_counter (Reference to counter object)
         """
-        total_count = 0
-        for item in top_list:
-            count = top_counter.get(item.name)
-            if count:
-                total_count += count
-        return total_count
+        return sum(top_counter.get(item_id, 0) for item_id in top_ids)
 
     def _remove_long_tail(self,
                           top_list: List[ItemCounter],
@@ -473,29 +1204,46 @@ class PrepareData():
         - optionally writes entries to file, if handler exists
         """
         cleaned_post_dict: Dict[str, CleanedPost] = dict()
-        for user_guid, locationhash in self.locations_per_user.items():
+        for cleaned_post in self._iter_cleaned_posts():
+            cleaned_post_dict[cleaned_post.guid] = cleaned_post
+        return cleaned_post_dict
+
+    def _iter_cleaned_posts(self) -> Iterator[CleanedPost]:
+        """Loop user locations and yield cleaned posts
+
+        - updates topic models and boundary on the way
+        """
+        for user_id, locationhash in self.locations_per_user.items():
+            user_guid = self.users.terms[user_id]
             # loop all distinct user locations
-            for location in locationhash:
-                locid_userid = f'{location}::{user_guid}'
-                post_latlng = location.split(':')
+            for loc_id in locationhash:
+                locid_userid = get_upl_key(loc_id, user_id)
+                post_latlng = self.locations.terms[loc_id].split(':')
 
                 first_post = self.userlocations_firstpost_dict.get(
                     locid_userid, None)
+                spilled_sets = None
+                if self.spill_store is not None:
+                    # spilled first posts precede those in memory
+                    spilled_sets, spilled_post = self.spill_store.get(
+                        locid_userid)
+                    if spilled_post is not None:
+                        first_post = spilled_post
                 if first_post is None:
                     return
                 # create tuple with cleaned photo data
                 cleaned_post = self._compile_cleaned_post(
-                    first_post, locid_userid, post_latlng, user_guid)
+                    first_post, locid_userid, post_latlng, user_guid,
+                    spilled_sets)
                 if cleaned_post is None:
                     continue
                 if self.topic_modeling:
                     self._update_topic_models(
                         cleaned_post, user_guid)
-                cleaned_post_dict[cleaned_post.guid] = cleaned_post
+                yield cleaned_post
                 # update boundary
                 self.bounds.upd_latlng_bounds(
                     cleaned_post.lat, cleaned_post.lng)
-        return cleaned_post_dict
 
     def _read_cleaned_data(self, cdata: Path):
         """Create cleaned post dict from intermediate data file store"""
@@ -610,8 +1358,10 @@ class PrepareData():
         )
         return cleaned_post
 
-    def _compile_cleaned_post(self, first_post, locid_userid,
-                              post_latlng, user_key) -> Optional[CleanedPost]:
+    def _compile_cleaned_post(
+            self, first_post, locid_userid, post_latlng, user_key,
+            spilled_sets: Optional[Dict[str, Set[int]]] = None
+    ) -> Optional[CleanedPost]:
         """Merge cleaned post from all posts of a certain user
         at a specific location. This is producing the final CleanedPost.
 
@@ -626,21 +1376,26 @@ class PrepareData():
 
         Keyword arguments:
         first_post      -- first post of a user_guid at a location
-        locid_userid    -- user_guid and loc_id in merged format
-                           (f'{location}::{user_key}')
+        locid_userid    -- user_id and loc_id in merged format
+                           (see get_upl_key())
         post_latlng     -- tuple with lat/lng coordinates
         user_key        -- user_guid
+        spilled_sets    -- item ids per kind spilled to disk
+                           for this user location (see _spill())
 
         Note:
             ("",) means: substitute empty tuple as default
         """
 
-        merged_wordlist = PrepareData._get_merged(
-            self.userlocation_terms_dict, locid_userid)
-        merged_emojilist = PrepareData._get_merged(
-            self.items_per_userloc[EMOJI], locid_userid)
-        merged_taglist = PrepareData._get_merged(
-            self.items_per_userloc[TAGS], locid_userid)
+        merged_wordlist = self._get_item_names(PrepareData._get_merged(
+            self.userlocation_terms_dict, locid_userid,
+            spilled_sets, UPL_TERMS))
+        merged_emojilist = self._get_item_names(PrepareData._get_merged(
+            self.items_per_userloc[EMOJI], locid_userid,
+            spilled_sets, EMOJI))
+        merged_taglist = self._get_item_names(PrepareData._get_merged(
+            self.items_per_userloc[TAGS], locid_userid,
+            spilled_sets, TAGS))
         try:
             lat = float(post_latlng[0])
             lng = float(post_latlng[1])
@@ -667,13 +1422,19 @@ class PrepareData():
         return cleaned_post
 
     @staticmethod
-    def _get_merged(ref_dict: Dict, locid_userid: str) -> Set[str]:
-        """Gets set of words for userlocid from ref dictionary
+    def _get_merged(
+            ref_dict: Dict, locid_userid: int,
+            spilled_sets: Optional[Dict[str, Set[int]]] = None,
+            kind: Optional[str] = None) -> Set[int]:
+        """Gets set of item ids for userlocid from ref dictionary,
+        united with spilled item ids of kind (if any)
 
         Note: since using defaultdict,
         keys not found will return empty set()
         """
         value = ref_dict[locid_userid]
+        if spilled_sets and kind in spilled_sets:
+            return value | spilled_sets[kind]
         return value
 
     def _write_location_tocsv(self, datawriter,
@@ -763,17 +1524,10 @@ class PrepareData():
                 attr_list.append(attr)
         return attr_list
 
-    def _get_cleaned_wordlist(self, post_body_string):
-        cleaned_post_body = Utils.remove_special_chars(post_body_string)
-        cleaned_wordlist = PrepareData._get_wordlist(cleaned_post_body)
-        return cleaned_wordlist
-
-    @staticmethod
-    def _get_wordlist(cleaned_post_body):
-        """split by space-characterm, filter by length"""
-        wordlist = [word for word in cleaned_post_body.lower().split(
-            ' ') if len(word) > 2]
-        return wordlist
+    def _get_cleaned_wordlist(self, post_body_string) -> Set[str]:
+        """Remove special chars, split by space-character,
+        filter by length"""
+        return self.text_cleaner.clean(post_body_string)
 
     def global_stats_report(self, cleaned=None):
         """Report global stats after data has been read"""
@@ -16,6 +16,17 @@ TAGS: str = 'Tags'
 EMOJI: str = 'Emoji'
 TOPICS: str = 'Topics'
 ClusterTypes: List[str] = [TAGS, EMOJI, LOCATIONS, TOPICS]
+HDBSCAN: str = 'hdbscan'
+RADIUS: str = 'radius'
+GRID: str = 'grid'
+ClusterEngines: List[str] = [HDBSCAN, RADIUS, GRID]
+INGEST_CSV: str = 'csv'
+INGEST_PANDAS: str = 'pandas'
+INGEST_PYARROW: str = 'pyarrow'
+IngestEngines: List[str] = [INGEST_CSV, INGEST_PANDAS, INGEST_PYARROW]
+INTERMEDIATE_CSV: str = 'csv'
+INTERMEDIATE_NPZ: str = 'npz'
+IntermediateFormats: List[str] = [INTERMEDIATE_CSV, INTERMEDIATE_NPZ]
 
 
 @dataclass
@@ -159,6 +170,38 @@ class PostStructure:
     loc_name: Optional[str] = None
 
 
+@dataclass
+class PostBatch:
+    """Batch of filtered posts (chunked ingestion)
+
+    - one list per post attribute, all of equal length
+    - post_body and post_title contain filtered
+    (but not yet cleaned) text, as in PostStructure
+    - post_terms optionally contains cleaned terms of post body
+    and title (see TextCleaner), if these were already cleaned
+    during ingestion
+    """
+    origin_id: List[int]
+    guid: List[str]
+    user_guid: List[str]
+    latitude: List[Optional[Decimal]]
+    longitude: List[Optional[Decimal]]
+    loc_id: List[Optional[str]]
+    loc_name: List[Optional[str]]
+    post_create_date: List[Optional[str]]
+    post_publish_date: List[Optional[str]]
+    post_body: List[Optional[str]]
+    post_title: List[Optional[str]]
+    hashtags: List[Set[str]]
+    emoji: List[Set[str]]
+    post_views_count: List[int]
+    post_like_count: List[int]
+    post_terms: Optional[List[Set[str]]] = None
+
+    def __len__(self):
+        return len(self.guid)
+
+
 @dataclass
 class ItemCounter:
     name: str
@@ -196,6 +239,13 @@ class AnalysisBounds():
                 (lng > self.lim_lng_max and not lng == 0):
             self.lim_lng_max = lng
 
+    def merge(self, bounds: "AnalysisBounds"):
+        """Update bounds with bounds of other (partial) data"""
+        if bounds.lim_lat_min is None:
+            return
+        self.upd_latlng_bounds(bounds.lim_lat_min, bounds.lim_lng_min)
+        self.upd_latlng_bounds(bounds.lim_lat_max, bounds.lim_lng_max)
+
     def get_bound_report(self):
         """Report on spatial bounds"""
         if (self.lim_lat_min is None
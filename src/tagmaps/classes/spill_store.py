@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module for spilling aggregates of PrepareData to disk (SQLite),
+to cap memory use during ingestion
+"""
+
+from __future__ import absolute_import
+
+import os
+import pickle
+import sqlite3
+import tempfile
+import weakref
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+
+# rough estimates of memory use in bytes,
+# for each user location (UPL, first post and dict entries)
+# and for each item id in sets per UPL
+UPL_BYTES = 1500
+UPL_ITEM_BYTES = 50
+
+
+class UplSpillStore():
+    """On-disk store for aggregates per user location (UPL)
+
+    - item id sets of several kinds (e.g. TAGS, EMOJI, terms)
+      and first posts are written per UPL key
+    - sets of the same UPL may be spilled several times,
+      these are united on read
+    - first posts are only written once per UPL, since
+      spilled data always precedes data kept in memory
+    - the SQLite file is removed when the store is garbage collected
+    """
+
+    def __init__(self, folder: Optional[Path] = None):
+        file_handle, file_name = tempfile.mkstemp(
+            suffix=".sqlite", prefix="tagmaps_spill_", dir=folder)
+        os.close(file_handle)
+        self.path = Path(file_name)
+        self.spilled = False
+        self.con = sqlite3.connect(file_name)
+        self.con.execute("PRAGMA journal_mode=OFF")
+        self.con.execute("PRAGMA synchronous=OFF")
+        self.con.execute(
+            "CREATE TABLE upl_sets (upl INTEGER, kind TEXT, ids BLOB)")
+        self.con.execute(
+            "CREATE TABLE upl_firstpost (upl INTEGER PRIMARY KEY, post BLOB)")
+        self._finalizer = weakref.finalize(
+            self, UplSpillStore._remove, self.con, self.path)
+
+    @staticmethod
+    def _remove(con: sqlite3.Connection, path: Path):
+        """Close connection and remove SQLite file"""
+        con.close()
+        path.unlink()
+
+    def __getstate__(self):
+        raise TypeError("UplSpillStore cannot be pickled.")
+
+    def spill(
+            self, upl_sets: Dict[str, Dict[int, Set[int]]],
+            first_posts: Dict[int, Any]):
+        """Write sets (per kind and UPL) and first posts (per UPL)"""
+        self.con.executemany(
+            "INSERT INTO upl_sets VALUES (?, ?, ?)", (
+                (upl_key, kind, array("q", item_ids).tobytes())
+                for kind, set_dict in upl_sets.items()
+                for upl_key, item_ids in set_dict.items() if item_ids))
+        self.con.executemany(
+            "INSERT OR IGNORE INTO upl_firstpost VALUES (?, ?)", (
+                (upl_key, pickle.dumps(post, pickle.HIGHEST_PROTOCOL))
+                for upl_key, post in first_posts.items()))
+        if not self.spilled:
+            self.con.execute("CREATE INDEX upl_sets_upl ON upl_sets (upl)")
+            self.spilled = True
+        self.con.commit()
+
+    def get(self, upl_key: int) -> Tuple[Dict[str, Set[int]], Optional[Any]]:
+        """Get spilled sets (per kind) and first post for UPL"""
+        upl_sets: Dict[str, Set[int]] = dict()
+        for kind, ids in self.con.execute(
+                "SELECT kind, ids FROM upl_sets WHERE upl = ?", (upl_key,)):
+            item_ids = array("q")
+            item_ids.frombytes(ids)
+            upl_sets.setdefault(kind, set()).update(item_ids)
+        row = self.con.execute(
+            "SELECT post FROM upl_firstpost WHERE upl = ?",
+            (upl_key,)).fetchone()
+        first_post = None if row is None else pickle.loads(row[0])
+        return upl_sets, first_post
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module for matching many substrings (e.g. inStr stoplists) at once
+"""
+
+from __future__ import absolute_import
+
+from collections import deque
+from typing import Dict, Iterable, List
+
+
+class SubstringMatcher():
+    """Aho-Corasick automaton for a set of patterns
+
+    - compiled once, e.g. for SortOutAlways_inStr.txt,
+      and reused for every tag
+    - each text is scanned once, character by character,
+      independent of the number of patterns (instead of one
+      'pattern in text' check per pattern)
+    """
+
+    def __init__(self, patterns: Iterable[str] = None):
+        # transitions per state (trie, state 0 is root)
+        self.goto: List[Dict[str, int]] = [dict()]
+        # fallback state per state (longest proper suffix in trie)
+        self.fail: List[int] = [0]
+        # whether a pattern ends in state (or in one of its suffixes)
+        self.terminal: List[bool] = [False]
+        self.pattern_count = 0
+        for pattern in patterns or ():
+            self._add_pattern(pattern)
+        self._build_fail()
+
+    def __len__(self):
+        return self.pattern_count
+
+    def __contains__(self, text: str) -> bool:
+        """Alias for search(), e.g. 'tag in matcher'"""
+        return self.search(text)
+
+    def search(self, text: str) -> bool:
+        """Check whether any pattern is a substring of text"""
+        if self.terminal[0]:
+            # empty pattern
+            return True
+        goto = self.goto
+        fail = self.fail
+        terminal = self.terminal
+        state = 0
+        for char in text:
+            while True:
+                next_state = goto[state].get(char)
+                if next_state is not None:
+                    state = next_state
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+            if terminal[state]:
+                return True
+        return False
+
+    def _add_pattern(self, pattern: str):
+        """Add pattern to trie"""
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append(dict())
+                self.fail.append(0)
+                self.terminal.append(False)
+            state = next_state
+        if not self.terminal[state]:
+            self.pattern_count += 1
+        self.terminal[state] = True
+
+    def _build_fail(self):
+        """Set fail links (breadth first) and propagate terminal states"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail_state = self.fail[state]
+                while fail_state and char not in self.goto[fail_state]:
+                    fail_state = self.fail[fail_state]
+                fail_state = self.goto[fail_state].get(char, 0)
+                self.fail[next_state] = fail_state
+                if self.terminal[fail_state]:
+                    self.terminal[next_state] = True
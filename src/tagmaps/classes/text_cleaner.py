@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module for cleaning post body and title text to sets of terms
+"""
+
+from __future__ import absolute_import
+
+import re
+from typing import Iterable, List, Optional, Set
+
+# hyperlink tags (<a ...> and </a>), text between is kept
+HYPERLINK_PATTERN = re.compile(r"<(a|/a).*?>")
+# special chars replaced by space
+SPECIAL_CHARS = "?.!/;:,[]()'-&#|<>=\""
+SPECIAL_CHARS_TABLE = {ord(char): " " for char in SPECIAL_CHARS}
+# terms shorter than this are removed
+MIN_TERM_LENGTH = 3
+
+
+class TextCleaner():
+    """Precompiled pipeline for cleaning text to terms
+
+    In one pass per text:
+    - hyperlinks are removed
+    - text is lowercased and split into words
+    - words are filtered by stopwords (and numbers)
+      or by a selection list
+    - special chars are stripped, short terms removed
+
+    The result equals Utils.remove_stopwords()
+    (or Utils.select_words()), followed by
+    PrepareData._get_cleaned_wordlist().
+
+    With ignore_stoplists, words are not filtered
+    and hyperlinks are kept, as for text
+    that was filtered beforehand.
+    """
+
+    def __init__(
+            self, stopwords: Optional[Set[str]] = None,
+            selection: Optional[Set[str]] = None,
+            ignore_stoplists: bool = None):
+        if ignore_stoplists is None:
+            ignore_stoplists = False
+        self.stopwords = stopwords or set()
+        self.selection = selection
+        self.ignore_stoplists = ignore_stoplists
+
+    def clean(self, text: Optional[str]) -> Set[str]:
+        """Get set of cleaned terms from text"""
+        if not text:
+            return set()
+        if self.ignore_stoplists:
+            return {
+                term for term in text.translate(
+                    SPECIAL_CHARS_TABLE).lower().split(" ")
+                if len(term) >= MIN_TERM_LENGTH}
+        words = HYPERLINK_PATTERN.sub("", text).lower().split()
+        if self.selection is not None:
+            words = [word for word in words if word in self.selection]
+        else:
+            stopwords = self.stopwords
+            words = [
+                word for word in words
+                if word not in stopwords and not word.isdigit()]
+        return {
+            term for term in " ".join(words).translate(
+                SPECIAL_CHARS_TABLE).split(" ")
+            if len(term) >= MIN_TERM_LENGTH}
+
+    def clean_batch(self, texts: Iterable[Optional[str]]) -> List[Set[str]]:
+        """Get sets of cleaned terms for batch of texts"""
+        clean = self.clean
+        return [clean(text) for text in texts]
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module for partitioning points into tiles (with halo),
+e.g. for clustering very large extents tile by tile
+"""
+
+from __future__ import absolute_import
+
+import math
+from typing import Iterator, Tuple
+
+import numpy as np
+
+
+class TileGrid():
+    """Regular grid of square tiles over a set of points
+
+    - each point belongs to exactly one (core) tile, see tile_ids
+    - tiles are extended by a halo, points within halo distance
+      of a tile are also part of that tile (see iter_tiles()), i.e.
+      any two points closer than halo share at least one tile
+    - coordinates and sizes in units of points
+      (e.g. radians, as used for clustering)
+    """
+
+    def __init__(self, points: np.ndarray, tile_size: float,
+                 halo: float = 0):
+        if tile_size <= 0:
+            raise ValueError("Tile size must be positive.")
+        self.tile_size = tile_size
+        self.halo = halo
+        self.origin = points.min(axis=0)
+        tile_xy = self._get_tile_xy(points)
+        self.shape: Tuple[int, int] = (
+            int(tile_xy[:, 0].max()) + 1, int(tile_xy[:, 1].max()) + 1)
+        # core tile (flat index) per point
+        self.tile_ids = self._flat_ids(tile_xy)
+        self._points = points
+
+    def __len__(self):
+        """Number of tiles (including empty tiles)"""
+        return self.shape[0] * self.shape[1]
+
+    def _get_tile_xy(self, points: np.ndarray,
+                     offset: float = 0) -> np.ndarray:
+        """Get tile column/row of points (shifted by offset)"""
+        return np.floor(
+            (points - self.origin + offset) / self.tile_size).astype(np.int64)
+
+    def _flat_ids(self, tile_xy: np.ndarray) -> np.ndarray:
+        """Get flat tile index of tile columns/rows"""
+        return tile_xy[:, 0] * self.shape[1] + tile_xy[:, 1]
+
+    def iter_tiles(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """Get non-empty tiles with (sorted) rows of points,
+        including points in halo"""
+        point_count = len(self._points)
+        first_xy = np.clip(
+            self._get_tile_xy(self._points, -self.halo), 0, None)
+        last_xy = np.minimum(
+            self._get_tile_xy(self._points, self.halo),
+            np.array(self.shape) - 1)
+        span = int(math.ceil(2 * self.halo / self.tile_size)) + 1
+        rows = np.arange(point_count, dtype=np.intp)
+        pair_rows = list()
+        pair_tiles = list()
+        for off_x in range(span):
+            for off_y in range(span):
+                tile_xy = first_xy + (off_x, off_y)
+                mask = np.all(tile_xy <= last_xy, axis=1)
+                pair_rows.append(rows[mask])
+                pair_tiles.append(self._flat_ids(tile_xy[mask]))
+        pair_rows = np.concatenate(pair_rows)
+        pair_tiles = np.concatenate(pair_tiles)
+        # group by tile, then row
+        order = np.lexsort((pair_rows, pair_tiles))
+        pair_rows = pair_rows[order]
+        pair_tiles = pair_tiles[order]
+        tile_ids, starts = np.unique(pair_tiles, return_index=True)
+        for tile_id, tile_rows in zip(
+                tile_ids, np.split(pair_rows, starts[1:])):
+            yield int(tile_id), tile_rows
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module for approximate (bounded memory) top lists of items,
+counted by distinct users
+"""
+
+from __future__ import absolute_import
+
+import heapq
+import math
+from hashlib import blake2b
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# number of monitored items per max_items
+SKETCH_CAPACITY_FACTOR = 10
+# HyperLogLog precision (2^10 registers per item)
+SKETCH_PRECISION = 10
+# max size of heap of estimates (incl. outdated entries)
+# per capacity, before heap is rebuilt
+HEAP_SIZE_FACTOR = 4
+
+
+class TopItemSketch():
+    """Space-Saving heavy hitters with HyperLogLog user counts
+
+    - at most capacity items are monitored, each with a
+      HyperLogLog sketch of its (distinct) users
+    - if a new item arrives and capacity is reached, the item with
+      the lowest estimate is replaced; the new item inherits this
+      estimate as its error (Space-Saving), i.e. estimates
+      may overcount by at most error users
+    - memory is bounded by capacity * 2^precision bytes
+    - the item with the lowest estimate is found with a min-heap
+      of (estimate, slot), updated lazily: entries are pushed on
+      each change, outdated entries are skipped on eviction
+    """
+
+    def __init__(self, capacity: int, precision: int = None):
+        if precision is None:
+            precision = SKETCH_PRECISION
+        self.capacity = capacity
+        self.precision = precision
+        self.size = 0
+        self.slots: Dict[int, int] = dict()
+        self.item_ids = np.full(capacity, -1, dtype=np.int64)
+        self.registers = np.zeros(
+            (capacity, 1 << precision), dtype=np.uint8)
+        self.errors = np.zeros(capacity, dtype=np.float64)
+        self.estimates = np.zeros(capacity, dtype=np.float64)
+        self._heap: List[Tuple[float, int]] = list()
+
+    def __len__(self):
+        return self.size
+
+    @staticmethod
+    def hash_user(user_guid: str) -> int:
+        """Get stable 64 bit hash for user guid
+
+        Python's hash() is salted per process,
+        which would prevent merging sketches of worker processes
+        """
+        return int.from_bytes(
+            blake2b(user_guid.encode(), digest_size=8).digest(), "little")
+
+    @property
+    def relative_error(self) -> float:
+        """Relative standard error of HyperLogLog user counts"""
+        return 1.04 / math.sqrt(1 << self.precision)
+
+    @property
+    def max_error(self) -> int:
+        """Upper bound of overcount (Space-Saving) for any item"""
+        if self.size < self.capacity:
+            return 0
+        return int(round(self.estimates.min()))
+
+    def update(self, item_ids: Iterable[int], user_hash: int):
+        """Add user (hash, see hash_user()) to item_ids"""
+        register = user_hash & ((1 << self.precision) - 1)
+        remaining_bits = 64 - self.precision
+        rank = remaining_bits - (user_hash >> self.precision).bit_length() + 1
+        for item_id in item_ids:
+            slot = self.slots.get(item_id)
+            if slot is None:
+                slot = self._new_slot(item_id, 0)
+            registers = self.registers[slot]
+            if registers[register] < rank:
+                registers[register] = rank
+                self._set_estimate(
+                    slot, self._estimate(registers) + self.errors[slot])
+
+    def counts(self) -> Dict[int, int]:
+        """Get (estimated) user count for all monitored items"""
+        return {
+            int(item_id): int(round(estimate)) for item_id, estimate in zip(
+                self.item_ids[:self.size], self.estimates[:self.size])}
+
+    def errors_of(self, item_ids: Iterable[int]) -> List[int]:
+        """Get Space-Saving error (max overcount) for
+        (monitored) item_ids
+        """
+        return [
+            int(round(self.errors[self.slots[item_id]]))
+            for item_id in item_ids if item_id in self.slots]
+
+    def merge(self, sketch: "TopItemSketch", item_ids: List[int]):
+        """Merge other sketch, with item ids mapped by item_ids
+
+        - registers of items monitored in both sketches are united
+        - items missing in a full sketch could have been evicted,
+          the max_error of that sketch is added to their error
+        """
+        if sketch.precision != self.precision:
+            raise ValueError(
+                "Cannot merge sketches with different precision.")
+        own_error = self.max_error
+        other_error = sketch.max_error
+        merged: Dict[int, List] = dict()
+        for slot in range(self.size):
+            merged[int(self.item_ids[slot])] = [
+                self.registers[slot].copy(),
+                self.errors[slot] + other_error]
+        for slot in range(sketch.size):
+            item_id = item_ids[sketch.item_ids[slot]]
+            entry = merged.get(item_id)
+            if entry is None:
+                merged[item_id] = [
+                    sketch.registers[slot].copy(),
+                    sketch.errors[slot] + own_error]
+                continue
+            np.maximum(entry[0], sketch.registers[slot], out=entry[0])
+            entry[1] += sketch.errors[slot] - other_error
+        entries = sorted(
+            ((self._estimate(registers) + error, item_id, registers, error)
+             for item_id, (registers, error) in merged.items()),
+            key=lambda entry: -entry[0])[:self.capacity]
+        self.slots.clear()
+        self.size = 0
+        self._heap.clear()
+        for _, item_id, registers, error in entries:
+            self._add_entry(item_id, registers, error)
+
+    @classmethod
+    def from_arrays(
+            cls, capacity: int, precision: int, item_ids: np.ndarray,
+            registers: np.ndarray, errors: np.ndarray) -> "TopItemSketch":
+        """Restore sketch from arrays of monitored items,
+        e.g. stored with PrepareDataState.save()
+        """
+        sketch = cls(capacity, precision)
+        for item_id, item_registers, error in zip(
+                item_ids.tolist(), registers, errors.tolist()):
+            sketch._add_entry(item_id, item_registers, error)
+        return sketch
+
+    def _add_entry(
+            self, item_id: int, registers: np.ndarray, error: float):
+        """Add monitored item with registers and error"""
+        slot = self._new_slot(item_id, error)
+        self.registers[slot] = registers
+        self._set_estimate(slot, self._estimate(registers) + error)
+
+    def _new_slot(self, item_id: int, error: float) -> int:
+        """Assign slot to item_id, evict item
+        with lowest estimate if capacity is reached
+        """
+        if self.size < self.capacity:
+            slot = self.size
+            self.size += 1
+        else:
+            slot = self._pop_min_slot()
+            del self.slots[int(self.item_ids[slot])]
+            error += self.estimates[slot]
+            self.registers[slot] = 0
+        self.slots[item_id] = slot
+        self.item_ids[slot] = item_id
+        self.errors[slot] = error
+        self._set_estimate(slot, error)
+        return slot
+
+    def _set_estimate(self, slot: int, estimate: float):
+        """Set estimate of slot and push it to heap"""
+        self.estimates[slot] = estimate
+        heapq.heappush(self._heap, (float(estimate), slot))
+        if len(self._heap) > HEAP_SIZE_FACTOR * self.capacity:
+            # drop outdated entries
+            self._heap = list(zip(
+                self.estimates[:self.size].tolist(), range(self.size)))
+            heapq.heapify(self._heap)
+
+    def _pop_min_slot(self) -> int:
+        """Get slot with lowest estimate (lowest slot on ties)
+
+        Heap entries are outdated if the estimate of their
+        slot has changed since
+        """
+        while True:
+            estimate, slot = heapq.heappop(self._heap)
+            if self.estimates[slot] == estimate:
+                return slot
+
+    @staticmethod
+    def _estimate(registers: np.ndarray) -> float:
+        """HyperLogLog cardinality estimate,
+        with linear counting for small cardinalities
+        """
+        reg_count = len(registers)
+        zeros = int(np.count_nonzero(registers == 0))
+        if zeros == reg_count:
+            return 0.0
+        alpha = 0.7213 / (1 + 1.079 / reg_count)
+        estimate = alpha * reg_count * reg_count / float(
+            np.ldexp(1.0, -registers.astype(np.int64)).sum())
+        if estimate <= 2.5 * reg_count and zeros:
+            return reg_count * math.log(reg_count / zeros)
+        return estimate
@@ -13,7 +13,6 @@ import logging
 import math
 import os
 import platform
-import re
 import sys
 import unicodedata
 import warnings
@@ -30,6 +29,8 @@ import pyproj
 import shapely.geometry as geometry
 
 from ..classes.shared_structure import AnalysisBounds, ConfigMap, ItemCounter
+from ..classes.substring_matcher import SubstringMatcher
+from ..classes.text_cleaner import HYPERLINK_PATTERN, SPECIAL_CHARS_TABLE
 
 
 class Utils:
@@ -185,8 +186,7 @@ class Utils:
     @staticmethod
     def remove_special_chars(text_s):
         """Removes a list of special chars from string"""
-        special_chars = "?.!/;:,[]()'-&#|<>=\""
-        s_cleaned = text_s.translate({ord(c): " " for c in special_chars})
+        s_cleaned = text_s.translate(SPECIAL_CHARS_TABLE)
         return s_cleaned
 
     @staticmethod
@@ -243,8 +243,7 @@ class Utils:
         Note:
         - anything between <a>xxx</a> will be kept
         """
-        pattern = r"<(a|/a).*?>"
-        result = re.sub(pattern, "", text_s)
+        result = HYPERLINK_PATTERN.sub("", text_s)
         return result
 
     @staticmethod
@@ -549,7 +548,7 @@ class Utils:
     def filter_tags(
         taglist: Set[str],
         sort_out_always_set: Set[str],
-        sort_out_always_instr_set: Set[str],
+        sort_out_always_instr_set: Union[Set[str], SubstringMatcher],
         select_tags_set: Set[str] = None,
     ) -> Tuple[Set[str], int, int]:
         """Filter list of tags based on two stoplists
@@ -561,7 +560,9 @@ class Utils:
         Args:
             taglist (Iterable[str]): List/Set of input tags to filter
             sort_out_always_set (Set[str]): Filter complete match
-            sort_out_always_instr_set (Set[str]): Filter partial match
+            sort_out_always_instr_set (Set[str] or SubstringMatcher):
+                Filter partial match, pass a SubstringMatcher
+                for large stoplists (compiled once)
             select_tags_set (Set[str]): Positive filter list
 
         Returns:
@@ -572,6 +573,13 @@ class Utils:
 
         count_tags = 0
         count_skipped = 0
+        if isinstance(sort_out_always_instr_set, SubstringMatcher):
+            instr_search = sort_out_always_instr_set.search
+        else:
+            def instr_search(tag: str) -> bool:
+                return any(
+                    in_str_partial in tag
+                    for in_str_partial in sort_out_always_instr_set)
 
         tags_filtered = set()
         for tag in taglist:
@@ -592,16 +600,11 @@ class Utils:
                     or tag == '""'
                     or tag.isdigit()
                     or tag in sort_out_always_set
+                    or instr_search(tag)
                 ):
                     count_skipped += 1
                     continue
-                for in_str_partial in sort_out_always_instr_set:
-                    if in_str_partial in tag:
-                        count_skipped += 1
-                        break
-                else:
-                    # final else Clause on loop statement
-                    tags_filtered.add(tag)
+                tags_filtered.add(tag)
         return (tags_filtered, count_tags, count_skipped)
 
     @staticmethod
@@ -18,8 +18,11 @@ import fiona
 from shapely.geometry import shape
 
 from tagmaps import __version__
+from tagmaps.classes.substring_matcher import SubstringMatcher
 from tagmaps.classes.utils import Utils
-from tagmaps.classes.shared_structure import ConfigMap
+from tagmaps.classes.shared_structure import (
+    HDBSCAN, INGEST_CSV, INTERMEDIATE_CSV, ClusterEngines, ConfigMap,
+    IngestEngines, IntermediateFormats)
 
 
 class BaseConfig:
@@ -60,10 +63,25 @@ class BaseConfig:
         self.config_folder = None
         self.cluster_cut_distance = None
         self.mapnik_export = False
+        self.columnar_store = False
+        self.cluster_engine = HDBSCAN
+        self.cluster_workers = 1
+        self.dedup_points = False
+        self.scale_profile = False
+        self.tile_size = None
+        self.ingest_engine = INGEST_CSV
+        self.ingest_chunksize = 100000
+        self.ingest_workers = 1
+        self.write_state = False
+        self.load_state = None
+        self.intermediate_format = INTERMEDIATE_CSV
+        self.approximate_toplists = False
+        self.memory_budget = None
 
         # additional auto settings
         self.sort_out_always_set = set()
         self.sort_out_always_instr_set = set()
+        self.sort_out_always_instr_matcher = SubstringMatcher()
         self.override_crs = None
         self.crs_proj = None
         self.epsg_code = ""
@@ -315,8 +333,111 @@ class BaseConfig:
                 "emoji need to be written to a separate file, to be joined later - "
                 "due to a bug in the ESRI software that continues to exists. ",
             action="store_true")
+        parser.add_argument("--columnar_store",
+                            help="If enabled, cleaned posts are only kept "
+                            "in a columnar store (numpy arrays), to reduce "
+                            "memory use for large datasets.",
+                            action="store_true")
+        parser.add_argument("--cluster_engine",
+                            help="Cluster engine to use, either hdbscan "
+                            "(default), radius or grid. With radius, clusters "
+                            "at a fixed cluster distance are computed from a "
+                            "KD-tree radius graph, which is much faster. "
+                            "With grid, points are first binned into grid "
+                            "cells, to limit memory use for large areas.",
+                            choices=ClusterEngines,
+                            type=str)
+        parser.add_argument("--cluster_workers",
+                            help="Number of processes used for "
+                            "clustering items (tags, emoji) in parallel "
+                            "(default: 1)",
+                            type=int)
+        parser.add_argument("--dedup_points",
+                            help="If enabled, identical coordinates are "
+                            "collapsed (weighted by post count) before "
+                            "clustering at a fixed cluster distance "
+                            "(exact single linkage cut, may differ slightly "
+                            "from default HDBSCAN clusters).",
+                            action="store_true")
+        parser.add_argument("--scale_profile",
+                            help="If enabled, cluster and noise counts of "
+                            "the top item of each cluster type are written "
+                            "for a range of cluster distances "
+                            "(scaletest_*.csv in output folder).",
+                            action="store_true")
+        parser.add_argument("--tile_size",
+                            help="Tile size (in meters) for clustering "
+                            "large extents tile by tile, with identical "
+                            "results. Only used with cluster engine radius "
+                            "or grid (default: no tiles).",
+                            type=float)
+        parser.add_argument("--ingest_engine",
+                            help="Reader used for ingesting CSV input data, "
+                            "either csv (row-by-row, default), pandas or "
+                            "pyarrow. With pandas and pyarrow, input is "
+                            "read in chunks and filtered per chunk, "
+                            "which is much faster for large datasets.",
+                            choices=IngestEngines,
+                            type=str)
+        parser.add_argument("--ingest_chunksize",
+                            help="Number of rows per chunk read with "
+                            "ingest engine pandas (default: 100000)",
+                            type=int)
+        parser.add_argument("--ingest_workers",
+                            help="Number of processes used for "
+                            "parsing input files in parallel "
+                            "(default: 1). Results are identical to "
+                            "sequential parsing, except for the order "
+                            "of equal counts in toplists and of rows in "
+                            "cleaned output.",
+                            type=int)
+        parser.add_argument("--intermediate_format",
+                            help="Format of intermediate (cleaned) data, "
+                            "either csv (Output_cleaned.csv, default) or npz "
+                            "(Output_cleaned.npz). The binary npz format is "
+                            "memory-mapped on load and includes item stats, "
+                            "which is much faster to reload for large "
+                            "datasets.",
+                            choices=IntermediateFormats,
+                            type=str)
+        parser.add_argument("--approximate_toplists",
+                            help="If enabled, top lists of tags and emoji "
+                            "are counted with bounded memory (approximate "
+                            "user counts), for datasets with very large "
+                            "numbers of distinct tags. Error bounds are "
+                            "reported with item stats. Note that total "
+                            "post counts per item and the item vocabulary "
+                            "still grow with the number of distinct tags.",
+                            action="store_true")
+        parser.add_argument("--memory_budget",
+                            help="Optional memory budget (in MB) for "
+                            "aggregated data per user location. If "
+                            "exceeded, aggregates are spilled to disk "
+                            "(SQLite) and merged back later, with "
+                            "identical results.",
+                            type=int)
+        parser.add_argument("--write_state",
+                            help="If enabled, state of ingested data is "
+                            "written to Output_state.npz and processing "
+                            "stops after data cleanup. Use this to ingest "
+                            "shards of input data (e.g. by user) "
+                            "independently. Cannot be combined with "
+                            "--memory_budget.",
+                            action="store_true")
+        parser.add_argument("--load_state",
+                            help="(Relative) paths to one or more state "
+                            "files written with --write_state. States are "
+                            "merged in order given, instead of reading "
+                            "input data.",
+                            nargs="+",
+                            type=Path)
 
         args = parser.parse_args()
+        if args.write_state and args.memory_budget:
+            # spilled aggregates are not part of the written state
+            parser.error(
+                "--write_state cannot be combined with --memory_budget, "
+                "aggregates spilled to disk are not stored with the state.")
         if args.verbose:
             self.logging_level = logging.DEBUG
         if args.source:
@@ -398,6 +519,36 @@ class BaseConfig:
             self.cluster_cut_distance = args.cluster_cut_distance
         if args.mapnik_export:
             self.mapnik_export = True
+        if args.columnar_store:
+            self.columnar_store = True
+        if args.cluster_engine:
+            self.cluster_engine = args.cluster_engine
+        if args.cluster_workers:
+            self.cluster_workers = args.cluster_workers
+        if args.dedup_points:
+            self.dedup_points = True
+        if args.scale_profile:
+            self.scale_profile = True
+        if args.tile_size:
+            self.tile_size = args.tile_size
+        if args.ingest_engine:
+            self.ingest_engine = args.ingest_engine
+        if args.ingest_chunksize:
+            self.ingest_chunksize = args.ingest_chunksize
+        if args.ingest_workers:
+            self.ingest_workers = args.ingest_workers
+        if args.intermediate_format:
+            self.intermediate_format = args.intermediate_format
+        if args.approximate_toplists:
+            self.approximate_toplists = True
+        if args.memory_budget:
+            self.memory_budget = args.memory_budget
+        if args.write_state:
+            self.write_state = True
+        if args.load_state:
+            self.load_state = [
+                Utils.check_folder_file(self.resource_path / state_path)
+                for state_path in args.load_state]
 
     def load_filterlists(self):
         """Load filterlists for filtering terms (in-string and full match)
@@ -420,6 +571,9 @@ class BaseConfig:
                 self.sort_out_always_set.update(stoplist_tags_set)
         self.sort_out_always_instr_set = self.load_filterlist(
             sort_out_always_instr_file)
+        # compile once, for matching of all partial terms per tag
+        self.sort_out_always_instr_matcher = SubstringMatcher(
+            self.sort_out_always_instr_set)
         self.sort_out_places_set = self.load_place_stoplist(
             sort_out_places_file)
         if self.stoplist_places:
@@ -9,14 +9,18 @@ from __future__ import absolute_import, annotations
 import logging
 from functools import wraps
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional, Union
 
 from tagmaps.classes.cluster import ClusterGen
 from tagmaps.classes.compile_output import Compile
 from tagmaps.classes.interface import UserInterface
-from tagmaps.classes.prepare_data import PrepareData
-from tagmaps.classes.shared_structure import (EMOJI, LOCATIONS, TAGS, TOPICS,
-                                       PostStructure)
+from tagmaps.classes.load_data import iter_frame_batches
+from tagmaps.classes.post_store import CleanedPostStore
+from tagmaps.classes.prepare_data import PrepareData, PrepareDataState
+from tagmaps.classes.shared_structure import (EMOJI, HDBSCAN,
+                                       INTERMEDIATE_NPZ, LOCATIONS,
+                                       TAGS, TOPICS, CleanedPost,
+                                       PostBatch, PostStructure)
 from tagmaps.classes.utils import Utils
 
 __author__ = "Alexander Dunkel"
@@ -98,6 +102,63 @@ class TagMaps():
         output, for ESRI ArcGIS/ArcPro, where
         emoji need to be written to a separate file, to be joined later -
         due to a bug in the ESRI software that continues to exists.
+
+    columnar_store : bool (default=False)
+        If enabled, cleaned posts are only kept in a columnar store
+        (numpy arrays), instead of an additional dict and list of
+        CleanedPost. This reduces memory use for large datasets.
+        Cleaned posts are restored from the store where
+        needed (e.g. write_cleaned_data()).
+
+    cluster_engine : str (default='hdbscan')
+        Either 'hdbscan', 'radius' or 'grid'. With 'radius', clusters at
+        a fixed cluster distance are computed as connected components of a
+        radius graph (KD-tree), which is much faster and uses less memory
+        than fitting the full HDBSCAN model. This is an exact single
+        linkage cut, clusters may differ slightly from HDBSCAN (which
+        uses an approximate minimum spanning tree).
+        'grid' first bins points into grid cells smaller than the cluster
+        distance and only links neighbouring cells, with the same
+        clusters as 'radius' and memory linear in the number of points,
+        e.g. for
+        location clustering of country-scale data.
+        Can be changed per cluster type with set_cluster_engine().
+
+    cluster_workers : int (default=1)
+        Number of processes used to cluster items (tags, emoji)
+        in parallel. Results are identical to serial processing.
+
+    dedup_points : bool (default=False)
+        If enabled, identical coordinates (e.g. posts at the same
+        place) are collapsed before clustering at a fixed cluster
+        distance, with labels broadcast back to all posts. Fewer points
+        are passed to HDBSCAN, which is fitted with an exact minimum
+        spanning tree; clusters may differ slightly from the default
+        (approximate) HDBSCAN tree.
+
+    tile_size : float (default=None)
+        If provided (in meters), large extents are clustered at a fixed
+        cluster distance tile by tile (in cluster_workers processes),
+        with cluster_engine 'radius' or 'grid' (not 'hdbscan'),
+        with a halo of cluster distance around each tile. Clusters
+        crossing tile borders are merged, results are identical to
+        clustering without tiles.
+
+    approximate_toplists : bool (default=False)
+        If enabled, top lists of tags and emoji are counted with
+        bounded memory sketches (Space-Saving heavy hitters with
+        HyperLogLog user counts), instead of keeping distinct items
+        per user. User counts in top lists are then approximate,
+        error bounds are reported in item_stats_report().
+        Only distinct users per item are bounded: total post counts
+        per item and the item vocabulary still grow with the number
+        of distinct tags.
+
+    memory_budget : int (default=None)
+        Optional memory budget (in MB) for aggregates per user location
+        during ingestion. If exceeded, these are spilled to an on-disk
+        store (SQLite, in output_folder) and merged back when cleaned
+        posts are compiled. Results are identical to the in-memory path.
     """
 
     class TMDec():
@@ -163,7 +224,11 @@ class TagMaps():
             limit_bottom_user_count: int = 5, topic_modeling: bool = False,
             local_saturation_check: bool = False, max_items: int = None,
             logging_level=None, topic_cluster: bool = None,
-            cluster_cut_distance: float = None, mapnik_export: bool = None):
+            cluster_cut_distance: float = None, mapnik_export: bool = None,
+            columnar_store: bool = None, cluster_engine: str = None,
+            cluster_workers: int = None, approximate_toplists: bool = None,
+            memory_budget: int = None, dedup_points: bool = None,
+            tile_size: float = None):
         """Init settings for Tag Maps Clustering"""
         if output_folder is None:
             output_folder = Path.cwd() / "02_Output"
@@ -178,6 +243,23 @@ class TagMaps():
             max_items = 1000
         if topic_cluster is None:
             topic_cluster = False
+        if columnar_store is None:
+            columnar_store = False
+        self.columnar_store = columnar_store
+        if cluster_engine is None:
+            cluster_engine = HDBSCAN
+        self.cluster_engine = cluster_engine
+        if cluster_workers is None:
+            cluster_workers = 1
+        self.cluster_workers = cluster_workers
+        if dedup_points is None:
+            dedup_points = False
+        self.dedup_points = dedup_points
+        self.tile_size = tile_size
+        if approximate_toplists is None:
+            approximate_toplists = False
+        self.approximate_toplists = approximate_toplists
+        self.memory_budget = memory_budget
         self.max_items = max_items
         self.local_saturation_check = local_saturation_check
         # initialize list of types to cluster
@@ -202,6 +284,7 @@ class TagMaps():
         self.lbsn_data: Optional[PrepareData] = None
         self.cleaned_post_dict = None
         self.cleaned_post_list = None
+        self.post_store: Optional[CleanedPostStore] = None
         self.cleaned_stats = None
         self.clusterer: Dict[str, ClusterGen] = dict()
         self.cluster_cut_distance: Optional[float] = None
@@ -225,6 +308,80 @@ class TagMaps():
         """
         self.lbsn_data.add_record(record)
 
+    @TMDec.init_data_check
+    def add_batch(self, post_batch: PostBatch):
+        """Adds batch of records to input data
+
+        Args:
+            post_batch (PostBatch):
+            A batch of filtered posts, e.g. from
+            LoadData.iter_batches() (chunked ingestion)
+        """
+        self.lbsn_data.add_batch(post_batch)
+
+    @TMDec.init_data_check
+    def add_records(
+            self, frame, column_map: Optional[Dict[str, str]] = None,
+            batch_size: Optional[int] = None):
+        """Adds records of a DataFrame (or Arrow Table) to input data
+
+        Args:
+            frame (pandas.DataFrame or pyarrow.Table):
+            One row per (already filtered) record, with columns named
+            as attributes of PostStructure (e.g. guid, user_guid,
+            latitude, longitude, hashtags, emoji, post_body)
+            column_map (Dict[str, str]):
+            Optional mapping of PostStructure attributes
+            to column names of frame
+            batch_size (int):
+            Number of rows converted per batch (default: 100000)
+        """
+        for post_batch in iter_frame_batches(frame, column_map, batch_size):
+            self.lbsn_data.add_batch(post_batch)
+
+    @TMDec.init_data_check
+    def new_partial_data(self) -> PrepareData:
+        """Get empty PrepareData with settings of this TagMaps instance,
+
+        e.g. for parsing input files in parallel
+        (see LoadData.iter_partial_data())
+        """
+        return self.lbsn_data.new_partial()
+
+    @TMDec.init_data_check
+    def add_partial_data(
+            self, partial_data: Union[PrepareData, PrepareDataState]):
+        """Merge records of partial PrepareData to input data
+
+        Args:
+            partial_data (PrepareData or PrepareDataState):
+            Records of a part of input data, partials
+            must be added in order of input
+        """
+        self.lbsn_data.merge(partial_data)
+
+    @TMDec.init_data_check
+    def load_state(self, input_path: Path):
+        """Merge state of (sharded) input data stored with write_state()
+
+        Args:
+            input_path (Path):
+            Path to state file (.npz), states of several
+            shards must be loaded in order of input
+        """
+        self.lbsn_data.merge(PrepareDataState.load(input_path))
+
+    @TMDec.data_added_check
+    def write_state(self, output_path: Optional[Path] = None):
+        """Write state of ingested data to file (Output_state.npz)
+
+        States of several shards of input data can be
+        merged with load_state(), before prepare_data()
+        """
+        if output_path is None:
+            output_path = self.output_folder / 'Output_state.npz'
+        self.lbsn_data.get_state().save(output_path)
+
     def init_lbsn_data(self):
         """init PrepareData structure"""
         self.lbsn_data = PrepareData(
@@ -233,7 +390,9 @@ class TagMaps():
             output_folder=self.output_folder,
             remove_long_tail=self.remove_long_tail,
             limit_bottom_user_count=self.limit_bottom_user_count,
-            topic_modeling=self.topic_modeling)
+            topic_modeling=self.topic_modeling,
+            approximate_toplists=self.approximate_toplists,
+            memory_budget=self.memory_budget)
 
     @TMDec.data_added_check
     def global_stats_report(self, cleaned=None):
@@ -251,19 +410,44 @@ class TagMaps():
         preprocessed data
         """
         # get cleaned data for use in clustering
-        if not self.cleaned_post_dict:
-            self.cleaned_post_dict = self.lbsn_data.get_cleaned_post_dict(
-                input_path)
-        # a list is faster for looping through,
-        # a dict is faster for key lookup,
-        # get both here
-        self.cleaned_post_list = list(self.cleaned_post_dict.values())
+        if input_path is not None and Path(input_path).suffix == '.npz':
+            self.load_intermediate(input_path)
+        if self.post_store is not None and not self.cleaned_post_dict:
+            # columnar store loaded from binary intermediate data,
+            # item stats are restored from file
+            pass
+        elif (self.columnar_store and not self.cleaned_post_dict
+                and input_path is None):
+            # compile cleaned posts directly to columnar store
+            self.post_store = self.lbsn_data.get_cleaned_post_store()
+        else:
+            if not self.cleaned_post_dict:
+                self.cleaned_post_dict = self.lbsn_data.get_cleaned_post_dict(
+                    input_path)
+            # a list is faster for looping through,
+            # a dict is faster for key lookup,
+            # get both here
+            self.cleaned_post_list = list(self.cleaned_post_dict.values())
+            # columnar store is shared by all clusterers
+            self.post_store = self.lbsn_data.get_cleaned_post_store(
+                self.cleaned_post_list)
+            if self.columnar_store:
+                # only keep columnar store
+                self.cleaned_post_dict = None
+                self.cleaned_post_list = None
         # get prepared data for statistics and clustering
         self.cleaned_stats = self.lbsn_data.get_item_stats()
 
     @TMDec.init_data_check
     def load_intermediate(self, input_path):
-        """Load data from intermediate (already filtered) data"""
+        """Load data from intermediate (already filtered) data
+
+        Binary intermediate data (.npz) is memory-mapped
+        to a columnar store, together with precomputed item stats
+        """
+        if Path(input_path).suffix == '.npz':
+            self.post_store = self.lbsn_data.load_cleaned_store(input_path)
+            return
         self.cleaned_post_dict = self.lbsn_data.get_cleaned_post_dict(
             input_path)
 
@@ -296,6 +480,8 @@ class TagMaps():
             f'{self.cleaned_stats[EMOJI].max_items} '
             f'most used emoji in selected area: '
             f'{self.cleaned_stats[EMOJI].total_item_count}.')
+        if self.approximate_toplists:
+            self.lbsn_data.approximation_report()
         self.log.info(
             self.lbsn_data.bounds.get_bound_report())
 
@@ -311,7 +497,12 @@ class TagMaps():
                 cleaned_post_dict=self.cleaned_post_dict,
                 cleaned_post_list=self.cleaned_post_list,
                 cleaned_stats=self.cleaned_stats,
-                local_saturation_check=self.local_saturation_check
+                local_saturation_check=self.local_saturation_check,
+                post_store=self.post_store,
+                cluster_engine=self.cluster_engine,
+                cluster_workers=self.cluster_workers,
+                dedup_points=self.dedup_points,
+                tile_size=self.tile_size
             )
             self.clusterer[cls_type] = clusterer
         # on manual cluster cut distance override
@@ -330,7 +521,8 @@ class TagMaps():
         # init user interface
         user_intf = UserInterface(
             self.clusterer.values(),
-            self.lbsn_data.locid_locname_dict)
+            self.lbsn_data.locid_locname_dict,
+            self.output_folder)
         # start user interface
         user_intf.start()
         # return continue = False or True
@@ -339,11 +531,54 @@ class TagMaps():
             return False
         return True
 
+    @TMDec.prepare_clustering_check
+    def write_scale_profiles(
+            self, item: Optional[str] = None,
+            distances: Optional[Iterable[float]] = None):
+        """Write scale profiles (cluster and noise counts for
+        a range of cluster distances) to output folder
+
+        - one csv per cluster type (scaletest_type_item.csv)
+        - HDBSCAN is fitted once per item, see ClusterGen.scale_profile()
+
+        Args:
+            item: Item to select, defaults to top item of each cluster type
+            distances: Cluster distances (m), defaults to 100 steps
+                between cluster distance/10 and *10
+        """
+        for cls_type, clusterer in self.clusterer.items():
+            if item is None and clusterer.top_item is None:
+                continue
+            profile = clusterer.scale_profile(item, distances)
+            if profile is None:
+                continue
+            profile.write_csv(
+                self.output_folder / profile.get_filename(cls_type))
+
     def set_cluster_distance(self, cluster_distance: float):
         """Set cluster distance for all clusters manually"""
         for clusterer in self.clusterer.values():
             clusterer.cluster_distance = cluster_distance
 
+    @TMDec.prepare_clustering_check
+    def set_cluster_engine(self, cluster_engine: str,
+                           cls_type: Optional[str] = None):
+        """Set cluster engine for all clusters or a single cluster type
+
+        Args:
+            cluster_engine: Either HDBSCAN, RADIUS or GRID
+            cls_type: Optional cluster type (TAGS, EMOJI etc.),
+                defaults to all cluster types
+        """
+        if cls_type is None:
+            self.cluster_engine = cluster_engine
+            clusterers = self.clusterer.values()
+        else:
+            clusterers = [self.clusterer[cls_type]]
+        for clusterer in clusterers:
+            clusterer.cluster_engine = ClusterGen.check_cluster_engine(
+                cluster_engine)
+
     def cluster_tags(self):
         """Calculate all tag clusters"""
         self._cluster(TAGS)
@@ -457,9 +692,20 @@ class TagMaps():
         """Write toplists for items to output"""
         self.lbsn_data.write_toplists()
 
-    def write_cleaned_data(self):
-        """Write cleaned data to file for intermediate results store"""
-        self.lbsn_data.write_cleaned_data(self.cleaned_post_dict)
+    def write_cleaned_data(self, intermediate_format: str = None):
+        """Write cleaned data to file for intermediate results store
+
+        Args:
+            intermediate_format (str): Either csv (default,
+            Output_cleaned.csv) or npz (binary, Output_cleaned.npz)
+        """
+        if intermediate_format == INTERMEDIATE_NPZ:
+            if self.post_store is None:
+                self.post_store = self.lbsn_data.get_cleaned_post_store(
+                    self.cleaned_post_list)
+            self.lbsn_data.write_cleaned_store(self.post_store)
+            return
+        self.lbsn_data.write_cleaned_data(self._get_cleaned_post_dict())
 
     @TMDec.prepare_data_check
     def write_topics(self):
@@ -477,5 +723,11 @@ class TagMaps():
         reduced data that is finally used to generate tagmaps.
         """
         panon_cleaned_post_dict = self.lbsn_data.get_panonymized_posts(
-            self.cleaned_post_dict)
+            self._get_cleaned_post_dict())
         return panon_cleaned_post_dict
+
+    def _get_cleaned_post_dict(self) -> Optional[Dict[str, CleanedPost]]:
+        """Get dict of cleaned posts, restore from store if necessary"""
+        if self.cleaned_post_dict is None and self.post_store is not None:
+            return self.post_store.to_dict()
+        return self.cleaned_post_dict
@@ -0,0 +1,84 @@
+"""Tests for alpha shape generation"""
+
+import math
+
+import numpy as np
+import shapely.geometry as geometry
+from scipy.spatial import Delaunay  # pylint: disable=E0611
+from shapely.ops import polygonize, unary_union
+
+from tagmaps.classes.alpha_shapes import AlphaShapes, AlphaTriangulation
+
+
+def _alpha_shape_loop(points, alpha):
+    """Reference: previous per-triangle alpha shape loop"""
+    coords = np.array([point.coords[0] for point in points])
+    tri = Delaunay(coords)
+    edges = set()
+    edge_points = []
+    for vert_ia, vert_ib, vert_ic in tri.simplices:
+        pa_v = coords[vert_ia]
+        pb_v = coords[vert_ib]
+        pc_v = coords[vert_ic]
+        a_val = math.sqrt((pa_v[0] - pb_v[0]) ** 2 + (pa_v[1] - pb_v[1]) ** 2)
+        b_val = math.sqrt((pb_v[0] - pc_v[0]) ** 2 + (pb_v[1] - pc_v[1]) ** 2)
+        c_val = math.sqrt((pc_v[0] - pa_v[0]) ** 2 + (pc_v[1] - pa_v[1]) ** 2)
+        s_res = (a_val + b_val + c_val) / 2.0
+        try:
+            area = math.sqrt(
+                s_res * (s_res - a_val) * (s_res - b_val) * (s_res - c_val))
+        except ValueError:
+            return False
+        if area == 0:
+            return False
+        circum_r = a_val * b_val * c_val / (4.0 * area)
+        if circum_r < 1.0 / alpha:
+            for i, j in ((vert_ia, vert_ib), (vert_ib, vert_ic),
+                         (vert_ic, vert_ia)):
+                if (i, j) in edges or (j, i) in edges:
+                    continue
+                edges.add((i, j))
+                edge_points.append(coords[[i, j]])
+    mmulti_line_str = geometry.MultiLineString(edge_points)
+    return unary_union(list(polygonize(mmulti_line_str.geoms)))
+
+
+def _get_points(count: int, seed: int):
+    """Random projected points (UTM meters) with a hole"""
+    rng = np.random.default_rng(seed)
+    coords = rng.uniform(-500, 500, size=(count, 2)) + [411000, 5655000]
+    # leave a gap in the middle to produce holes for some alpha
+    coords = coords[np.abs(coords - [411000, 5655000]).max(axis=1) > 150]
+    return [geometry.Point(coord) for coord in coords]
+
+
+def test_alpha_shape_matches_loop():
+    """Vectorized alpha shape equals previous loop implementation"""
+    for seed in range(3):
+        points = _get_points(600, seed)
+        for alpha in (1 / 20, 1 / 60, 1 / 200, 1 / 1000):
+            result = AlphaShapes.alpha_shape(points, alpha=alpha)
+            expected = _alpha_shape_loop(points, alpha)
+            assert result.symmetric_difference(expected).area < 1e-6
+            assert math.isclose(result.area, expected.area)
+
+
+def test_alpha_sweep_single_triangulation():
+    """Alpha sweep over one triangulation equals separate alpha shapes"""
+    points = _get_points(600, 0)
+    triangulation = AlphaTriangulation(points)
+    for startalpha in (9000, 10000):
+        for i in range(1, 6):
+            alpha = 25 / (startalpha / (i * i))
+            result = triangulation.alpha_shape(alpha)
+            expected = _alpha_shape_loop(points, alpha)
+            assert result.symmetric_difference(expected).area < 1e-6
+
+
+def test_circumradii_degenerate():
+    """Degenerate (zero area) triangles return None"""
+    coords = np.array([[0., 0.], [1., 0.], [2., 0.], [0., 1.]])
+    assert AlphaTriangulation._get_circumradii(
+        coords, np.array([[0, 1, 3]])) is not None
+    assert AlphaTriangulation._get_circumradii(
+        coords, np.array([[0, 1, 3], [0, 1, 2]])) is None
@@ -0,0 +1,245 @@
+"""Tests for ClusterGen item selection and clustering"""
+
+import csv
+from pathlib import Path
+
+import hdbscan
+import numpy as np
+import pytest
+
+from tagmaps.classes.cluster import ClusterGen
+from tagmaps.classes.cluster_labels import (
+    get_dedup_labels, get_grid_labels, get_radius_labels, get_tiled_labels)
+from tagmaps.classes.shared_structure import (
+    EMOJI, GRID, HDBSCAN, RADIUS, TAGS, TOPICS, AnalysisBounds,
+    CleanedPost, ItemCounter)
+from tagmaps.classes.utils import Utils
+
+SAMPLE_PATH = (Path(__file__).parents[1] / "resources" / "01_Input"
+               / "flickr_dresden_cc-by-licenses.csv")
+
+
+def _get_posts(count: int = 200, seed: int = 0):
+    """Create list of random cleaned posts around Dresden"""
+    rng = np.random.default_rng(seed)
+    terms = ["elbe", "dresden", "frauenkirche", "zwinger", "bridge"]
+    emoji = ["\U0001F600", "\U0001F3F0", "\U0001F309"]
+    posts = list()
+    for idx in range(count):
+        lat = round(51.05 + rng.normal() * 0.01, 4)
+        lng = round(13.74 + rng.normal() * 0.01, 4)
+        posts.append(CleanedPost(
+            origin_id=1, lat=lat, lng=lng, guid=f"p{idx}",
+            user_guid=f"u{idx % 17}", loc_id=f"{lat}:{lng}",
+            hashtags=set(rng.choice(terms, 2)),
+            post_body=set(rng.choice(terms, 1)),
+            emoji=set(rng.choice(emoji, 1)),
+            post_views_count=0, post_like_count=0))
+    return posts
+
+
+def _get_clusterer(cls_type: str, posts, top_names):
+    """Create clusterer for list of posts"""
+    bounds = AnalysisBounds()
+    for post in posts:
+        bounds.upd_latlng_bounds(post.lat, post.lng)
+    return ClusterGen(
+        bounds=bounds,
+        cleaned_post_dict={post.guid: post for post in posts},
+        cleaned_post_list=posts,
+        top_list=[ItemCounter(name, 1) for name in top_names],
+        total_distinct_locations=len({post.loc_id for post in posts}),
+        cluster_type=cls_type)
+
+
+def _scan_guids(clusterer: ClusterGen, item: str):
+    """Select post guids without index (full scan)"""
+    clusterer.item_index = dict()
+    clusterer._index_terms = set()
+    sel_items = clusterer._select_postguids(item)
+    clusterer.update_item_index()
+    return sel_items
+
+
+def test_item_index_matches_scan():
+    """Indexed selection returns same posts as full scan"""
+    posts = _get_posts()
+    for cls_type, items in (
+            (TAGS, ["elbe", "zwinger"]),
+            (EMOJI, ["\U0001F600"]),
+            (TOPICS, ["elbe-bridge"])):
+        clusterer = _get_clusterer(cls_type, posts, items)
+        for item in items:
+            indexed = clusterer._select_postguids(item)
+            scanned = _scan_guids(clusterer, item)
+            assert indexed.positions is not None
+            assert indexed.guids == scanned.guids
+            assert indexed.location_count == scanned.location_count
+
+
+def _get_partition(labels: np.ndarray):
+    """Get cluster labels as set of clusters (frozensets of indices)"""
+    return {
+        frozenset(np.flatnonzero(labels == label))
+        for label in np.unique(labels)}
+
+
+def test_radius_engine_matches_hdbscan_cut():
+    """Radius graph components equal HDBSCAN single linkage cut
+    (exact minimum spanning tree)"""
+    rng = np.random.default_rng(1)
+    points = np.concatenate((
+        rng.normal(scale=0.002, size=(300, 2)) + [13.74, 51.05],
+        rng.normal(scale=0.0005, size=(50, 2)) + [13.70, 51.02]))
+    # duplicate coordinates
+    points = np.concatenate((points, points[:40]))
+    radians_data = np.radians(points)
+    hdb_clusterer = hdbscan.HDBSCAN(
+        min_cluster_size=2, allow_single_cluster=True, min_samples=1,
+        approx_min_span_tree=False)
+    hdb_clusterer.fit(radians_data)
+    for cut_distance in (25, 100, 400):
+        cut_radians = Utils.get_radians_from_meters(cut_distance)
+        hdb_labels = hdb_clusterer.single_linkage_tree_.get_clusters(
+            cut_radians, min_cluster_size=2)
+        radius_labels = get_radius_labels(
+            radians_data, cut_radians)
+        assert np.array_equal(hdb_labels == -1, radius_labels == -1)
+        assert _get_partition(hdb_labels) == _get_partition(radius_labels)
+
+
+def test_dedup_points_match_hdbscan_cut():
+    """Clusters of distinct (weighted) points equal HDBSCAN cut
+    of all points (exact minimum spanning tree)"""
+    rng = np.random.default_rng(2)
+    places = np.concatenate((
+        rng.normal(scale=0.002, size=(40, 2)) + [13.74, 51.05],
+        rng.normal(scale=0.0005, size=(10, 2)) + [13.70, 51.02]))
+    # few places with many posts, some places with a single post
+    points = places[rng.integers(0, len(places), size=400)]
+    points = np.concatenate((points, places[-5:]))
+    radians_data = np.radians(points)
+    hdb_clusterer = hdbscan.HDBSCAN(
+        min_cluster_size=2, allow_single_cluster=True, min_samples=1,
+        approx_min_span_tree=False)
+    hdb_clusterer.fit(radians_data)
+    for cut_distance in (0.1, 25, 100, 400):
+        cut_radians = Utils.get_radians_from_meters(cut_distance)
+        hdb_labels = hdb_clusterer.single_linkage_tree_.get_clusters(
+            cut_radians, min_cluster_size=2)
+        dedup_labels = get_dedup_labels(
+            radians_data, cut_radians)
+        assert np.array_equal(hdb_labels == -1, dedup_labels == -1)
+        assert _get_partition(hdb_labels) == _get_partition(dedup_labels)
+
+
+def test_parallel_itemized_clusters_match_serial():
+    """Itemized clusters are identical with cluster worker processes"""
+    posts = _get_posts(400)
+    items = ["elbe", "dresden", "frauenkirche", "zwinger", "bridge"]
+    results = list()
+    for cluster_workers in (1, 2):
+        clusterer = _get_clusterer(TAGS, posts, items)
+        clusterer.cluster_workers = cluster_workers
+        clusterer.get_itemized_clusters()
+        results.append((
+            {item: [list(guids) for guids in clustered]
+             for item, clustered in clusterer.clustered_items_dict.items()},
+            dict(clusterer.single_items_dict)))
+    assert results[0] == results[1]
+
+
+def test_tree_cache_recuts_tree():
+    """Changed cluster distance re-cuts the cached tree"""
+    posts = _get_posts()
+    clusterer = _get_clusterer(TAGS, posts, ["elbe"])
+    clusterer.cluster_item("elbe", cache_tree=True)
+    fitted = clusterer.clusterer
+    for distance in (50, 200, 800):
+        clusterer.cluster_distance = distance
+        cached = clusterer.cluster_item("elbe", cache_tree=True)
+        assert clusterer.clusterer is fitted
+        fresh = _get_clusterer(TAGS, posts, ["elbe"])
+        fresh.cluster_distance = distance
+        assert np.array_equal(
+            cached.clusters, fresh.cluster_item("elbe").clusters)
+    clusterer.clear_tree_cache()
+    clusterer.cluster_item("elbe", cache_tree=True)
+    assert clusterer.clusterer is not fitted
+
+
+def test_tree_cache_opt_in():
+    """Batch clustering of items does not cache trees"""
+    clusterer = _get_clusterer(
+        TAGS, _get_posts(), ["elbe", "dresden", "frauenkirche"])
+    clusterer.get_itemized_clusters()
+    clusterer.cluster_item("elbe")
+    assert not clusterer.tree_cache
+
+
+def test_scale_profile_matches_cuts(tmp_path):
+    """Counts of scale profile equal cut of tree at each distance"""
+    posts = _get_posts()
+    clusterer = _get_clusterer(TAGS, posts, ["elbe"])
+    distances = [10, 50, 200, 800, 3000]
+    profile = clusterer.scale_profile("elbe", distances)
+    assert profile.post_count == len(clusterer._select_postguids("elbe").guids)
+    for distance, cluster_count, noise_count in zip(
+            distances, profile.cluster_counts, profile.noise_counts):
+        clusterer.cluster_distance = distance
+        labels = clusterer.cluster_item("elbe").clusters
+        assert noise_count == np.count_nonzero(labels == -1)
+        assert cluster_count == len(np.unique(labels[labels != -1]))
+    assert profile.get_filename(TAGS) == "scaletest_tags_elbe.csv"
+    profile.write_csv(tmp_path / profile.get_filename(TAGS))
+    rows = (tmp_path / "scaletest_tags_elbe.csv").read_text().splitlines()
+    assert len(rows) == len(distances) + 1
+    profile.item = "elbe/dresden:?"
+    assert profile.get_filename(TAGS) == "scaletest_tags_elbe_dresden__.csv"
+
+
+def test_grid_engine_matches_exact_cut():
+    """Grid pre-aggregated clusters of the Dresden sample
+    equal radius graph components (all locations)"""
+    with open(SAMPLE_PATH, encoding="utf-8", newline="") as f_handle:
+        points = np.array([
+            (float(row["lng"]), float(row["lat"]))
+            for row in csv.DictReader(f_handle)])
+    radians_data = np.radians(points)
+    for cut_distance in (5, 50, 300):
+        cut_radians = Utils.get_radians_from_meters(cut_distance)
+        for min_cluster_size in (1, 2, 5):
+            radius_labels = get_radius_labels(
+                radians_data, cut_radians, min_cluster_size)
+            grid_labels = get_grid_labels(
+                radians_data, cut_radians, min_cluster_size)
+            assert np.array_equal(radius_labels, grid_labels)
+    # degenerate input (single distinct point)
+    single_point = radians_data[:1].repeat(3, axis=0)
+    assert np.array_equal(
+        get_grid_labels(single_point, cut_radians, 1), [0, 0, 0])
+    assert np.array_equal(
+        get_grid_labels(single_point[:1], cut_radians, 2), [-1])
+
+
+def test_tiled_labels_match_exact_cut():
+    """Clusters computed tile by tile (with halo) equal clusters
+    without tiles, for the Dresden sample"""
+    with open(SAMPLE_PATH, encoding="utf-8", newline="") as f_handle:
+        points = np.array([
+            (float(row["lng"]), float(row["lat"]))
+            for row in csv.DictReader(f_handle)])
+    radians_data = np.radians(points)
+    for cut_distance, tile_distance in ((50, 1000), (300, 300)):
+        cut_radians = Utils.get_radians_from_meters(cut_distance)
+        tile_size = Utils.get_radians_from_meters(tile_distance)
+        radius_labels = get_radius_labels(radians_data, cut_radians)
+        for cluster_engine, workers in ((RADIUS, 1), (GRID, 2)):
+            tiled_labels = get_tiled_labels(
+                cluster_engine, radians_data, cut_radians, tile_size,
+                workers)
+            assert np.array_equal(radius_labels == -1, tiled_labels == -1)
+            assert _get_partition(radius_labels) == _get_partition(
+                tiled_labels)
+    with pytest.raises(ValueError):
+        get_tiled_labels(HDBSCAN, radians_data, cut_radians, tile_size)
@@ -0,0 +1,236 @@
+"""Tests for LoadData ingestion"""
+
+import csv
+import io
+import json
+import shutil
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+
+from tagmaps.classes import load_data
+from tagmaps.classes.load_data import (JsonPostReader, LoadData,
+                                       iter_frame_batches)
+from tagmaps.classes.prepare_data import PrepareData, PrepareDataState
+from tagmaps.classes.shared_structure import EMOJI, LOCATIONS, TAGS
+from tagmaps.config.config import BaseConfig
+
+CONFIG_PATH = Path(__file__).parents[1] / "resources" / "00_Config"
+
+HEADER = [
+    "origin_id", "post_guid", "latitude", "longitude", "user_guid",
+    "post_create_date", "post_publish_date", "post_views_count",
+    "post_like_count", "post_url", "tags", "emoji", "post_title",
+    "post_body", "post_geoaccuracy", "place_guid", "place_name"]
+
+
+def _write_input(input_path: Path, file_count: int = 2, count: int = 120):
+    """Write CSV files with duplicates and posts without coordinates"""
+    input_path.mkdir()
+    terms = ["elbe", "dresden", "frauenkirche", "zwinger", "bridge"]
+    for file_idx in range(file_count):
+        with open(input_path / f"part{file_idx}.csv", "w",
+                  newline="", encoding="utf8") as f_handle:
+            writer = csv.writer(f_handle)
+            writer.writerow(HEADER)
+            for idx in range(count):
+                # every 7th guid repeats a guid of the previous file
+                guid = idx if idx % 7 == 0 else file_idx * count + idx
+                lat = "" if idx % 11 == 0 else f"51.0{idx % 13}"
+                writer.writerow([
+                    2, f"p{guid}", lat, f"13.7{idx % 5}", f"u{idx % 9}",
+                    "2019-01-01 10:00:00", "", idx % 4, "",
+                    "", f"{terms[idx % 5]};{terms[idx % 3]};",
+                    "\U0001F600" if idx % 2 else "",
+                    f"Title {terms[idx % 4]}",
+                    f"A view of the {terms[idx % 5]} \U0001F309", "",
+                    "", ""])
+
+
+@pytest.fixture
+def get_config(tmp_path, monkeypatch):
+    """Get config for input data in tmp_path"""
+    shutil.copytree(CONFIG_PATH, tmp_path / "00_Config")
+    _write_input(tmp_path / "01_Input")
+    monkeypatch.setenv("TAGMAPS_RESOURCES", str(tmp_path))
+
+    def _get_config(*args):
+        monkeypatch.setattr(sys, "argv", ["tagmaps", "--auto_mode", *args])
+        # prevent logger setup from detaching captured stdout
+        monkeypatch.setattr(sys, "stdout", io.StringIO())
+        return BaseConfig()
+    return _get_config
+
+
+def _ingest(cfg):
+    """Ingest input data, return cleaned posts and input stats"""
+    input_data = LoadData(cfg)
+    lbsn_data = PrepareData(
+        [TAGS, EMOJI, LOCATIONS], 1000, None, True, 1, False)
+    if cfg.ingest_workers > 1:
+        for partial_data in input_data.iter_partial_data(
+                lbsn_data.new_partial(), cfg.ingest_workers):
+            lbsn_data.merge(partial_data)
+    elif input_data.chunked:
+        for post_batch in input_data.iter_batches():
+            lbsn_data.add_batch(post_batch)
+    else:
+        with input_data as records:
+            for record in records:
+                lbsn_data.add_record(record)
+    return lbsn_data.get_cleaned_post_dict(), vars(input_data.stats)
+
+
+def test_chunked_ingestion_matches_rows(get_config):
+    """Chunked ingestion produces same cleaned posts as row-by-row"""
+    cleaned_posts, stats = _ingest(get_config())
+    assert stats["skipped_count"] > 0
+    assert stats["count_non_geotagged"] > 0
+    chunked_posts, chunked_stats = _ingest(get_config(
+        "--ingest_engine", "pandas", "--ingest_chunksize", "50"))
+    assert list(chunked_posts.items()) == list(cleaned_posts.items())
+    assert chunked_stats == stats
+
+
+def test_parallel_ingestion_matches_serial(get_config):
+    """Ingestion in worker processes produces same cleaned posts"""
+    cleaned_posts, stats = _ingest(get_config())
+    parallel_posts, parallel_stats = _ingest(get_config(
+        "--ingest_workers", "2"))
+    assert parallel_posts == cleaned_posts
+    # emoji caches are separate per worker
+    for stats_dict in (stats, parallel_stats):
+        del stats_dict["count_emoji_cache_hits"]
+        del stats_dict["count_emoji_cache_misses"]
+    assert parallel_stats == stats
+
+
+def test_json_reader_streams_posts():
+    """JSON arrays and NDJSON are read post by post"""
+    posts = [
+        {"post_guid": f"p{idx}", "latitude": 51.05, "longitude": 13.7,
+         "tags": "elbe;dresden", "post_body": "A view {of} [the] elbe"}
+        for idx in range(50)]
+    expected = [
+        {**post, "latitude": "51.05", "longitude": "13.7"} for post in posts]
+    ndjson = "\n".join(json.dumps(post) for post in posts)
+    for json_text in (json.dumps(posts, indent=2), ndjson):
+        reader = JsonPostReader(io.StringIO(json_text), buffer_size=16)
+        assert reader.fieldnames == list(posts[0])
+        assert list(reader) == expected
+    assert not list(JsonPostReader(io.StringIO("[]")))
+
+
+def test_json_reader_malformed():
+    """Malformed JSON raises at the error, without reading the rest"""
+    posts = ", ".join(
+        json.dumps({"post_guid": f"p{idx}", "post_body": "elbe"})
+        for idx in range(50))
+    for json_text in (
+            f'[{{"a": 1}} {{"b": 2}}, {posts}]',
+            f'[{{"a": 1, "b": x1}}, {posts}]',
+            f'{{"a": 1}}, {posts}'):
+        file_handle = io.StringIO(json_text)
+        with pytest.raises(json.JSONDecodeError):
+            list(JsonPostReader(file_handle, buffer_size=16))
+        assert file_handle.tell() <= 32
+    for json_text in ('[{"a": 1},]', '[{"a": 1}', '[{"a": 1}] {"b": 2}'):
+        with pytest.raises(json.JSONDecodeError):
+            list(JsonPostReader(io.StringIO(json_text), buffer_size=4))
+
+
+def test_state_shards_merge_to_serial(get_config, tmp_path):
+    """States of shards, stored to file and merged,
+    produce same cleaned posts as serial ingestion"""
+    cfg = get_config()
+    cleaned_posts, _ = _ingest(cfg)
+    lbsn_data = PrepareData(
+        [TAGS, EMOJI, LOCATIONS], 1000, None, True, 1, False)
+    filelist = LoadData(cfg).filelist
+    guid_hash = set()
+    for idx, file_name in enumerate(filelist):
+        input_data = LoadData(cfg, filelist=[file_name])
+        input_data.guid_hash = guid_hash
+        shard_data = lbsn_data.new_partial()
+        input_data.ingest_files(shard_data)
+        shard_data.get_state().save(tmp_path / f"state{idx}.npz")
+    for idx in range(len(filelist)):
+        lbsn_data.merge(PrepareDataState.load(tmp_path / f"state{idx}.npz"))
+    assert lbsn_data.get_cleaned_post_dict() == cleaned_posts
+
+
+def test_spilled_aggregates_match_memory(get_config):
+    """Aggregates spilled to disk produce same cleaned posts"""
+    cfg = get_config()
+    cleaned_posts, _ = _ingest(cfg)
+    # spill after every post
+    lbsn_data = PrepareData(
+        [TAGS, EMOJI, LOCATIONS], 1000, None, True, 1, False,
+        memory_budget=0)
+    LoadData(cfg).ingest_files(lbsn_data)
+    assert lbsn_data.spill_store is not None
+    assert not lbsn_data.userlocations_firstpost_dict
+    assert lbsn_data.get_cleaned_post_dict() == cleaned_posts
+
+
+def test_frame_records_match_rows(get_config):
+    """Records added from a DataFrame produce same cleaned posts"""
+    pandas = pytest.importorskip("pandas")
+    cfg = get_config()
+    cleaned_posts, _ = _ingest(cfg)
+    with LoadData(cfg) as records:
+        frame = pandas.DataFrame([asdict(record) for record in records])
+    frame = frame.rename(columns={"user_guid": "user"})
+    lbsn_data = PrepareData(
+        [TAGS, EMOJI, LOCATIONS], 1000, None, True, 1, False)
+    for post_batch in iter_frame_batches(
+            frame, column_map={"user_guid": "user"}, batch_size=50):
+        lbsn_data.add_batch(post_batch)
+    assert lbsn_data.get_cleaned_post_dict() == cleaned_posts
+    with pytest.raises(ValueError):
+        next(iter_frame_batches(frame))
+
+
+def test_emoji_cache(get_config, monkeypatch):
+    """Emoji of repeated texts are cached, ASCII texts skipped"""
+    monkeypatch.setattr(load_data, "EMOJI_CACHE_SIZE", 2)
+    input_data = LoadData(get_config())
+    texts = ["sunset \U0001F305", "sunset \U0001F305", "plain text",
+             "\U0001F30A \U0001F3D6", "\U0001F30D", "sunset \U0001F305"]
+    emoji = [input_data._get_emoji_from(text, None) for text in texts]
+    assert emoji == [
+        {"\U0001F305"}, {"\U0001F305"}, set(),
+        {"\U0001F30A", "\U0001F3D6"}, {"\U0001F30D"}, {"\U0001F305"}]
+    assert input_data.stats.count_emoji_cache_hits == 1
+    # first text was evicted (cache size 2)
+    assert input_data.stats.count_emoji_cache_misses == 4
+    assert len(input_data.emoji_cache) == 2
+
+
+def test_emoji_cache_skips_long_texts(get_config, monkeypatch):
+    """Emoji of texts above the length cap are not cached"""
+    monkeypatch.setattr(load_data, "EMOJI_CACHE_MAX_TEXT_LEN", 10)
+    input_data = LoadData(get_config())
+    long_text = "long sunset at the Elbe \U0001F305"
+    for __ in range(2):
+        assert input_data._get_emoji_from(long_text, None) == {"\U0001F305"}
+    assert input_data._get_emoji_from("\U0001F30A", None) == {"\U0001F30A"}
+    assert list(input_data.emoji_cache) == ["\U0001F30A"]
+    assert input_data.stats.count_emoji_cache_misses == 1
+
+
+def test_emoji_from_body_and_emoji_field(get_config):
+    """Emoji of post body and emoji field are united,
+    cached results are not modified"""
+    input_data = LoadData(get_config())
+    for __ in range(2):
+        emoji = input_data._get_emoji_from(
+            "Elbe \U0001F305 at dusk", "\U0001F305\U0001F30A")
+        assert isinstance(emoji, set)
+        assert emoji == {"\U0001F305", "\U0001F30A"}
+        emoji.add("\U0001F30D")
+    assert input_data._get_emoji_from("\U0001F305 only", None) == {
+        "\U0001F305"}
+    assert "\U0001F30D" not in set().union(*input_data.emoji_cache.values())
@@ -0,0 +1,65 @@
+"""Tests for columnar CleanedPostStore"""
+
+import numpy as np
+
+from tagmaps.classes.post_store import (CleanedPostStore, load_columns,
+                                        save_columns)
+from test_cluster import _get_posts
+
+
+def test_store_roundtrip():
+    """Posts restored from store equal original posts"""
+    posts = _get_posts(50)
+    store = CleanedPostStore.from_posts(posts)
+    assert len(store) == len(posts)
+    for row, post in enumerate(posts):
+        assert store.post(row) == post
+    rows = store.rows([post.guid for post in posts[::-1]])
+    assert np.array_equal(rows, np.arange(len(posts))[::-1])
+
+
+def test_store_remove_rows():
+    """Removing rows keeps remaining posts unchanged"""
+    posts = _get_posts(50)
+    store = CleanedPostStore.from_posts(posts)
+    remove_mask = np.zeros(len(posts), dtype=bool)
+    remove_mask[::3] = True
+    store.remove_rows(remove_mask)
+    kept_posts = [
+        post for post, remove in zip(posts, remove_mask) if not remove]
+    assert len(store) == len(kept_posts)
+    for row, post in enumerate(kept_posts):
+        assert store.post(row) == post
+
+
+def test_item_column_take():
+    """Item sets are taken in order of rows (unsorted, duplicates)"""
+    posts = _get_posts(50)
+    store = CleanedPostStore.from_posts(posts)
+    rows = np.array([7, 3, 3, 49, 0, 12], dtype=np.intp)
+    hashtags = store.hashtags.take(rows)
+    for idx, row in enumerate(rows):
+        assert np.array_equal(
+            hashtags.row_codes(idx), store.hashtags.row_codes(row))
+    assert store.guids_at(rows) == [posts[row].guid for row in rows]
+
+
+def test_store_memory_mapped(tmp_path):
+    """Store saved to npz is restored with memory-mapped columns"""
+    posts = _get_posts(50)
+    posts[0].loc_name = "Frauenkirche"
+    store = CleanedPostStore.from_posts(posts)
+    save_columns(tmp_path / "store.npz", store.to_columns())
+    columns = load_columns(tmp_path / "store.npz")
+    assert isinstance(columns["lat"], np.memmap)
+    loaded_store = CleanedPostStore.from_columns(columns)
+    # str columns and vocabularies are not copied
+    assert loaded_store.guids is columns["guids"]
+    assert loaded_store.loc_name is columns["loc_name"]
+    assert loaded_store.items.terms is columns["vocabulary/items"]
+    assert len(loaded_store) == len(posts)
+    for row, post in enumerate(posts):
+        assert loaded_store.post(row) == post
+    assert loaded_store.items.get("elbe") == store.items.get("elbe")
+    loaded_store.items.add("new term")
+    assert loaded_store.items.get("new term") == len(store.items)
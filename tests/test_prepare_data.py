@@ -0,0 +1,104 @@
+"""Tests for top lists and item stats of PrepareData"""
+
+import collections
+import math
+import random
+
+from tagmaps.classes.prepare_data import PrepareData
+from tagmaps.classes.shared_structure import (EMOJI, LOCATIONS, TAGS,
+                                              CleanedPost)
+
+EMOJI_LIST = ["\U0001F600", "\U0001F3F0", "\U0001F309", "\U0001F305",
+              "\U0001F30A", "\U0001F3D6"]
+
+
+def _get_posts(count: int = 600, seed: int = 7):
+    """Create list of cleaned posts with skewed use of tags
+
+    With seed 7, the user counts of the 15th and 16th tag are tied,
+    and six tags are used by less than 5 users.
+    """
+    rng = random.Random(seed)
+    tags = [f"tag{idx:02d}" for idx in range(40)]
+    tag_weights = [1 / (idx + 1) for idx in range(len(tags))]
+    posts = list()
+    for idx in range(count):
+        loc_id = f"loc{rng.randrange(30):02d}"
+        user_guid = f"u{rng.randrange(80)}"
+        hashtags = set(rng.choices(
+            tags, weights=tag_weights, k=rng.randrange(4)))
+        emoji = set(rng.sample(EMOJI_LIST, rng.randrange(2)))
+        posts.append(CleanedPost(
+            origin_id=1, lat=51.05, lng=13.74, guid=f"p{idx}",
+            user_guid=user_guid, loc_id=loc_id, hashtags=hashtags,
+            post_body=set(), emoji=emoji,
+            post_views_count=0, post_like_count=0))
+    return posts
+
+
+def _get_reference(posts, cls_type: str):
+    """Get distinct users and number of posts per item name,
+    counted with collections.Counter"""
+    items_per_user = collections.defaultdict(set)
+    post_counter = collections.Counter()
+    for post in posts:
+        if cls_type == LOCATIONS:
+            items = {post.loc_id}
+        elif cls_type == TAGS:
+            items = post.hashtags
+        else:
+            items = post.emoji
+        items_per_user[post.user_guid].update(items)
+        post_counter.update(items)
+    user_counter = collections.Counter()
+    for items in items_per_user.values():
+        user_counter.update(items)
+    return user_counter, post_counter
+
+
+def test_top_lists_match_counter():
+    """Top lists from sparse user x item matrix equal
+    Counter.most_common(), with ties ordered by name"""
+    posts = _get_posts()
+    limit_bottom_user_count = 5
+    for remove_long_tail, max_items in ((False, 15), (True, 40)):
+        lbsn_data = PrepareData(
+            [TAGS, EMOJI, LOCATIONS], max_items, None, remove_long_tail,
+            limit_bottom_user_count, False)
+        for post in posts:
+            lbsn_data.add_record(post)
+        item_stats = lbsn_data.get_item_stats()
+        for cls_type in (TAGS, EMOJI, LOCATIONS):
+            user_counter, post_counter = _get_reference(posts, cls_type)
+            cls_max_items = None if cls_type == LOCATIONS else max_items
+            expected = sorted(
+                user_counter.items(),
+                key=lambda item: (-item[1], item[0]))[:cls_max_items]
+            assert [count for __, count in expected] == [
+                count for __, count in user_counter.most_common(
+                    cls_max_items)]
+            if cls_type == TAGS and not remove_long_tail:
+                # tied user counts at the max_items cut
+                assert expected[-1][1] == sorted(
+                    user_counter.values(), reverse=True)[max_items]
+            long_tail_removed = False
+            if remove_long_tail and cls_type != LOCATIONS:
+                bottom_user_count = limit_bottom_user_count
+                if cls_type == EMOJI:
+                    bottom_user_count = math.trunc(bottom_user_count / 2)
+                top_count = len(expected)
+                expected = [
+                    item for item in expected
+                    if item[1] >= bottom_user_count]
+                long_tail_removed = len(expected) < top_count
+            stats = item_stats[cls_type]
+            assert [tuple(item) for item in stats.top_items_list] == expected
+            assert stats.total_unique_items == len(user_counter)
+            assert stats.total_item_count == sum(
+                post_counter[name] for name, __ in expected)
+            if long_tail_removed:
+                assert stats.max_items == len(expected)
+            else:
+                assert stats.max_items == max_items
+        if remove_long_tail:
+            assert len(item_stats[TAGS].top_items_list) == 34
@@ -0,0 +1,40 @@
+"""Tests for matching of inStr stoplists (SubstringMatcher)"""
+
+import random
+import string
+
+from tagmaps.classes.substring_matcher import SubstringMatcher
+from tagmaps.classes.utils import Utils
+
+
+def test_matcher_matches_loop():
+    """Matches are identical to one substring check per pattern"""
+    rnd = random.Random(42)
+    patterns = {
+        "".join(rnd.choices("abcde", k=rnd.randint(1, 5)))
+        for _ in range(200)}
+    patterns.update({"he", "she", "his", "hers"})
+    matcher = SubstringMatcher(patterns)
+    texts = ["ushers", "hi", "xyz", ""] + [
+        "".join(rnd.choices("abcdefgh", k=rnd.randint(0, 12)))
+        for _ in range(2000)]
+    for text in texts:
+        assert matcher.search(text) == any(
+            pattern in text for pattern in patterns)
+    assert len(matcher) == len(patterns)
+    assert not SubstringMatcher().search("abc")
+
+
+def test_filter_tags_with_matcher():
+    """Filtering with compiled matcher or with set is identical"""
+    rnd = random.Random(7)
+    instr_set = {"".join(rnd.choices(string.ascii_lowercase, k=3))
+                 for _ in range(500)}
+    tags = {"".join(rnd.choices(string.ascii_lowercase, k=8))
+            for _ in range(500)} | {"1234", "x"}
+    filtered = Utils.filter_tags(tags, {"abc"}, instr_set)
+    assert Utils.filter_tags(
+        tags, {"abc"}, SubstringMatcher(instr_set)) == filtered
+    assert filtered[0] == {
+        tag for tag in tags if len(tag) > 1 and not tag.isdigit()
+        and not any(instr in tag for instr in instr_set)}
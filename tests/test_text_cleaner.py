@@ -0,0 +1,53 @@
+"""Tests for cleaning of post body and title terms (TextCleaner)"""
+
+import random
+
+from tagmaps.classes.text_cleaner import TextCleaner
+from tagmaps.classes.utils import Utils
+
+
+def _clean_terms(text: str) -> set:
+    """Cleaning of filtered text, as in PrepareData"""
+    return {
+        term for term in Utils.remove_special_chars(text).lower().split(" ")
+        if len(term) > 2}
+
+
+def _get_texts(count: int = 500):
+    """Random texts with links, numbers, special chars and whitespace"""
+    rnd = random.Random(3)
+    words = [
+        "Elbe", "dresden", "THE", "and", "2012", "<a href='x.org'>",
+        "</a>", "view.of", "(river)", "Brücke", "İstanbul", "a-b-c",
+        "#sunset", "x", "über!", "\n", "\t", "  ", "12ab", "Ⅻ", "³"]
+    return [
+        " ".join(rnd.choices(words, k=rnd.randint(0, 15)))
+        for _ in range(count)]
+
+
+def test_cleaner_matches_stopword_pipeline():
+    """Terms equal remove_stopwords() followed by cleaning"""
+    stopwords = {"the", "and", "dresden"}
+    cleaner = TextCleaner(stopwords)
+    texts = _get_texts()
+    expected = [
+        _clean_terms(Utils.remove_stopwords(text, stopwords))
+        for text in texts]
+    assert cleaner.clean_batch(texts) == expected
+
+
+def test_cleaner_matches_selection_pipeline():
+    """Terms equal select_words() followed by cleaning"""
+    selection = {"elbe", "view.of", "brücke", "2012"}
+    cleaner = TextCleaner(selection=selection)
+    for text in _get_texts():
+        assert cleaner.clean(text) == _clean_terms(
+            Utils.select_words(text, selection))
+
+
+def test_cleaner_ignore_stoplists():
+    """Without stoplists, text is only cleaned"""
+    cleaner = TextCleaner(ignore_stoplists=True)
+    for text in _get_texts():
+        assert cleaner.clean(text) == _clean_terms(text)
+    assert cleaner.clean(None) == set()
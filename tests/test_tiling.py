@@ -0,0 +1,23 @@
+"""Tests for partitioning of points into tiles (TileGrid)"""
+
+import numpy as np
+
+from tagmaps.classes.tiling import TileGrid
+
+
+def test_tiles_cover_close_points():
+    """Each point is in its core tile, close points share a tile"""
+    rng = np.random.default_rng(5)
+    points = rng.uniform(size=(500, 2)) * [3.0, 2.0]
+    grid = TileGrid(points, tile_size=0.5, halo=0.1)
+    assert grid.shape == (6, 4)
+    point_tiles = [set() for __ in points]
+    for tile_id, rows in grid.iter_tiles():
+        assert np.all(np.diff(rows) > 0)
+        for row in rows:
+            point_tiles[row].add(tile_id)
+    for row, tiles in enumerate(point_tiles):
+        assert grid.tile_ids[row] in tiles
+    distances = np.linalg.norm(points[:, None] - points[None, :], axis=2)
+    for row_a, row_b in zip(*np.nonzero(distances < 0.1)):
+        assert grid.tile_ids[row_a] in point_tiles[row_b]
@@ -0,0 +1,78 @@
+"""Tests for approximate top lists (TopItemSketch)"""
+
+import numpy as np
+
+from tagmaps.classes.top_sketch import TopItemSketch
+
+
+def _add_users(sketch: TopItemSketch, item_users, offset: int = 0):
+    """Add users (ids offset..offset+count) to each item, with duplicates"""
+    for item_id, user_count in item_users:
+        for user_idx in range(offset, offset + user_count):
+            user_hash = TopItemSketch.hash_user(f"u{user_idx}")
+            sketch.update([item_id], user_hash)
+            sketch.update([item_id], user_hash)
+
+
+def test_sketch_counts_distinct_users():
+    """Small user counts are estimated within three
+    standard errors of HyperLogLog"""
+    sketch = TopItemSketch(100)
+    item_users = [(item_id, item_id * 5 + 1) for item_id in range(30)]
+    _add_users(sketch, item_users)
+    counts = sketch.counts()
+    for item_id, user_count in item_users:
+        assert abs(counts[item_id] - user_count) <= max(
+            1, 3 * sketch.relative_error * user_count)
+    assert sketch.max_error == 0
+
+
+def test_sketch_keeps_heavy_hitters():
+    """Items with most users are kept if capacity is exceeded"""
+    sketch = TopItemSketch(20)
+    for idx in range(200):
+        _add_users(sketch, [(idx % 5, 2)], offset=idx * 2)
+        _add_users(sketch, [(100 + idx, 1)], offset=idx)
+    counts = sketch.counts()
+    assert len(sketch) == 20
+    for item_id in range(5):
+        assert counts[item_id] >= 80 * 0.95
+    assert max(sketch.errors_of(range(5))) <= sketch.max_error
+
+
+def test_sketch_merge():
+    """Merged sketches estimate the union of users"""
+    item_users = [(item_id, 50 + item_id) for item_id in range(10)]
+    sketch = TopItemSketch(100)
+    other_sketch = TopItemSketch(100)
+    _add_users(sketch, item_users)
+    _add_users(other_sketch, item_users, offset=25)
+    # other sketch uses item ids in reverse order
+    sketch.merge(other_sketch, list(range(10))[::-1])
+    counts = sketch.counts()
+    for item_id, user_count in item_users:
+        union_count = max(user_count, 25 + 50 + (9 - item_id))
+        assert abs(counts[item_id] - union_count) <= union_count * 0.1
+
+
+class _ArgminSketch(TopItemSketch):
+    """Sketch evicting with a full scan of estimates (reference)"""
+
+    def _pop_min_slot(self) -> int:
+        return int(np.argmin(self.estimates))
+
+
+def test_sketch_heap_matches_argmin():
+    """Evictions with the heap of estimates equal a full scan"""
+    rng = np.random.default_rng(4)
+    sketch = TopItemSketch(20)
+    reference = _ArgminSketch(20)
+    for user_idx in range(3000):
+        user_hash = TopItemSketch.hash_user(f"u{user_idx}")
+        item_ids = rng.zipf(1.5, size=3).tolist()
+        sketch.update(item_ids, user_hash)
+        reference.update(item_ids, user_hash)
+    assert len(sketch._heap) <= 4 * sketch.capacity
+    assert sketch.counts() == reference.counts()
+    assert sketch.errors_of(sketch.slots) == reference.errors_of(
+        sketch.slots)